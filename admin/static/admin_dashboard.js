@@ -70,16 +70,37 @@ function saveTeacher() {
     });
 }
 
-/* Load students */
-function loadStudents() {
-    fetch("/get_students")
+/* Rows per page for the lists (server caps it at 500) */
+const PAGE_SIZE = 50;
+let studentCursor = null;
+let teacherCursor = null;
+
+/* Show the "Load more" button only while the server says there is more */
+function setMoreButton(id, cursor) {
+    document.getElementById(id).style.display = cursor ? "inline-block" : "none";
+}
+
+/* Load students (first page, or the next page when append is true) */
+function loadStudents(append) {
+    let url = "/get_students?limit=" + PAGE_SIZE +
+        "&fields=student_id,name,surname,class,phone,attendance,age,sex";
+    if (append && studentCursor) {
+        url += "&cursor=" + encodeURIComponent(studentCursor);
+    }
+
+    fetch(url)
     .then(res => res.json())
-    .then(students => {
+    .then(page => {
         let table = document.getElementById("studentTable");
-        table.innerHTML = "";
+        if (!append) {
+            table.innerHTML = "";
+        }
+        studentCursor = page.next_cursor;
+        setMoreButton("studentsMore", studentCursor);
 
-        students.forEach(s => {
-            table.innerHTML += `
+        let rows = "";
+        page.data.forEach(s => {
+            rows += `
                 <tr>
                     <td>${s.student_id || s.sid}</td>
                     <td>${s.name}</td>
@@ -92,33 +113,46 @@ function loadStudents() {
                     <td><button class="delete-btn" onclick="deleteStudent(${s.id})">Delete</button></td>
                 </tr>`;
         });
+        table.insertAdjacentHTML("beforeend", rows);
     })
     .catch(err => {
         console.error("Error loading students:", err);
     });
 }
 
-/* Load teachers */
-function loadTeachers() {
-    fetch("/get_teachers")
+/* Load teachers (first page, or the next page when append is true) */
+function loadTeachers(append) {
+    // Listings never include passwords
+    let url = "/get_teachers?limit=" + PAGE_SIZE +
+        "&fields=teacher_id,name,surname,class,phone,role";
+    if (append && teacherCursor) {
+        url += "&cursor=" + encodeURIComponent(teacherCursor);
+    }
+
+    fetch(url)
     .then(res => res.json())
-    .then(teachers => {
+    .then(page => {
         let table = document.getElementById("teacherTable");
-        table.innerHTML = "";
+        if (!append) {
+            table.innerHTML = "";
+        }
+        teacherCursor = page.next_cursor;
+        setMoreButton("teachersMore", teacherCursor);
 
-        teachers.forEach(t => {
-            table.innerHTML += `
+        let rows = "";
+        page.data.forEach(t => {
+            rows += `
                 <tr>
                     <td>${t.teacher_id}</td>
                     <td>${t.name}</td>
                     <td>${t.surname}</td>
                     <td>${t.class}</td>
                     <td>${t.phone}</td>
-                    <td>${t.password}</td>
                     <td>${t.role}</td>
                     <td><button class="delete-btn" onclick="deleteTeacher(${t.id})">Delete</button></td>
                 </tr>`;
         });
+        table.insertAdjacentHTML("beforeend", rows);
     })
     .catch(err => {
         console.error("Error loading teachers:", err);
@@ -153,6 +187,73 @@ function deleteTeacher(id) {
     });
 }
 
+/* Import a CSV of students or teachers as a background job, polling its progress */
+async function importCsv() {
+    let kind = document.getElementById("importKind").value;
+    let file = document.getElementById("importFile").files[0];
+    let bar = document.getElementById("importProgress");
+    let status = document.getElementById("importStatus");
+
+    if (!file) {
+        alert("Choose a CSV file first");
+        return;
+    }
+
+    // Rough row count for the progress bar (header line excluded)
+    let text = await file.text();
+    bar.max = Math.max(text.split("\n").filter(l => l.trim() !== "").length - 1, 1);
+    bar.value = 0;
+    bar.style.display = "block";
+    status.textContent = "Uploading...";
+
+    let body = new FormData();
+    body.append("file", file);
+
+    try {
+        let res = await fetch("/import/" + kind, {
+            method: "POST",
+            headers: {"Prefer": "respond-async"},
+            body: body
+        });
+        let job = await res.json();
+        if (res.status !== 202) {
+            status.textContent = job.message || "Import failed";
+            return;
+        }
+
+        // The server imports it in the background; follow the job
+        while (job.status === "queued" || job.status === "running") {
+            status.textContent = job.status === "queued" ? "Waiting to start..." :
+                `Processed ${job.done || 0} rows...`;
+            bar.value = job.done || 0;
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            let poll = await fetch(res.headers.get("Location"));
+            job = await poll.json();
+            if (!poll.ok) break;
+        }
+
+        let result = job.result;
+        if (job.status === "done" && result) {
+            status.textContent = `Processed ${result.processed} rows: ` +
+                `${result.inserted} added, ${result.duplicates} duplicates, ${result.errors} errors - ${result.message}`;
+            if (result.duplicate_ids && result.duplicate_ids.length) {
+                status.textContent += ". Duplicate IDs: " + result.duplicate_ids.slice(0, 20).join(", ");
+            }
+            bar.value = bar.max;
+        } else {
+            status.textContent = "Import " + (job.status || "failed") + (job.error ? ": " + job.error : "");
+        }
+        if (kind === "students") {
+            loadStudents();
+        } else {
+            loadTeachers();
+        }
+    } catch (err) {
+        console.error("Import error:", err);
+        status.textContent = "Import error";
+    }
+}
+
 // Auto-load lists on page load
 window.addEventListener('DOMContentLoaded', function() {
     loadStudents();
@@ -1,9 +1,43 @@
 import sqlite3
-from flask import Flask, request, jsonify, send_from_directory
+import click
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
+import base64
+import csv
+import hashlib
+import hmac
+import io
+import itertools
+import json
 import os
+import re
+import secrets
+import shutil
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
 from datetime import datetime, timedelta
 
+from credentials import CredentialsBusy, hash_password, make_password, make_passwords, verify_password
+import assets
+import events
+import jobs
+import logs
+import metrics
+import reports
+from logs import get_logger
+
 app = Flask(__name__)
+logs.init_app(app)
+metrics.init_app(app)
+# Pages and their CSS/JS are served from the minified, precompressed build;
+# the URLs are listed in assets.PAGES and assets.ASSETS
+assets.init_app(app)
+log = get_logger("app")
+auth_log = get_logger("auth")
+results_log = get_logger("results")
 
 # ---------------------- DATABASE FILES ----------------------
 DATABASE_STUDENTS = "database.db"
@@ -11,177 +45,787 @@ DATABASE_RESULTS = "results.db"
 DATABASE_TEACHERS = "teachers.db"
 DATABASE_ADMIN = "adminlogin.db"
 
+# Set SCHOOL_DB=school.db to keep every table in one file instead. Routes
+# can then join across tables and share one transaction, and results get
+# a real foreign key to students. Build the file from the four old ones
+# with: flask --app app merge-databases school.db
+SINGLE_DATABASE = os.environ.get("SCHOOL_DB")
+if SINGLE_DATABASE:
+    DATABASE_STUDENTS = DATABASE_RESULTS = DATABASE_TEACHERS = DATABASE_ADMIN = SINGLE_DATABASE
+
 # Server start time for uptime calculation
 SERVER_START_TIME = datetime.now()
 
 
+# ---------------------- CONNECTION POOL ----------------------
+# Applied once when a connection is opened, not on every request.
+# WAL lets readers run while a teacher is saving marks, and NORMAL sync is
+# safe under WAL (only the last commits can be lost on power failure).
+SQLITE_PRAGMAS = [
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("mmap_size", 64 * 1024 * 1024),
+    ("cache_size", -8000),  # negative = KiB, so ~8 MB per connection
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 5000),
+    # INSERT OR REPLACE only fires DELETE triggers with this on, and the
+    # counter triggers below rely on that to stay accurate
+    ("recursive_triggers", "ON"),
+    # Only the single-file schema declares foreign keys
+    ("foreign_keys", "ON"),
+]
+
+
+class _ThreadConnections:
+    """One thread's connections, by path; closed once the thread is gone"""
+
+    def __init__(self):
+        self.conns = {}
+        weakref.finalize(self, _close_connections, self.conns)
+
+
+def _close_connections(conns):
+    for conn in list(conns.values()):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    conns.clear()
+
+
+class ConnectionPool:
+    """Keeps one warm connection per worker thread per database file.
+
+    sqlite3 connections can't be shared between threads, so instead of a
+    shared queue every thread gets its own connection the first time it asks
+    for a database and then reuses it. Connections are dropped after a fork
+    (gunicorn preload) so children never touch the parent's handles.
+
+    A thread's connections are closed when the thread ends (its
+    thread-local holder is collected), so servers and job queues that start
+    a thread per request or job don't pile up connections and WAL handles.
+    That close can run on another thread, which is why connections are
+    opened with check_same_thread off; the pool still hands each one to a
+    single thread only.
+    """
+
+    def __init__(self, pragmas=None):
+        self.pragmas = pragmas if pragmas is not None else SQLITE_PRAGMAS
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all = weakref.WeakSet()
+        self._pid = os.getpid()
+        self.hits = 0
+        self.opens = 0
+        self.open_time = 0.0
+        self.wait_time = 0.0
+
+    def _connections(self):
+        if self._pid != os.getpid():
+            # Forked: forget everything inherited from the parent
+            self._local = threading.local()
+            self._all = weakref.WeakSet()
+            self._pid = os.getpid()
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = self._local.holder = _ThreadConnections()
+            with self._lock:
+                self._all.add(holder)
+        return holder.conns
+
+    def _open(self, path):
+        conn = sqlite3.connect(path, timeout=5, check_same_thread=False, factory=metrics.connection_factory())
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def acquire(self, path):
+        start = time.perf_counter()
+        conns = self._connections()
+        conn = conns.get(path)
+        if conn is None:
+            conn = self._open(path)
+            conns[path] = conn
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.opens += 1
+                self.open_time += elapsed
+                self.wait_time += elapsed
+        else:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.hits += 1
+                self.wait_time += elapsed
+        return conn
+
+    def discard(self, path):
+        """Close this thread's connection to `path` (e.g. before deleting the file)"""
+        conn = self._connections().pop(path, None)
+        if conn is not None:
+            conn.close()
+
+    def close_all(self):
+        """Close every connection handed out so far, on any thread."""
+        with self._lock:
+            holders, self._all = list(self._all), weakref.WeakSet()
+        for holder in holders:
+            _close_connections(holder.conns)
+        self._local = threading.local()
+
+    def open_connections(self):
+        with self._lock:
+            return sum(len(holder.conns) for holder in self._all)
+
+    def stats(self):
+        open_connections = self.open_connections()
+        with self._lock:
+            total = self.hits + self.opens
+            return {
+                "hits": self.hits,
+                "opens": self.opens,
+                "open_connections": open_connections,
+                "hit_rate": round(self.hits / total, 4) if total else 0,
+                "open_time_ms": round(self.open_time * 1000, 3),
+                "wait_time_ms": round(self.wait_time * 1000, 3),
+                "avg_wait_ms": round(self.wait_time * 1000 / total, 4) if total else 0,
+            }
+
+
+db_pool = ConnectionPool()
+# get_db blocks open on this thread, by path
+_nesting = threading.local()
+
+
+@contextmanager
+def get_db(path):
+    """Borrow this thread's connection to `path`.
+
+    Commits when the block finishes and rolls back if it raises, so a
+    half-done transaction never leaks into the next request served by the
+    same thread. Rows come back as sqlite3.Row.
+
+    Blocks may nest (a helper taking get_db inside its caller's block on the
+    same file, or any two paths under SCHOOL_DB). They share the connection,
+    and only the outermost block commits or rolls back; an inner block runs
+    in a savepoint. If it raises, its own writes are undone and the outer
+    block's stay. If it finishes, its writes join the outer block's
+    transaction when the outer block has written already, and are committed
+    there and then when the outer block has only read so far (as a job's
+    progress update inside a long read has to be).
+    """
+    conn = db_pool.acquire(path)
+    depths = _nesting.__dict__.setdefault("depths", {})
+    depth = depths.get(path, 0)
+    depths[path] = depth + 1
+    savepoint = f"get_db_{depth}"
+    # Time inside the block counts as DB time for /metrics, once
+    stats = not depth and metrics.ENABLED and metrics.current()
+    started = time.perf_counter() if stats else 0.0
+    try:
+        if depth:
+            conn.execute(f"SAVEPOINT {savepoint}")
+        yield conn
+        if depth:
+            conn.execute(f"RELEASE {savepoint}")
+        else:
+            conn.commit()
+    except Exception:
+        if depth:
+            try:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            except sqlite3.Error:
+                # SQLite already rolled the whole transaction back
+                pass
+        else:
+            conn.rollback()
+        raise
+    finally:
+        if depth:
+            depths[path] = depth
+        else:
+            del depths[path]
+        if stats:
+            stats.db_time += time.perf_counter() - started
+
+
 # ---------------------- INIT DB (STUDENTS, TEACHERS, RESULTS) ----------------------
-def init_databases():
+def init_databases(students_db=DATABASE_STUDENTS, teachers_db=DATABASE_TEACHERS, results_db=DATABASE_RESULTS):
     # Students DB - Add password field
-    conn = sqlite3.connect(DATABASE_STUDENTS)
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS students (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id TEXT UNIQUE,
-            name TEXT,
-            surname TEXT,
-            class TEXT,
-            phone TEXT,
-            attendance TEXT,
-            age INTEGER,
-            sex TEXT,
-            password TEXT DEFAULT NULL,
-            email TEXT,
-            address TEXT,
-            guardian_name TEXT,
-            guardian_phone TEXT,
-            date_of_birth TEXT,
-            enrollment_date TEXT DEFAULT (date('now'))
-        )
-    """)
-    conn.commit()
-    conn.close()
+    with get_db(students_db) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS students (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id TEXT UNIQUE,
+                name TEXT,
+                surname TEXT,
+                class TEXT,
+                phone TEXT,
+                attendance TEXT,
+                age INTEGER,
+                sex TEXT,
+                password TEXT DEFAULT NULL,
+                email TEXT,
+                address TEXT,
+                guardian_name TEXT,
+                guardian_phone TEXT,
+                date_of_birth TEXT,
+                enrollment_date TEXT DEFAULT (date('now'))
+            )
+        """)
 
     # Teachers DB
-    conn = sqlite3.connect(DATABASE_TEACHERS)
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS teachers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            teacher_id TEXT UNIQUE,
-            name TEXT,
-            surname TEXT,
-            class TEXT,
-            phone TEXT,
-            password TEXT,
-            role TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-    # Results DB
-    conn = sqlite3.connect(DATABASE_RESULTS)
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id TEXT,
-            student_name TEXT,
-            form TEXT,
-            level TEXT,
-            subject TEXT,
-            term TEXT,
-            year INTEGER,
-            exam_type TEXT,
-            exam_date TEXT,
-            marks INTEGER,
-            grade TEXT,
-            status TEXT,
-            comment TEXT,
-            teacher_id TEXT,
-            created_at TEXT DEFAULT (datetime('now')),
-            UNIQUE(student_id, subject, term, year, exam_type)
-        )
-    """)
-    conn.commit()
-    conn.close()
+    with get_db(teachers_db) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS teachers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                teacher_id TEXT UNIQUE,
+                name TEXT,
+                surname TEXT,
+                class TEXT,
+                phone TEXT,
+                password TEXT,
+                role TEXT
+            )
+        """)
+
+    # Results DB. A foreign key is only possible when students share the file;
+    # updates cascade so a corrected student ID carries its results along.
+    student_fk = ""
+    if results_db == students_db:
+        student_fk = " REFERENCES students(student_id) ON UPDATE CASCADE ON DELETE CASCADE"
+    with get_db(results_db) as conn:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id TEXT{student_fk},
+                student_name TEXT,
+                form TEXT,
+                level TEXT,
+                subject TEXT,
+                term TEXT,
+                year INTEGER,
+                exam_type TEXT,
+                exam_date TEXT,
+                marks INTEGER,
+                grade TEXT,
+                status TEXT,
+                comment TEXT,
+                teacher_id TEXT,
+                created_at TEXT DEFAULT (datetime('now')),
+                UNIQUE(student_id, subject, term, year, exam_type)
+            )
+        """)
 
 
 # ---------------------- ADMIN LOGIN DATABASE ----------------------
-def init_admin_database():
-    conn = sqlite3.connect(DATABASE_ADMIN)
-    c = conn.cursor()
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS admins (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            admin_id TEXT UNIQUE,
-            name TEXT,
-            role TEXT,
-            password TEXT
+def init_admin_database(admin_db=DATABASE_ADMIN):
+    with get_db(admin_db) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS admins (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id TEXT UNIQUE,
+                name TEXT,
+                role TEXT,
+                password TEXT
+            )
+        """)
+
+        # Default admins
+        admins = [
+            ("A001", "Mr. Banda", "superadmin", "admin123"),
+            ("A002", "Mrs. Chikomo", "finance", "canteen321"),
+            ("A003", "Mr. Dube", "registry", "register999")
+        ]
+
+        # Only hash for admins that are actually missing - hashing is slow
+        # and this runs on every start. OR IGNORE: another worker starting
+        # alongside this one may insert them first.
+        existing = {row[0] for row in conn.execute("SELECT admin_id FROM admins")}
+        for admin_id, name, role, password in admins:
+            if admin_id not in existing:
+                conn.execute("INSERT OR IGNORE INTO admins (admin_id, name, role, password) VALUES (?, ?, ?, ?)",
+                             (admin_id, name, role, hash_password(password)))
+
+
+# ---------------------- STUDENT SUMMARIES ----------------------
+# student_summary holds the dashboard statistics per student per term/year.
+# save_result/delete_result refresh the affected row inside their own
+# transaction, so /student_results never has to recompute them.
+def summarize_results(rows):
+    """Summary values for a list of result rows (dicts or sqlite3.Row)"""
+    marked = [r for r in rows if r["marks"] is not None]
+    best = max(marked, key=lambda r: r["marks"]) if marked else None
+    weak = min(marked, key=lambda r: r["marks"]) if marked else None
+    return {
+        "total_subjects": len(rows),
+        "total_marks": sum(r["marks"] for r in marked),
+        "passed": sum(1 for r in rows if r["status"] == "Pass"),
+        "best_subject": best["subject"] if best else None,
+        "best_score": best["marks"] if best else None,
+        "weak_subject": weak["subject"] if weak else None,
+        "weak_score": weak["marks"] if weak else None,
+    }
+
+
+def refresh_student_summary(conn, student_id, term, year):
+    """Recompute one student_summary row; call inside the write transaction"""
+    rows = conn.execute("""
+        SELECT subject, marks, status FROM results
+        WHERE student_id=? AND year=? AND term=?
+        ORDER BY created_at DESC
+    """, (student_id, year, term)).fetchall()
+    conn.execute("DELETE FROM student_summary WHERE student_id=? AND year=? AND term=?",
+                 (student_id, year, term))
+    if rows:
+        summary = summarize_results(rows)
+        conn.execute("""
+            INSERT INTO student_summary
+            (student_id, year, term, total_subjects, total_marks, passed,
+             best_subject, best_score, weak_subject, weak_score)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (student_id, year, term, summary["total_subjects"], summary["total_marks"],
+              summary["passed"], summary["best_subject"], summary["best_score"],
+              summary["weak_subject"], summary["weak_score"]))
+
+
+def rebuild_student_summaries(conn):
+    """Recompute student_summary from scratch (one pass over results)"""
+    conn.execute("DELETE FROM student_summary")
+    keys = conn.execute("SELECT DISTINCT student_id, term, year FROM results").fetchall()
+    for student_id, term, year in keys:
+        refresh_student_summary(conn, student_id, term, year)
+    return len(keys)
+
+
+# ---------------------- STUDENT IDS ----------------------
+# Student IDs are stored trimmed and upper-case, so what a student types on
+# the login page is normalized the same way and found through the UNIQUE
+# index. Old rows that couldn't be normalized (the upper-case ID was already
+# taken) are still reachable through idx_students_id_nocase.
+def normalize_student_id(student_id):
+    return (student_id or "").strip().upper()
+
+
+def find_student(conn, student_id):
+    """students row for an ID typed in any case, or None - never a table scan"""
+    student_id = normalize_student_id(student_id)
+    row = conn.execute("SELECT * FROM students WHERE student_id=?", (student_id,)).fetchone()
+    if row is None:
+        row = conn.execute("SELECT * FROM students WHERE student_id=? COLLATE NOCASE", (student_id,)).fetchone()
+    return row
+
+
+def normalize_stored_student_ids(conn):
+    rows = conn.execute("SELECT id, student_id FROM students "
+                        "WHERE student_id <> UPPER(TRIM(student_id))").fetchall()
+    for row_id, student_id in rows:
+        try:
+            conn.execute("UPDATE students SET student_id=? WHERE id=?", (normalize_student_id(student_id), row_id))
+        except sqlite3.IntegrityError:
+            log.warning("student ID clashes once upper-cased; left as is", extra={"student_id": student_id})
+
+
+# ---------------------- STUDENT SEARCH INDEX ----------------------
+# students_fts is an FTS5 index over student_id, name, surname and class,
+# stored as an external-content table (it reads text from students, so it
+# only costs the index) and kept in sync by triggers. Every query word is
+# matched as a prefix, which is what autocomplete needs. Builds without
+# FTS5 skip the index and search falls back to LIKE.
+STUDENT_SEARCH_LIMIT = 10
+STUDENT_SEARCH_MAX_LIMIT = 50
+# Only this many matches are scored. Ranking every match of a very common
+# prefix ("form") costs tens of ms; autocomplete narrows long before that matters.
+STUDENT_SEARCH_CANDIDATES = 200
+STUDENT_SEARCH_SQL = """
+    SELECT s.id, s.student_id, s.name, s.surname, s.class
+    FROM (
+        SELECT rowid, bm25(students_fts, 10.0, 4.0, 4.0, 1.0) AS score
+        FROM students_fts WHERE students_fts MATCH ? LIMIT ?
+    ) m JOIN students s ON s.id = m.rowid
+    ORDER BY m.score
+    LIMIT ?
+"""
+_search_index_ready = {}
+
+
+def fts5_available(conn):
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def create_student_search_index(conn):
+    if not fts5_available(conn):
+        log.warning("SQLite was built without FTS5; student search will use LIKE")
+        return
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+            student_id, name, surname, class,
+            content='students', content_rowid='id', prefix='1 2 3'
         )
     """)
-
-    # Default admins
-    admins = [
-        ("A001", "Mr. Banda", "superadmin", "admin123"),
-        ("A002", "Mrs. Chikomo", "finance", "canteen321"),
-        ("A003", "Mr. Dube", "registry", "register999")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS students_fts_insert AFTER INSERT ON students BEGIN
+            INSERT INTO students_fts (rowid, student_id, name, surname, class)
+            VALUES (NEW.id, NEW.student_id, NEW.name, NEW.surname, NEW.class);
+        END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS students_fts_delete AFTER DELETE ON students BEGIN
+            INSERT INTO students_fts (students_fts, rowid, student_id, name, surname, class)
+            VALUES ('delete', OLD.id, OLD.student_id, OLD.name, OLD.surname, OLD.class);
+        END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS students_fts_update
+        AFTER UPDATE OF student_id, name, surname, class ON students BEGIN
+            INSERT INTO students_fts (students_fts, rowid, student_id, name, surname, class)
+            VALUES ('delete', OLD.id, OLD.student_id, OLD.name, OLD.surname, OLD.class);
+            INSERT INTO students_fts (rowid, student_id, name, surname, class)
+            VALUES (NEW.id, NEW.student_id, NEW.name, NEW.surname, NEW.class);
+        END""")
+    conn.execute("INSERT INTO students_fts (students_fts) VALUES ('rebuild')")
+
+
+def student_match_expression(text):
+    """'jo sm' -> '"jo"* AND "sm"*' (None when there is nothing to search for)"""
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " AND ".join(f'"{word}"*' for word in words)
+
+
+def search_students(text, limit=STUDENT_SEARCH_LIMIT):
+    """Best matches for `text` (prefix per word), best first, without passwords"""
+    match = student_match_expression(text)
+    if match is None:
+        return []
+    with get_db(DATABASE_STUDENTS) as conn:
+        if DATABASE_STUDENTS not in _search_index_ready:
+            _search_index_ready[DATABASE_STUDENTS] = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name='students_fts'").fetchone() is not None
+        if _search_index_ready[DATABASE_STUDENTS]:
+            # bm25 weights: an ID hit counts most, then surname/name, then class
+            rows = conn.execute(STUDENT_SEARCH_SQL, (match, STUDENT_SEARCH_CANDIDATES, limit)).fetchall()
+        else:
+            like = f"%{text}%"
+            rows = conn.execute("""
+                SELECT id, student_id, name, surname, class FROM students
+                WHERE student_id LIKE ? OR name LIKE ? OR surname LIKE ? OR class LIKE ?
+                LIMIT ?
+            """, (like, like, like, like, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+
+# ---------------------- SCHEMA MIGRATIONS ----------------------
+# Steps are grouped by component (students, teachers, results) and each
+# file records how many of a component's steps it has applied in
+# schema_version, so existing .db files pick up new indexes/columns on the
+# next start - whether the components live in separate files or one.
+# Only ever append steps - never edit one that has shipped.
+def row_count_steps(table):
+    """stats table + triggers keeping stats[table] equal to COUNT(*)"""
+    return [
+        "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)",
+        f"INSERT OR REPLACE INTO stats (name, value) SELECT '{table}', COUNT(*) FROM {table}",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_count_insert AFTER INSERT ON {table}
+            BEGIN UPDATE stats SET value = value + 1 WHERE name = '{table}'; END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_count_delete AFTER DELETE ON {table}
+            BEGIN UPDATE stats SET value = value - 1 WHERE name = '{table}'; END""",
     ]
 
-    for admin in admins:
-        try:
-            c.execute("INSERT INTO admins (admin_id, name, role, password) VALUES (?, ?, ?, ?)", admin)
-        except:
-            pass
 
-    conn.commit()
-    conn.close()
+MIGRATIONS = {
+    "students": [
+        # 1: trigger-maintained row count for /api/statistics
+        row_count_steps("students"),
+        # 2: FTS5 index for /search_student and /search_students
+        [create_student_search_index],
+        # 3: trimmed upper-case student IDs, plus a NOCASE index for any
+        #    that clash (so no login lookup scans the table)
+        [
+            normalize_stored_student_ids,
+            "CREATE INDEX IF NOT EXISTS idx_students_id_nocase ON students(student_id COLLATE NOCASE)",
+        ],
+    ],
+    "teachers": [
+        # 1: trigger-maintained row count for /api/statistics
+        row_count_steps("teachers"),
+    ],
+    "results": [
+        # 1: indexes for /get_results filters (ORDER BY created_at DESC)
+        #    and /student_results (student_id ORDER BY year, term, created_at)
+        [
+            "CREATE INDEX IF NOT EXISTS idx_results_form_subject_term ON results(form, subject, term, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_results_form_created ON results(form, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_results_subject_term ON results(subject, term, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_results_term_created ON results(term, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_results_created ON results(created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_results_student ON results(student_id, year, term, created_at)",
+        ],
+        # 2: rows per subject, so COUNT(DISTINCT subject) becomes a count of
+        #    a table with one row per subject instead of a scan of results
+        [
+            "CREATE TABLE IF NOT EXISTS subject_counts (subject TEXT PRIMARY KEY, n INTEGER NOT NULL)",
+            """INSERT OR REPLACE INTO subject_counts (subject, n)
+               SELECT subject, COUNT(*) FROM results WHERE subject IS NOT NULL GROUP BY subject""",
+            """CREATE TRIGGER IF NOT EXISTS results_subject_insert AFTER INSERT ON results
+               WHEN NEW.subject IS NOT NULL
+               BEGIN
+                   INSERT INTO subject_counts (subject, n) VALUES (NEW.subject, 1)
+                   ON CONFLICT(subject) DO UPDATE SET n = n + 1;
+               END""",
+            """CREATE TRIGGER IF NOT EXISTS results_subject_delete AFTER DELETE ON results
+               WHEN OLD.subject IS NOT NULL
+               BEGIN
+                   UPDATE subject_counts SET n = n - 1 WHERE subject = OLD.subject;
+                   DELETE FROM subject_counts WHERE subject = OLD.subject AND n <= 0;
+               END""",
+            """CREATE TRIGGER IF NOT EXISTS results_subject_update AFTER UPDATE OF subject ON results
+               WHEN OLD.subject IS NOT NEW.subject
+               BEGIN
+                   UPDATE subject_counts SET n = n - 1 WHERE subject = OLD.subject;
+                   DELETE FROM subject_counts WHERE subject = OLD.subject AND n <= 0;
+                   INSERT INTO subject_counts (subject, n) SELECT NEW.subject, 1 WHERE NEW.subject IS NOT NULL
+                   ON CONFLICT(subject) DO UPDATE SET n = n + 1;
+               END""",
+        ],
+        # 3: per student per term/year statistics for /student_results
+        [
+            """CREATE TABLE IF NOT EXISTS student_summary (
+                   student_id TEXT,
+                   year INTEGER,
+                   term TEXT,
+                   total_subjects INTEGER NOT NULL,
+                   total_marks INTEGER NOT NULL,
+                   passed INTEGER NOT NULL,
+                   best_subject TEXT,
+                   best_score INTEGER,
+                   weak_subject TEXT,
+                   weak_score INTEGER,
+                   PRIMARY KEY (student_id, year, term)
+               )""",
+            rebuild_student_summaries,
+        ],
+        # 4: results follow the normalized student IDs (students step 3)
+        [
+            """UPDATE OR IGNORE results SET student_id = UPPER(TRIM(student_id))
+               WHERE student_id <> UPPER(TRIM(student_id))""",
+            rebuild_student_summaries,
+        ],
+        # 5: change sequence for /get_results?since=. Every insert, update
+        #    and delete takes the next number from sequences['results'];
+        #    deleted ids (including rows INSERT OR REPLACE replaced - delete
+        #    triggers fire for those under recursive_triggers) are kept in
+        #    results_deleted with theirs
+        [
+            "ALTER TABLE results ADD COLUMN change_seq INTEGER",
+            "CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+            "UPDATE results SET change_seq = id",
+            "INSERT OR REPLACE INTO sequences (name, value) SELECT 'results', COALESCE(MAX(id), 0) FROM results",
+            "CREATE INDEX IF NOT EXISTS idx_results_change_seq ON results(change_seq)",
+            """CREATE TABLE IF NOT EXISTS results_deleted (
+                   id INTEGER PRIMARY KEY,
+                   change_seq INTEGER NOT NULL,
+                   deleted_at TEXT DEFAULT (datetime('now'))
+               )""",
+            "CREATE INDEX IF NOT EXISTS idx_results_deleted_seq ON results_deleted(change_seq)",
+            """CREATE TRIGGER IF NOT EXISTS results_seq_insert AFTER INSERT ON results
+               BEGIN
+                   UPDATE sequences SET value = value + 1 WHERE name = 'results';
+                   UPDATE results SET change_seq = (SELECT value FROM sequences WHERE name = 'results')
+                   WHERE id = NEW.id;
+               END""",
+            # The WHEN skips the trigger's own change_seq updates
+            """CREATE TRIGGER IF NOT EXISTS results_seq_update AFTER UPDATE ON results
+               WHEN NEW.change_seq IS OLD.change_seq
+               BEGIN
+                   UPDATE sequences SET value = value + 1 WHERE name = 'results';
+                   UPDATE results SET change_seq = (SELECT value FROM sequences WHERE name = 'results')
+                   WHERE id = NEW.id;
+               END""",
+            """CREATE TRIGGER IF NOT EXISTS results_seq_delete AFTER DELETE ON results
+               BEGIN
+                   UPDATE sequences SET value = value + 1 WHERE name = 'results';
+                   INSERT OR REPLACE INTO results_deleted (id, change_seq)
+                   VALUES (OLD.id, (SELECT value FROM sequences WHERE name = 'results'));
+               END""",
+        ],
+        # 6: one form's term for /analytics (change_seq makes the cache
+        #    check an index-only read)
+        [
+            "CREATE INDEX IF NOT EXISTS idx_results_form_year_term ON results(form, year, term, change_seq)",
+        ],
+    ],
+}
+
+
+def component_paths():
+    return {"students": DATABASE_STUDENTS, "teachers": DATABASE_TEACHERS, "results": DATABASE_RESULTS}
+
+
+def schema_version(conn, component):
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (component TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+    row = conn.execute("SELECT version FROM schema_version WHERE component=?", (component,)).fetchone()
+    if row:
+        return row[0]
+    if SINGLE_DATABASE:
+        return 0
+    # Separate files migrated before schema_version existed used user_version
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(paths=None):
+    """Apply any migration steps a database file hasn't seen yet"""
+    applied = []
+    for component, path in (paths or component_paths()).items():
+        steps = MIGRATIONS[component]
+        with get_db(path) as conn:
+            while True:
+                # One transaction per step so a crash can't leave it half done.
+                # The version is read under the write lock: a worker starting
+                # at the same moment may have just applied this step.
+                conn.execute("BEGIN IMMEDIATE")
+                version = schema_version(conn, component)
+                if version >= len(steps):
+                    conn.commit()
+                    break
+                for statement in steps[version]:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute("INSERT OR REPLACE INTO schema_version (component, version) VALUES (?, ?)",
+                             (component, version + 1))
+                conn.commit()
+                applied.append((path, component, version + 1))
+    return applied
+
+
+# Deleted-result ids older than this are dropped at startup; a client whose
+# ?since= is older than the newest one dropped has to reload in full
+RESULT_TOMBSTONE_DAYS = 30
+
+
+def prune_result_tombstones():
+    with get_db(DATABASE_RESULTS) as conn:
+        cutoff = conn.execute("SELECT MAX(change_seq) FROM results_deleted WHERE deleted_at < datetime('now', ?)",
+                              (f"-{RESULT_TOMBSTONE_DAYS} days",)).fetchone()[0]
+        if cutoff is not None:
+            conn.execute("DELETE FROM results_deleted WHERE change_seq <= ?", (cutoff,))
+            conn.execute("INSERT OR REPLACE INTO sequences (name, value) VALUES ('results_pruned', ?)", (cutoff,))
 
 
 # RUN INITIALIZERS
+# Under gunicorn with preload_app (gunicorn.conf.py) this happens once, in
+# the master, before any worker is forked
 init_databases()
 init_admin_database()
+run_migrations()
+prune_result_tombstones()
+
+
+def warm_worker():
+    """Fill the statistics cache, start the job dispatcher and open this thread's connections.
+
+    Called by gunicorn in each new worker (post_fork). The connections only
+    help the sync worker class, which serves requests on this thread;
+    gthread and uvicorn run requests on threads of their own, and those
+    open their connections on first use (see ConnectionPool).
+    """
+    paths = set(component_paths().values()) | {DATABASE_ADMIN}
+    if SESSION_STORE == "sqlite":
+        paths.add(SESSION_DATABASE)
+    for path in paths:
+        with get_db(path):
+            pass
+    cached_statistics_counts()
+    jobs.start()
 
 
-# ---------------------- SERVE INDEX.HTML ----------------------
-@app.route("/")
-def home():
-    return send_from_directory(".", "index.html")
+# ---------------------- STATISTICS API FOR INDEX PAGE ----------------------
+# The counts are kept up to date by triggers (see MIGRATIONS), so a refresh
+# is three primary-key reads. On top of that each worker caches them for
+# STATS_CACHE_TTL seconds; writes in this worker invalidate straight away,
+# writes in other workers show up once the TTL runs out.
+STATS_CACHE_TTL = 10
+
+_stats_cache = {"counts": None, "expires": 0.0}
+_stats_lock = threading.Lock()
+
+
+def read_statistics_counts():
+    if SINGLE_DATABASE:
+        with get_db(SINGLE_DATABASE) as conn:
+            return tuple(conn.execute("""
+                SELECT (SELECT value FROM stats WHERE name='students'),
+                       (SELECT value FROM stats WHERE name='teachers'),
+                       (SELECT COUNT(*) FROM subject_counts)
+            """).fetchone())
+    with get_db(DATABASE_STUDENTS) as conn:
+        student_count = conn.execute("SELECT value FROM stats WHERE name='students'").fetchone()[0]
+    with get_db(DATABASE_TEACHERS) as conn:
+        teacher_count = conn.execute("SELECT value FROM stats WHERE name='teachers'").fetchone()[0]
+    with get_db(DATABASE_RESULTS) as conn:
+        subject_count = conn.execute("SELECT COUNT(*) FROM subject_counts").fetchone()[0]
+    return student_count, teacher_count, subject_count
+
+
+def cached_statistics_counts():
+    now = time.monotonic()
+    with _stats_lock:
+        if _stats_cache["counts"] is not None and _stats_cache["expires"] > now:
+            return _stats_cache["counts"]
+    counts = read_statistics_counts()
+    with _stats_lock:
+        _stats_cache["counts"] = counts
+        _stats_cache["expires"] = now + STATS_CACHE_TTL
+    return counts
+
+
+def invalidate_statistics():
+    with _stats_lock:
+        _stats_cache["expires"] = 0.0
+
+
+def build_statistics():
+    """The numbers the index page shows (also pushed to it, see CHANGE EVENTS)"""
+    student_count, teacher_count, subject_count = cached_statistics_counts()
+    
+    # Calculate uptime
+    uptime_delta = datetime.now() - SERVER_START_TIME
+    uptime_hours = int(uptime_delta.total_seconds() / 3600)
+    uptime_minutes = int((uptime_delta.total_seconds() % 3600) / 60)
+    
+    # Share of requests answered without a server error since start
+    uptime_percent = metrics.availability() if metrics.ENABLED else "N/A"
+    uptime_hours_str = f"{uptime_hours}h {uptime_minutes}m"
+    
+    return {
+        "students": student_count,
+        "teachers": teacher_count,
+        "subjects": subject_count if subject_count > 0 else 15,  # Default to 15 if no results yet
+        "uptime": uptime_percent,
+        "uptime_hours": uptime_hours_str
+    }
 
 
-# ---------------------- STATISTICS API FOR INDEX PAGE ----------------------
 @app.route("/api/statistics")
 def get_statistics():
     """Get real-time statistics for the index page"""
     try:
-        # Count students
-        conn_students = sqlite3.connect(DATABASE_STUDENTS)
-        c_students = conn_students.cursor()
-        c_students.execute("SELECT COUNT(*) FROM students")
-        student_count = c_students.fetchone()[0]
-        conn_students.close()
-        
-        # Count teachers
-        conn_teachers = sqlite3.connect(DATABASE_TEACHERS)
-        c_teachers = conn_teachers.cursor()
-        c_teachers.execute("SELECT COUNT(*) FROM teachers")
-        teacher_count = c_teachers.fetchone()[0]
-        conn_teachers.close()
-        
-        # Count unique subjects from results
-        conn_results = sqlite3.connect(DATABASE_RESULTS)
-        c_results = conn_results.cursor()
-        c_results.execute("SELECT COUNT(DISTINCT subject) FROM results")
-        subject_count = c_results.fetchone()[0]
-        conn_results.close()
-        
-        # Calculate uptime
-        uptime_delta = datetime.now() - SERVER_START_TIME
-        uptime_hours = int(uptime_delta.total_seconds() / 3600)
-        uptime_minutes = int((uptime_delta.total_seconds() % 3600) / 60)
-        
-        # Calculate uptime percentage (assume 99.9% for a well-running system)
-        uptime_percent = "99.9%"
-        uptime_hours_str = f"{uptime_hours}h {uptime_minutes}m"
-        
-        statistics = {
-            "students": student_count,
-            "teachers": teacher_count,
-            "subjects": subject_count if subject_count > 0 else 15,  # Default to 15 if no results yet
-            "uptime": uptime_percent,
-            "uptime_hours": uptime_hours_str
-        }
-        
-        return jsonify({
+        response = jsonify({
             "success": True,
-            "statistics": statistics
+            "statistics": build_statistics()
         })
+        # The body only changes when a count or the uptime minute changes, so
+        # most polls get an empty 304 back
+        response.add_etag()
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
         
     except Exception as e:
-        print(f"Error fetching statistics: {str(e)}")
+        log.exception("statistics failed")
         # Return fallback data
         return jsonify({
             "success": False,
@@ -189,37 +833,359 @@ def get_statistics():
                 "students": 0,
                 "teachers": 0,
                 "subjects": 15,
-                "uptime": "99.9%",
+                "uptime": "N/A",
                 "uptime_hours": "0h 0m"
             }
         })
 
 
-# ============ ADMIN ROUTES ============
-
-@app.route("/admin")
-def admin_login_page():
-    return send_from_directory("admin/adminlogin", "adminlogin.html")
-
-@app.route("/admin/adminlogin.css")
-def admin_login_css():
-    return send_from_directory("admin/adminlogin", "adminlogin.css")
-
-@app.route("/admin/adminlogin.js")
-def admin_login_js():
-    return send_from_directory("admin/adminlogin", "adminlogin.js")
+# ---------------------- RESPONSE CACHE ----------------------
+# GET responses of the read-heavy list endpoints are kept per worker, keyed by
+# path + query string, in an LRU bounded by total body size. Every write goes
+# through data_changed(table), which drops exactly the entries built from that
+# table. Writes made by another worker can't reach this cache, so entries
+# also expire after RESPONSE_CACHE_TTL seconds.
+RESPONSE_CACHE_BYTES = int(os.environ.get("RESPONSE_CACHE_BYTES", 32 * 1024 * 1024))
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", 30))
+
+
+class ResponseCache:
+    """Byte-bounded LRU of (body, mimetype, etag) tagged with the tables they read"""
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_BYTES, ttl=RESPONSE_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["expires"] < now:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, tables, body, mimetype, etag):
+        # One huge export shouldn't flush everything else
+        if len(body) > self.max_bytes // 8:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = {"tables": tables, "body": body, "mimetype": mimetype,
+                                  "etag": etag, "expires": time.monotonic() + self.ttl}
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        self.size -= len(self._entries.pop(key)["body"])
+
+    def invalidate(self, *tables):
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if not e["tables"].isdisjoint(tables)]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "invalidations": self.invalidations}
+
+
+response_cache = ResponseCache()
+
+
+def data_changed(*tables):
+    """Call after writing to `tables`: drops cached responses and statistics"""
+    response_cache.invalidate(*tables)
+    invalidate_statistics()
+
+
+def cached_response(*tables, version=None):
+    """Route decorator: serve GETs from response_cache, with ETag/304 support
+
+    Only plain 200 responses are stored; streamed exports and errors always
+    go to the view. The key is the URL, not the caller, so checks on who is
+    asking belong in decorators above this one (see require_own_results).
+
+    data_changed() only reaches this worker's cache; until the TTL runs out
+    the others keep answering from before the write. `version()`, a cheap
+    read of something every write to `tables` changes, joins the key so a
+    change made anywhere is seen at once.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (request.full_path, request.headers.get("Accept", ""), version() if version else None)
+            entry = response_cache.get(key)
+            if entry is not None:
+                response = Response(entry["body"], mimetype=entry["mimetype"])
+                response.set_etag(entry["etag"])
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                response.add_etag()
+                response_cache.put(key, frozenset(tables), response.get_data(),
+                                   response.mimetype, response.get_etag()[0])
+            response.headers["Cache-Control"] = "no-cache"
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+
+# ---------------------- CHANGE EVENTS ----------------------
+# Writes publish what changed (events.publish, after data_changed) and
+# GET /events?topics=... streams it to open pages as server-sent events:
+# "statistics" for the index page, "results" for the teacher dashboard,
+# "students" and "teachers" for the admin side. Everything but statistics
+# needs a teacher or admin login.
+EVENTS_DATABASE = SINGLE_DATABASE or "events.db"
+PRIVATE_TOPICS = {"students", "teachers", "results"}
+
+
+def pushed_statistics():
+    # The change may have been made by another worker, which this worker's
+    # statistics cache hasn't heard about
+    invalidate_statistics()
+    return build_statistics()
+
+
+events.init_app(app, EVENTS_DATABASE, get_db, pushed_statistics)
+
+
+@app.route("/events")
+def event_stream():
+    """Server-sent events for the comma-separated ?topics= (default statistics)"""
+    topics = {t.strip() for t in request.args.get("topics", "statistics").split(",") if t.strip()}
+    unknown = topics - events.TOPICS
+    if unknown:
+        return jsonify({"success": False, "message": f"Unknown topic(s): {', '.join(sorted(unknown))}"}), 400
+    if topics & PRIVATE_TOPICS and REQUIRE_SESSIONS:
+        session = current_session()
+        if session is None:
+            return jsonify({"success": False, "message": "Please log in"}), 401
+        if session["role"] not in ("teacher", "admin"):
+            return jsonify({"success": False, "message": "Not allowed"}), 403
+    return events.stream_response(topics or {"statistics"})
 
-@app.route("/admin/dashboard")
-def admin_dashboard():
-    return send_from_directory("admin/templates", "admin_dashboard.html")
 
-@app.route("/admin/static/admin_dashboard.css")
-def admin_dashboard_css():
-    return send_from_directory("admin/static", "admin_dashboard.css")
+# ============ ADMIN ROUTES ============
 
-@app.route("/admin/static/admin_dashboard.js")
-def admin_dashboard_js():
-    return send_from_directory("admin/static", "admin_dashboard.js")
+# ---------------------- CREDENTIALS ----------------------
+def upgrade_password_hash(path, table, row_id, new_hash):
+    """Store the hash verify_password() returned for a plaintext/old-hash row"""
+    with get_db(path) as conn:
+        conn.execute(f"UPDATE {table} SET password=? WHERE id=?", (new_hash, row_id))
+    response_cache.invalidate(table)
+
+
+# ---------------------- SESSIONS ----------------------
+# The three login endpoints issue a signed session token (returned in the
+# JSON and set as an HttpOnly cookie). Requests are checked against an
+# in-process LRU of live sessions, so no database read per request. With
+# several gunicorn workers set SESSION_STORE=sqlite: sessions are then also
+# written to SESSION_DATABASE and a worker that hasn't seen one yet loads it
+# from there once.
+SESSION_COOKIE = "session"
+SESSION_TTL = int(os.environ.get("SESSION_TTL", 8 * 3600))
+SESSION_CACHE_SIZE = 10000
+SESSION_STORE = os.environ.get("SESSION_STORE", "memory")
+SESSION_DATABASE = SINGLE_DATABASE or "sessions.db"
+# Set REQUIRE_SESSIONS=0 to let /student_results answer without a login
+REQUIRE_SESSIONS = os.environ.get("REQUIRE_SESSIONS", "1") != "0"
+SECRET_KEY_FILE = ".secret_key"
+
+
+def load_secret_key():
+    """SECRET_KEY from the environment, else one generated once and kept on disk
+
+    Every worker has to sign with the same key, so a per-process random key
+    won't do.
+    """
+    if os.environ.get("SECRET_KEY"):
+        return os.environ["SECRET_KEY"]
+    try:
+        fd = os.open(SECRET_KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    except FileExistsError:
+        pass
+    # Another worker may have just created it; wait until it's written
+    for _ in range(50):
+        with open(SECRET_KEY_FILE) as f:
+            key = f.read().strip()
+        if key:
+            return key
+        time.sleep(0.01)
+    raise RuntimeError(f"{SECRET_KEY_FILE} is empty")
+
+
+app.config["SECRET_KEY"] = load_secret_key()
+
+
+class SessionStore:
+    """LRU + TTL cache of live sessions, optionally backed by SQLite"""
+
+    def __init__(self, max_size=SESSION_CACHE_SIZE, ttl=SESSION_TTL, db_path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.db_path = db_path
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if db_path:
+            with get_db(db_path) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS sessions (
+                        sid TEXT PRIMARY KEY,
+                        role TEXT,
+                        user_id TEXT,
+                        name TEXT,
+                        expires REAL
+                    )
+                """)
+                conn.execute("DELETE FROM sessions WHERE expires < ?", (time.time(),))
+
+    def _remember(self, session):
+        with self._lock:
+            self._sessions[session["sid"]] = session
+            self._sessions.move_to_end(session["sid"])
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+
+    def create(self, role, user_id, name):
+        session = {
+            "sid": secrets.token_urlsafe(24),
+            "role": role,
+            "user_id": user_id,
+            "name": name,
+            "expires": time.time() + self.ttl,
+        }
+        if self.db_path:
+            with get_db(self.db_path) as conn:
+                conn.execute("INSERT INTO sessions (sid, role, user_id, name, expires) VALUES (?, ?, ?, ?, ?)",
+                             (session["sid"], role, user_id, name, session["expires"]))
+        self._remember(session)
+        return session
+
+    def get(self, sid):
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(sid)
+            if session is not None:
+                if session["expires"] < now:
+                    del self._sessions[sid]
+                    return None
+                self._sessions.move_to_end(sid)
+                self.hits += 1
+                return session
+            self.misses += 1
+        if not self.db_path:
+            return None
+        with get_db(self.db_path) as conn:
+            row = conn.execute("SELECT * FROM sessions WHERE sid=? AND expires >= ?", (sid, now)).fetchone()
+        if row is None:
+            return None
+        session = dict(row)
+        self._remember(session)
+        return session
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+        if self.db_path:
+            with get_db(self.db_path) as conn:
+                conn.execute("DELETE FROM sessions WHERE sid=?", (sid,))
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._sessions), "hits": self.hits, "misses": self.misses,
+                    "shared_store": bool(self.db_path)}
+
+
+session_store = SessionStore(db_path=SESSION_DATABASE if SESSION_STORE == "sqlite" else None)
+
+
+def sign_session(sid):
+    mac = hmac.new(app.config["SECRET_KEY"].encode(), sid.encode(), hashlib.sha256).digest()
+    return f"{sid}.{base64.urlsafe_b64encode(mac[:18]).decode()}"
+
+
+def current_session():
+    """Session for this request (Bearer token or cookie), or None"""
+    if "session" in g:
+        return g.session
+    token = request.cookies.get(SESSION_COOKIE, "")
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer "):
+        token = auth[7:].strip()
+    session = None
+    sid, _, _ = token.partition(".")
+    # Forged tokens are rejected by the signature without touching the store
+    if sid and hmac.compare_digest(sign_session(sid), token):
+        session = session_store.get(sid)
+    g.session = session
+    return session
+
+
+def require_session(*roles):
+    """Route decorator: 401 without a live session, 403 for other roles"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if REQUIRE_SESSIONS:
+                session = current_session()
+                if session is None:
+                    return jsonify({"success": False, "message": "Please log in"}), 401
+                if roles and session["role"] not in roles:
+                    return jsonify({"success": False, "message": "Not allowed"}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def login_response(payload, role, user_id, name):
+    """jsonify(payload) plus a new session token and cookie"""
+    session = session_store.create(role, user_id, name)
+    token = sign_session(session["sid"])
+    response = jsonify(dict(payload, token=token))
+    response.set_cookie(SESSION_COOKIE, token, max_age=SESSION_TTL, httponly=True, samesite="Lax")
+    return response
+
+
+@app.route("/session", methods=["GET"])
+def get_session():
+    session = current_session()
+    if session is None:
+        return jsonify({"success": False, "message": "Not logged in"}), 401
+    return jsonify({"success": True, "role": session["role"], "id": session["user_id"], "name": session["name"]})
+
+
+@app.route("/logout", methods=["POST"])
+def logout():
+    session = current_session()
+    if session is not None:
+        session_store.delete(session["sid"])
+    response = jsonify({"success": True})
+    response.delete_cookie(SESSION_COOKIE)
+    return response
 
 
 # ---------------------- ADMIN LOGIN API ----------------------
@@ -229,66 +1195,241 @@ def admin_login():
     admin_id = data.get("adminId")
     password = data.get("password")
 
-    conn = sqlite3.connect(DATABASE_ADMIN)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-
-    c.execute("SELECT * FROM admins WHERE admin_id=?", (admin_id,))
-    admin = c.fetchone()
-    conn.close()
+    with get_db(DATABASE_ADMIN) as conn:
+        admin = conn.execute("SELECT * FROM admins WHERE admin_id=?", (admin_id,)).fetchone()
 
     if not admin:
+        auth_log.info("admin login: unknown id", extra={"admin_id": admin_id})
         return jsonify({"success": False, "message": "Admin ID not found"})
 
-    if admin["password"] != password:
+    try:
+        ok, new_hash = verify_password(password, admin["password"])
+    except CredentialsBusy as e:
+        auth_log.warning("admin login: hash pool busy", extra={"admin_id": admin_id})
+        return jsonify({"success": False, "message": str(e)}), 503
+    if not ok:
+        auth_log.warning("admin login: wrong password", extra={"admin_id": admin_id})
         return jsonify({"success": False, "message": "Incorrect password"})
+    if new_hash:
+        upgrade_password_hash(DATABASE_ADMIN, "admins", admin["id"], new_hash)
+    auth_log.info("admin login ok", extra={"admin_id": admin_id})
 
-    return jsonify({
+    return login_response({
         "success": True,
         "redirect": "/admin/dashboard",
         "role": admin["role"],
         "name": admin["name"]
-    })
+    }, "admin", admin["admin_id"], admin["name"])
+
+
+# ---------------------- PAGINATION ----------------------
+# List endpoints accept ?limit=&cursor=&fields=. Paging is keyset based
+# (WHERE id > last_id, never OFFSET) so page 500 costs the same as page 1.
+# Without limit/cursor the old full-list response is kept for old clients.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# Never listed or accepted in ?fields=: hashes, or plaintext for accounts
+# that haven't logged in since hashing was introduced
+SECRET_COLUMNS = {"password"}
+
+_table_columns = {}
+
+
+class PageArgsError(ValueError):
+    """Bad limit/cursor/fields query parameter (answered with a 400)"""
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PageArgsError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise PageArgsError("Invalid cursor")
+    return values
+
+
+def table_columns(path, table):
+    key = (path, table)
+    if key not in _table_columns:
+        with get_db(path) as conn:
+            _table_columns[key] = [row["name"] for row in conn.execute(f"PRAGMA table_info({table})")]
+    return _table_columns[key]
+
+
+def listable_columns(path, table):
+    return [c for c in table_columns(path, table) if c not in SECRET_COLUMNS]
+
+
+def page_args(path, table, keys):
+    """Parse limit/cursor/fields for a listing of `table`.
+
+    `keys` are the columns the keyset is ordered by; they are always
+    selected so the next cursor can be built. Returns
+    (paged, limit, cursor_values, columns_sql).
+    """
+    limit = request.args.get("limit")
+    cursor = request.args.get("cursor")
+    fields = request.args.get("fields")
+    paged = limit is not None or cursor is not None
+
+    if limit is None:
+        limit = DEFAULT_PAGE_SIZE if paged else None
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise PageArgsError("limit must be a number")
+        if limit < 1:
+            raise PageArgsError("limit must be at least 1")
+        limit = min(limit, MAX_PAGE_SIZE)
+
+    known = listable_columns(path, table)
+    columns = ", ".join(known)
+    if fields:
+        wanted = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in wanted if f not in known]
+        if unknown:
+            raise PageArgsError(f"Unknown field(s): {', '.join(unknown)}")
+        # Names are checked against the schema above, so safe to inline
+        columns = ", ".join([k for k in keys if k not in wanted] + wanted)
+
+    cursor_values = decode_cursor(cursor, len(keys)) if cursor else None
+    return paged, limit, cursor_values, columns
+
+
+def finish_page(rows, limit, keys):
+    """Trim the extra look-ahead row and build the next cursor"""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([rows[-1][k] for k in keys])
+
+
+def build_list_query(table, columns="*", cursor=None, limit=None):
+    """SELECT for an id-ordered listing of students/teachers"""
+    query = f"SELECT {columns} FROM {table}"
+    params = []
+    if cursor:
+        query += " WHERE id > ?"
+        params.append(cursor[0])
+    query += " ORDER BY id"
+    if limit is not None:
+        # One extra row tells us whether there is a next page
+        query += " LIMIT ?"
+        params.append(limit + 1)
+    return query, params
+
+
+def list_table(path, table):
+    """Shared body of /get_students, /get_teachers: (rows, next_cursor, paged)"""
+    paged, limit, cursor, columns = page_args(path, table, ["id"])
+    query, params = build_list_query(table, columns, cursor, limit)
+    with get_db(path) as conn:
+        rows = [dict(row) for row in conn.execute(query, params)]
+    rows, next_cursor = finish_page(rows, limit, ["id"])
+    return rows, next_cursor, paged
+
+
+# ---------------------- STREAMING RESPONSES ----------------------
+# Large exports are streamed straight off the cursor instead of being built
+# into one list first, so worker memory stays flat and the first rows reach
+# the browser immediately. Ask for it with ?stream=1 (a JSON array, same
+# shape as the normal response) or ?stream=ndjson / Accept: application/x-ndjson.
+STREAM_BATCH_SIZE = 500
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def stream_format():
+    """'ndjson', 'json' or None if the client didn't ask for streaming"""
+    stream = request.args.get("stream", "")
+    if stream == "ndjson" or NDJSON_MIMETYPE in request.accept_mimetypes.values():
+        return "ndjson"
+    if stream in ("1", "true", "json"):
+        return "json"
+    return None
+
+
+def stream_rows(path, query, params, fmt):
+    """Response that runs `query` and yields rows in batches of STREAM_BATCH_SIZE"""
+    def generate():
+        with get_db(path) as conn:
+            cur = conn.execute(query, params)
+            try:
+                first = True
+                if fmt == "json":
+                    yield "["
+                while True:
+                    rows = cur.fetchmany(STREAM_BATCH_SIZE)
+                    if not rows:
+                        break
+                    encoded = [json.dumps(dict(row), default=str) for row in rows]
+                    if fmt == "ndjson":
+                        yield "\n".join(encoded) + "\n"
+                    else:
+                        yield ("" if first else ",") + ",".join(encoded)
+                    first = False
+                if fmt == "json":
+                    yield "]"
+            finally:
+                cur.close()
+
+    mimetype = NDJSON_MIMETYPE if fmt == "ndjson" else "application/json"
+    return Response(generate(), mimetype=mimetype)
 
 
 # ---------------------- STUDENT CRUD ----------------------
 @app.route("/add_student", methods=["POST"])
 def add_student():
     data = request.json
-    conn = sqlite3.connect(DATABASE_STUDENTS)
-    c = conn.cursor()
-    try:
-        c.execute("""
-            INSERT INTO students (student_id, name, surname, class, phone, attendance, age, sex)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (data['sid'], data['name'], data['surname'], data['class'], 
-              data['phone'], data['attendance'], data['age'], data['sex']))
-        conn.commit()
+    try:
+        student_id = normalize_student_id(data['sid'])
+        with get_db(DATABASE_STUDENTS) as conn:
+            conn.execute("""
+                INSERT INTO students (student_id, name, surname, class, phone, attendance, age, sex)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (student_id, data['name'], data['surname'], data['class'], 
+                  data['phone'], data['attendance'], data['age'], data['sex']))
+        data_changed("students")
+        events.publish("students", action="added", student_id=student_id)
         return jsonify({"success": True, "message": "Student added successfully"})
     except Exception as e:
         return jsonify({"success": False, "message": str(e)})
-    finally:
-        conn.close()
 
 
 @app.route("/get_students", methods=["GET"])
+@cached_response("students")
 def get_students():
-    conn = sqlite3.connect(DATABASE_STUDENTS)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT * FROM students")
-    students = [dict(row) for row in c.fetchall()]
-    conn.close()
+    try:
+        students, next_cursor, paged = list_table(DATABASE_STUDENTS, "students")
+    except PageArgsError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    if paged:
+        return jsonify({"data": students, "next_cursor": next_cursor})
     return jsonify(students)
 
 
 @app.route("/delete_student/<int:id>", methods=["DELETE"])
 def delete_student(id):
-    conn = sqlite3.connect(DATABASE_STUDENTS)
-    c = conn.cursor()
-    c.execute("DELETE FROM students WHERE id=?", (id,))
-    conn.commit()
-    conn.close()
+    with get_db(DATABASE_STUDENTS) as conn:
+        if SINGLE_DATABASE:
+            # Results go with the student (ON DELETE CASCADE); drop the
+            # summaries in the same transaction
+            conn.execute("""
+                DELETE FROM student_summary
+                WHERE student_id = (SELECT student_id FROM students WHERE id=?)
+            """, (id,))
+        conn.execute("DELETE FROM students WHERE id=?", (id,))
+    data_changed("students", "results")
+    events.publish("students", action="deleted", id=id)
+    if SINGLE_DATABASE:
+        # Their results went too
+        events.publish("results", action="student_deleted")
     return jsonify({"success": True, "message": "Student deleted"})
 
 
@@ -296,69 +1437,314 @@ def delete_student(id):
 @app.route("/add_teacher", methods=["POST"])
 def add_teacher():
     data = request.json
-    conn = sqlite3.connect(DATABASE_TEACHERS)
-    c = conn.cursor()
-    try:
-        c.execute("""
-            INSERT INTO teachers (teacher_id, name, surname, class, phone, password, role)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (data['teacher_id'], data['name'], data['surname'], data['class'], 
-              data['phone'], data['password'], data['role']))
-        conn.commit()
+    try:
+        password = make_password(data['password']) if data['password'] else None
+        with get_db(DATABASE_TEACHERS) as conn:
+            conn.execute("""
+                INSERT INTO teachers (teacher_id, name, surname, class, phone, password, role)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (data['teacher_id'], data['name'], data['surname'], data['class'], 
+                  data['phone'], password, data['role']))
+        data_changed("teachers")
+        events.publish("teachers", action="added", teacher_id=data['teacher_id'])
         return jsonify({"success": True, "message": "Teacher added successfully"})
     except Exception as e:
         return jsonify({"success": False, "message": str(e)})
-    finally:
-        conn.close()
 
 
 @app.route("/get_teachers", methods=["GET"])
+@cached_response("teachers")
 def get_teachers():
-    conn = sqlite3.connect(DATABASE_TEACHERS)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT * FROM teachers")
-    teachers = [dict(row) for row in c.fetchall()]
-    conn.close()
+    try:
+        teachers, next_cursor, paged = list_table(DATABASE_TEACHERS, "teachers")
+    except PageArgsError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    if paged:
+        return jsonify({"data": teachers, "next_cursor": next_cursor})
     return jsonify(teachers)
 
 
 @app.route("/delete_teacher/<int:id>", methods=["DELETE"])
 def delete_teacher(id):
-    conn = sqlite3.connect(DATABASE_TEACHERS)
-    c = conn.cursor()
-    c.execute("DELETE FROM teachers WHERE id=?", (id,))
-    conn.commit()
-    conn.close()
+    with get_db(DATABASE_TEACHERS) as conn:
+        conn.execute("DELETE FROM teachers WHERE id=?", (id,))
+    data_changed("teachers")
+    events.publish("teachers", action="deleted", id=id)
     return jsonify({"success": True, "message": "Teacher deleted"})
 
 
-# ============ TEACHER ROUTES ============
-
-@app.route("/teacher")
-def teacher_login_page():
-    return send_from_directory("teacher/teacherlogin", "teacherlogin.html")
-
-@app.route("/teacher/teacherlog.css")
-def teacher_login_css():
-    return send_from_directory("teacher/teacherlogin", "teacherlog.css")
-
-@app.route("/teacher/teacherlog.js")
-def teacher_login_js():
-    return send_from_directory("teacher/teacherlogin", "teacherlog.js")
-
-@app.route("/teacher/teacher_dashboard.html")
-def teacher_dashboard():
-    return send_from_directory("teacher", "teacher_dashboard.html")
+# ---------------------- BACKGROUND JOBS ----------------------
+# Admin operations that can outgrow a request (imports, report cards,
+# rebuilding summaries) run as jobs (see jobs.py): the route answers 202
+# with the job and a Location to poll, GET /jobs/<id> gives its progress
+# and result, POST /jobs/<id>/cancel stops it. Files a job reads (uploads)
+# or writes live under JOB_FILES_DIR / REPORTS_DIR.
+JOBS_DATABASE = SINGLE_DATABASE or "jobs.db"
+JOB_FILES_DIR = os.path.abspath(os.environ.get("JOB_FILES_DIR", "job-files"))
+
+jobs.init_app(app, JOBS_DATABASE, get_db)
+
+
+def accepted(job):
+    """202 response for a queued (or already running) job"""
+    response = jsonify(dict(job, success=True))
+    response.status_code = 202
+    response.headers["Location"] = f"/jobs/{job['id']}"
+    return response
+
+
+def wants_background():
+    """Did the client ask for a job rather than an answer (Prefer: respond-async)?"""
+    return "respond-async" in request.headers.get("Prefer", "") or request.args.get("background") == "1"
+
+
+@app.route("/jobs", methods=["GET"])
+@require_session("admin")
+def list_jobs():
+    """Recent jobs, newest first (?kind=, ?status=)"""
+    return jsonify({"success": True, "jobs": jobs.list_jobs(request.args.get("kind"), request.args.get("status"))})
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+@require_session("admin")
+def job_status(job_id):
+    """Status, progress (done of total) and, once done, result of a job"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "No such job"}), 404
+    if job["status"] == "done" and (job["result"] or {}).get("download"):
+        job["download"] = f"/jobs/{job_id}/download"
+    return jsonify(dict(job, success=True))
+
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+@require_session("admin")
+def cancel_job(job_id):
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "No such job"}), 404
+    return jsonify(dict(job, success=True))
+
+
+@app.route("/jobs/<job_id>/download", methods=["GET"])
+@require_session("admin")
+def download_job_file(job_id):
+    """The file a finished job wrote (report cards zip)"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "No such job"}), 404
+    download = (job["result"] or {}).get("download") if job["status"] == "done" else None
+    if not download:
+        return jsonify({"success": False, "message": f"Nothing to download (job is {job['status']})"}), 409
+    return send_from_directory(os.path.dirname(download["path"]), os.path.basename(download["path"]),
+                               as_attachment=True, download_name=download["name"])
+
+
+@jobs.task("rebuild_summaries", attempts=2)
+def rebuild_summaries_job(job):
+    with get_db(DATABASE_RESULTS) as conn:
+        count = rebuild_student_summaries(conn)
+    data_changed("results")
+    return {"summaries": count}
+
+
+@app.route("/admin/rebuild_summaries", methods=["POST"])
+@require_session("admin")
+def rebuild_summaries():
+    """Recompute student_summary from the results table, as a job"""
+    return accepted(jobs.enqueue("rebuild_summaries", {}))
+
+
+# ---------------------- BULK STUDENT/TEACHER IMPORT ----------------------
+# POST /import/students or /import/teachers with a CSV (file upload or a
+# text/csv body). The file is read row by row - werkzeug spools big uploads
+# to disk - and written in IMPORT_CHUNK_SIZE transactions. Rows whose ID
+# already exists (in the table or earlier in the file) are skipped and
+# reported as duplicates. Send Accept: application/x-ndjson (or
+# ?stream=ndjson) to get a progress line after every chunk, or Prefer:
+# respond-async to have a background job do the import (the admin page
+# does); chunks committed before a cancel or failure stay either way.
+# Teacher passwords are hashed at the full work factor on the hash pool
+# (credentials.make_passwords), before each chunk's transaction opens; at
+# tens of ms a row, a large teacher file is one for the background job.
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_REPORT_LIMIT = 100  # max duplicate IDs / errors echoed back
+
+IMPORT_TABLES = {
+    "students": {
+        "db": DATABASE_STUDENTS,
+        "key": "student_id",
+        "columns": ["student_id", "name", "surname", "class", "phone", "attendance", "age", "sex",
+                    "email", "address", "guardian_name", "guardian_phone", "date_of_birth"],
+        # Header names the admin form / older exports use
+        "aliases": {"sid": "student_id", "studentid": "student_id", "form": "class"},
+        "normalize": normalize_student_id,
+    },
+    "teachers": {
+        "db": DATABASE_TEACHERS,
+        "key": "teacher_id",
+        "columns": ["teacher_id", "name", "surname", "class", "phone", "password", "role"],
+        "aliases": {"tid": "teacher_id", "teacherid": "teacher_id"},
+        "hashed": ["password"],
+    },
+}
+
+
+def uploaded_csv():
+    """Binary stream of the uploaded CSV (a multipart "file" or the raw body)"""
+    if request.mimetype == "multipart/form-data":
+        if "file" not in request.files:
+            raise ValueError("No file uploaded")
+        return request.files["file"].stream
+    return request.stream
+
+
+def open_import_csv(aliases, raw):
+    """csv.DictReader over the CSV in binary stream `raw`, read as it goes"""
+    text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+    header = text.readline()
+    if not header.strip():
+        raise ValueError("CSV file is empty")
+    # Excel uses ';' in locales where ',' is the decimal separator
+    delimiter = ";" if header.count(";") > header.count(",") else ","
+    names = []
+    for name in next(csv.reader([header], delimiter=delimiter)):
+        name = name.strip().lower().replace(" ", "_")
+        names.append(aliases.get(name, name))
+    return csv.DictReader(text, fieldnames=names, delimiter=delimiter)
+
+
+def import_rows(kind, reader):
+    """Insert rows from `reader` chunk by chunk, yielding a progress dict per chunk"""
+    spec = IMPORT_TABLES[kind]
+    key = spec["key"]
+    columns = spec["columns"]
+    insert_sql = (f"INSERT OR IGNORE INTO {kind} ({', '.join(columns)}) "
+                  f"VALUES ({', '.join('?' for _ in columns)})")
+    progress = {"processed": 0, "inserted": 0, "duplicates": 0, "errors": 0}
+    duplicate_ids = []
+    errors = []
+    seen = set()
+
+    def note(bucket, item):
+        if len(bucket) < IMPORT_REPORT_LIMIT:
+            bucket.append(item)
+
+    def hash_columns(rows):
+        # On the hash pool, outside the write transaction
+        for column in spec.get("hashed", []):
+            i = columns.index(column)
+            todo = [row for row in rows if row[i]]
+            for row, hashed in zip(todo, make_passwords([row[i] for row in todo])):
+                row[i] = hashed
+
+    def flush(chunk):
+        ids = [row[0] for row in chunk]
+        with get_db(spec["db"]) as conn:
+            existing = {r[0] for r in conn.execute(
+                f"SELECT {key} FROM {kind} WHERE {key} IN ({', '.join('?' for _ in ids)})", ids)}
+        fresh = [row for row in chunk if row[0] not in existing]
+        for row_id in existing:
+            note(duplicate_ids, row_id)
+        hash_columns(fresh)
+        inserted = 0
+        if fresh:
+            with get_db(spec["db"]) as conn:
+                # OR IGNORE covers a row added by someone else since the SELECT
+                inserted = conn.executemany(insert_sql, fresh).rowcount
+        progress["inserted"] += inserted
+        progress["duplicates"] += len(chunk) - inserted
+
+    chunk = []
+    for line_number, record in enumerate(reader, start=2):
+        progress["processed"] += 1
+        row_id = spec.get("normalize", str.strip)(record.get(key) or "")
+        if not row_id:
+            progress["errors"] += 1
+            note(errors, {"line": line_number, "message": f"Missing {key}"})
+            continue
+        if row_id in seen:
+            progress["duplicates"] += 1
+            note(duplicate_ids, row_id)
+            continue
+        seen.add(row_id)
+        chunk.append([row_id] + [(record.get(c) or "").strip() or None for c in columns[1:]])
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            flush(chunk)
+            chunk = []
+            yield dict(progress)
+    if chunk:
+        flush(chunk)
+    data_changed(kind)
+    if progress["inserted"]:
+        events.publish(kind, action="imported", count=progress["inserted"])
+    yield dict(progress, done=True, duplicate_ids=duplicate_ids, error_rows=errors)
+
+
+@jobs.task("import", concurrency=2)
+def import_job(job):
+    """Import a spooled upload; not retried, since the file goes with the first try"""
+    kind, path = job.args["kind"], job.args["path"]
+    try:
+        with open(path, "rb") as raw:
+            for progress in import_rows(kind, open_import_csv(IMPORT_TABLES[kind]["aliases"], raw)):
+                job.progress(progress["processed"])
+    finally:
+        os.remove(path)
+    progress.pop("done")
+    return dict(progress, message=f"Imported {progress['inserted']} of {progress['processed']} {kind}")
+
+
+def spool_upload(raw, prefix):
+    """Copy an upload to JOB_FILES_DIR for a job to read; returns the path"""
+    os.makedirs(JOB_FILES_DIR, exist_ok=True)
+    path = os.path.join(JOB_FILES_DIR, f"{prefix}-{secrets.token_hex(8)}.csv")
+    with open(path, "wb") as f:
+        shutil.copyfileobj(raw, f, 1024 * 1024)
+    return path
+
+
+@app.route("/import/<kind>", methods=["POST"])
+def import_people(kind):
+    """Import a CSV of students or teachers.
+
+    With Prefer: respond-async (or ?background=1) the upload is saved and
+    imported by a job, answered with 202 and the job to poll.
+    """
+    if kind not in IMPORT_TABLES:
+        return jsonify({"success": False, "message": f"Unknown import type: {kind}"}), 404
+    if wants_background():
+        try:
+            path = spool_upload(uploaded_csv(), kind)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        return accepted(jobs.enqueue("import", {"kind": kind, "path": path}))
+    try:
+        reader = open_import_csv(IMPORT_TABLES[kind]["aliases"], uploaded_csv())
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    if stream_format() == "ndjson":
+        def generate():
+            try:
+                for progress in import_rows(kind, reader):
+                    yield json.dumps(progress) + "\n"
+            except (UnicodeDecodeError, csv.Error, sqlite3.Error) as e:
+                yield json.dumps({"done": True, "success": False, "message": str(e)}) + "\n"
+        return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
 
-@app.route("/teacher/teacher_dashboard.css")
-def teacher_dashboard_css():
-    return send_from_directory("teacher", "teacher_dashboard.css")
+    try:
+        for progress in import_rows(kind, reader):
+            pass
+    except (UnicodeDecodeError, csv.Error, sqlite3.Error) as e:
+        # Chunks committed before the failure stay in the table
+        return jsonify({"success": False, "message": str(e)}), 400
+    progress.pop("done")
+    return jsonify(dict(progress, success=True,
+                        message=f"Imported {progress['inserted']} of {progress['processed']} {kind}"))
 
-@app.route("/teacher/teacher_dashboard.js")
-def teacher_dashboard_js():
-    return send_from_directory("teacher", "teacher_dashboard.js")
 
+# ============ TEACHER ROUTES ============
 
 # ---------------------- TEACHER LOGIN API ----------------------
 @app.route("/teacher_login", methods=["POST"])
@@ -367,38 +1753,34 @@ def teacher_login():
     teacher_id = data.get("teacherId")
     password = data.get("password")
     
-    print("=" * 50)
-    print("TEACHER LOGIN ATTEMPT:")
-    print(f"Received Teacher ID: '{teacher_id}'")
-    print(f"Received Password: '{password}'")
-    print("=" * 50)
-
     if not teacher_id or not password:
         return jsonify({"success": False, "message": "Please provide Teacher ID and password"})
 
-    conn = sqlite3.connect(DATABASE_TEACHERS)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT * FROM teachers WHERE teacher_id=?", (teacher_id,))
-    teacher = c.fetchone()
-    
-    print(f"Database search result: {teacher}")
-    print("=" * 50)
-    
-    conn.close()
+    with get_db(DATABASE_TEACHERS) as conn:
+        teacher = conn.execute("SELECT * FROM teachers WHERE teacher_id=?", (teacher_id,)).fetchone()
 
     if not teacher:
+        auth_log.info("teacher login: unknown id", extra={"teacher_id": teacher_id})
         return jsonify({"success": False, "message": "Teacher ID not found"})
 
-    if teacher["password"] != password:
+    try:
+        ok, new_hash = verify_password(password, teacher["password"])
+    except CredentialsBusy as e:
+        auth_log.warning("teacher login: hash pool busy", extra={"teacher_id": teacher_id})
+        return jsonify({"success": False, "message": str(e)}), 503
+    if not ok:
+        auth_log.info("teacher login: wrong password", extra={"teacher_id": teacher_id})
         return jsonify({"success": False, "message": "Incorrect password"})
+    if new_hash:
+        upgrade_password_hash(DATABASE_TEACHERS, "teachers", teacher["id"], new_hash)
+    auth_log.info("teacher login ok", extra={"teacher_id": teacher_id, "sampled": True})
 
-    return jsonify({
+    return login_response({
         "success": True,
         "redirect": "/teacher/teacher_dashboard.html",
         "name": teacher["name"],
         "role": teacher["role"] if teacher["role"] else ""
-    })
+    }, "teacher", teacher["teacher_id"], teacher["name"])
 
 
 # ---------------------- STUDENT SEARCH (for teacher dashboard) ----------------------
@@ -411,70 +1793,212 @@ def search_student():
     if not student_id and not name:
         return jsonify({"found": False, "message": "Please provide student ID or name"}), 400
     
-    conn = sqlite3.connect(DATABASE_STUDENTS)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    
-    if student_id:
-        c.execute("SELECT * FROM students WHERE student_id=?", (student_id,))
-    else:
-        c.execute("SELECT * FROM students WHERE name LIKE ?", (f"%{name}%",))
-    
-    student = c.fetchone()
-    conn.close()
+    matches = []
+    with get_db(DATABASE_STUDENTS) as conn:
+        if student_id:
+            student = find_student(conn, student_id)
+        else:
+            # Ranked name/surname search; the best match is the one returned
+            matches = search_students(name)
+            student = matches and conn.execute("SELECT * FROM students WHERE id=?",
+                                               (matches[0]["id"],)).fetchone()
     
     if not student:
         return jsonify({"found": False, "message": "Student not found"}), 404
     
+    student = dict(student)
+    student.pop("password", None)  # never send hashes to the browser
     return jsonify({
         "found": True,
-        "student": dict(student)
+        "student": student,
+        "matches": matches
     })
 
 
+@app.route("/search_students", methods=["GET"])
+def search_students_route():
+    """Autocomplete: ?q=<prefix words>&limit=N -> ranked matches"""
+    q = request.args.get("q", "").strip()
+    try:
+        limit = min(int(request.args.get("limit", STUDENT_SEARCH_LIMIT)), STUDENT_SEARCH_MAX_LIMIT)
+    except ValueError:
+        return jsonify({"success": False, "message": "limit must be a number"}), 400
+    students = search_students(q, max(limit, 1))
+    return jsonify({"success": True, "students": students})
+
+
 # ---------------------- RESULTS CRUD ----------------------
+RESULT_REQUIRED_FIELDS = ["student_id", "student_name", "form", "level", "subject", "term", "year", "marks", "grade", "status"]
+
+SAVE_RESULT_SQL = """
+    INSERT OR REPLACE INTO results 
+    (student_id, student_name, form, level, subject, term, year, exam_type, exam_date, marks, grade, status, comment, teacher_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# The UNIQUE key of results, and where its values sit in result_params()
+RESULT_BY_KEY_SQL = "SELECT id FROM results WHERE student_id=? AND subject=? AND term=? AND year=? AND exam_type=?"
+RESULT_KEY_PARAMS = (0, 4, 5, 6, 7)
+
+
+def result_params(data):
+    """Parameters for SAVE_RESULT_SQL from a validated result dict"""
+    return (
+        normalize_student_id(data["student_id"]), data["student_name"], data["form"], data["level"],
+        data["subject"], data["term"], data["year"], data.get("exam_type", ""),
+        data.get("exam_date", ""), data["marks"], data["grade"], data["status"],
+        data.get("comment", ""), data.get("teacher_id", "")
+    )
+
+
 @app.route("/save_result", methods=["POST"])
 def save_result():
     data = request.json
-    required = ["student_id", "student_name", "form", "level", "subject", "term", "year", "marks", "grade", "status"]
+    required = RESULT_REQUIRED_FIELDS
     
     for field in required:
         if field not in data:
             return jsonify({"success": False, "message": f"Missing field: {field}"}), 400
     
-    conn = sqlite3.connect(DATABASE_RESULTS)
-    c = conn.cursor()
-    
     try:
-        c.execute("""
-            INSERT OR REPLACE INTO results 
-            (student_id, student_name, form, level, subject, term, year, exam_type, exam_date, marks, grade, status, comment, teacher_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            data["student_id"], data["student_name"], data["form"], data["level"],
-            data["subject"], data["term"], data["year"], data.get("exam_type", ""),
-            data.get("exam_date", ""), data["marks"], data["grade"], data["status"],
-            data.get("comment", ""), data.get("teacher_id", "")
-        ))
-        conn.commit()
+        params = result_params(data)
+        with get_db(DATABASE_RESULTS) as conn:
+            # INSERT OR REPLACE gives a re-saved mark a new id; pages showing
+            # the old row need to know which one it replaced
+            replaced = conn.execute(RESULT_BY_KEY_SQL, [params[i] for i in RESULT_KEY_PARAMS]).fetchone()
+            c = conn.execute(SAVE_RESULT_SQL, params)
+            # Read the row back so the keys carry the column affinity (year as INTEGER)
+            saved = dict(conn.execute("SELECT * FROM results WHERE id=?", (c.lastrowid,)).fetchone())
+            refresh_student_summary(conn, saved["student_id"], saved["term"], saved["year"])
+        data_changed("results")
+        events.publish("results", action="saved", result=saved, replaced=replaced[0] if replaced else None)
         return jsonify({"success": True, "message": "Result saved successfully"})
+    except sqlite3.IntegrityError as e:
+        # Single-file mode: the foreign key rejects marks for unknown students
+        if "FOREIGN KEY" in str(e):
+            return jsonify({"success": False, "message": "Student not found"}), 404
+        return jsonify({"success": False, "message": str(e)}), 500
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
-    finally:
-        conn.close()
 
 
-@app.route("/get_results", methods=["GET"])
-def get_results():
-    form = request.args.get("form", "")
-    subject = request.args.get("subject", "")
-    term = request.args.get("term", "")
+# ---------------------- BULK RESULTS UPLOAD ----------------------
+# A class's marks in one request: a JSON array (or {"results": [...]}), a
+# CSV body, or a CSV file upload in the "file" form field. Every valid row is
+# written with one executemany in one transaction (one fsync instead of one
+# per mark); invalid rows are skipped and reported back by row number.
+MAX_BULK_ROWS = 5000
+
+
+def read_bulk_rows():
+    """Rows from the request as a list of dicts, whatever the upload format"""
+    if "file" in request.files:
+        upload = request.files["file"]
+        reader = csv.DictReader(io.TextIOWrapper(upload.stream, encoding="utf-8-sig"))
+        return list(reader)
+    if request.mimetype == "text/csv":
+        return list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get("results")
+    if not isinstance(data, list):
+        raise ValueError("Send a JSON array of results or a CSV file")
+    return data
+
+
+def validate_result_row(row):
+    """Cleaned copy of one bulk row, or raise ValueError with the reason"""
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+    # CSV cells are always present, so blank counts as missing too
+    clean = {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+    for field in RESULT_REQUIRED_FIELDS:
+        if clean.get(field) in (None, ""):
+            raise ValueError(f"Missing field: {field}")
+    try:
+        clean["year"] = int(clean["year"])
+    except (TypeError, ValueError):
+        raise ValueError("year must be a whole number")
+    try:
+        marks = float(clean["marks"])
+    except (TypeError, ValueError):
+        raise ValueError("marks must be a number")
+    clean["marks"] = int(marks) if marks.is_integer() else marks
+    clean["term"] = str(clean["term"])
+    clean["student_id"] = normalize_student_id(str(clean["student_id"]))
+    for field in ("exam_type", "exam_date", "comment", "teacher_id"):
+        if clean.get(field) is None:
+            clean[field] = ""
+    return clean
+
+
+@app.route("/save_results_bulk", methods=["POST"])
+def save_results_bulk():
+    try:
+        rows = read_bulk_rows()
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    
+    if len(rows) > MAX_BULK_ROWS:
+        return jsonify({"success": False, "message": f"At most {MAX_BULK_ROWS} rows per upload"}), 413
+    
+    valid = []
+    errors = []
+    numbers = []
+    for number, row in enumerate(rows, start=1):
+        try:
+            valid.append(validate_result_row(row))
+            numbers.append(number)
+        except ValueError as e:
+            errors.append({"row": number, "message": str(e)})
     
-    conn = sqlite3.connect(DATABASE_RESULTS)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
+    try:
+        with get_db(DATABASE_RESULTS) as conn:
+            if SINGLE_DATABASE and valid:
+                # Check every student in one query rather than letting the
+                # foreign key abort the whole batch on the first unknown ID
+                ids = list({r["student_id"] for r in valid})
+                known = {r[0] for r in conn.execute(
+                    f"SELECT student_id FROM students WHERE student_id IN ({', '.join('?' for _ in ids)})", ids)}
+                for number, r in zip(numbers, valid):
+                    if r["student_id"] not in known:
+                        errors.append({"row": number, "message": f"Student not found: {r['student_id']}"})
+                errors.sort(key=lambda e: e["row"])
+                valid = [r for r in valid if r["student_id"] in known]
+            conn.executemany(SAVE_RESULT_SQL, [result_params(r) for r in valid])
+            for key in {(r["student_id"], r["term"], r["year"]) for r in valid}:
+                refresh_student_summary(conn, *key)
+    except Exception as e:
+        # The transaction was rolled back, so nothing from this upload is saved
+        return jsonify({"success": False, "saved": 0, "errors": errors, "message": str(e)}), 500
     
-    query = "SELECT * FROM results WHERE 1=1"
+    if valid:
+        data_changed("results")
+        events.publish("results", action="saved_many", count=len(valid))
+    return jsonify({
+        "success": not errors,
+        "saved": len(valid),
+        "errors": errors,
+        "message": f"Saved {len(valid)} of {len(rows)} results"
+    })
+
+
+RESULTS_PAGE_KEYS = ["created_at", "id"]
+# ?since= answers: always carry the sequence and id, and are capped at
+# RESULTS_DELTA_LIMIT rows (more than that and the client reloads instead)
+RESULTS_DELTA_KEYS = ["change_seq", "id"]
+RESULTS_DELTA_LIMIT = 1000
+RESULTS_DELETED_SQL = "SELECT id FROM results_deleted WHERE change_seq > ? ORDER BY change_seq LIMIT ?"
+
+
+def build_results_query(form="", subject="", term="", columns="*", cursor=None, limit=None, since=None):
+    """SQL + params for the /get_results filters (also used by the plan audit)
+
+    With `since`, only rows changed after that change_seq, oldest change first.
+    """
+    # A delta is a few recent changes: walk them by sequence and filter
+    # those, rather than every row of a form/subject/term
+    table = "results INDEXED BY idx_results_change_seq" if since is not None else "results"
+    query = f"SELECT {columns} FROM {table} WHERE 1=1"
     params = []
     
     if form:
@@ -487,43 +2011,120 @@ def get_results():
         query += " AND term=?"
         params.append(term)
     
-    query += " ORDER BY created_at DESC"
+    if cursor:
+        query += " AND (created_at, id) < (?, ?)"
+        params.extend(cursor)
+    
+    if since is not None:
+        query += " AND change_seq > ? ORDER BY change_seq"
+        params.append(since)
+    else:
+        query += " ORDER BY created_at DESC, id DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit + 1)
+    return query, params
+
+
+def results_seq(conn):
+    """The change_seq of the latest change to results"""
+    return conn.execute("SELECT value FROM sequences WHERE name='results'").fetchone()[0]
+
+
+def results_version():
+    """cached_response version for routes reading results"""
+    with get_db(DATABASE_RESULTS) as conn:
+        return results_seq(conn)
+
+
+def results_delta(form, subject, term, since):
+    """/get_results?since=SEQ: rows changed and ids deleted after SEQ.
+
+    Deleted ids aren't filtered (the row is gone); ids the client doesn't
+    show can be ignored. "reset": true means reload instead.
+    """
+    try:
+        since = int(since)
+        _, _, _, columns = page_args(DATABASE_RESULTS, "results", RESULTS_DELTA_KEYS)
+    except ValueError:
+        return jsonify({"success": False, "message": "since must be a number"}), 400
+    except PageArgsError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    
+    query, params = build_results_query(form, subject, term, columns, since=since, limit=RESULTS_DELTA_LIMIT)
+    with get_db(DATABASE_RESULTS) as conn:
+        # Read first: a change landing in between is sent again next time,
+        # which is harmless, rather than missed
+        seq = results_seq(conn)
+        pruned = conn.execute("SELECT value FROM sequences WHERE name='results_pruned'").fetchone()
+        reset = since > seq or since < (pruned[0] if pruned else 0)
+        if not reset:
+            rows = [dict(row) for row in conn.execute(query, params)]
+            deleted = [row[0] for row in conn.execute(RESULTS_DELETED_SQL, (since, RESULTS_DELTA_LIMIT + 1))]
+            reset = len(rows) > RESULTS_DELTA_LIMIT or len(deleted) > RESULTS_DELTA_LIMIT
+    if reset:
+        return jsonify({"data": [], "deleted": [], "seq": seq, "reset": True})
+    return jsonify({"data": rows, "deleted": deleted, "seq": seq, "reset": False})
+
+
+@app.route("/get_results", methods=["GET"])
+@cached_response("results", version=results_version)
+def get_results():
+    form = request.args.get("form", "")
+    subject = request.args.get("subject", "")
+    term = request.args.get("term", "")
+    if request.args.get("since") is not None:
+        return results_delta(form, subject, term, request.args["since"])
+    
+    try:
+        paged, limit, cursor, columns = page_args(DATABASE_RESULTS, "results", RESULTS_PAGE_KEYS)
+    except PageArgsError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    
+    fmt = stream_format()
+    if fmt:
+        # Streams always run to the end of the table; limit doesn't apply
+        query, params = build_results_query(form, subject, term, columns, cursor)
+        return stream_rows(DATABASE_RESULTS, query, params, fmt)
     
-    c.execute(query, params)
-    results = [dict(row) for row in c.fetchall()]
-    conn.close()
+    query, params = build_results_query(form, subject, term, columns, cursor, limit)
     
+    with get_db(DATABASE_RESULTS) as conn:
+        # Where a later ?since= picks up from
+        seq = results_seq(conn)
+        results = [dict(row) for row in conn.execute(query, params)]
+    
+    results, next_cursor = finish_page(results, limit, RESULTS_PAGE_KEYS)
+    if paged:
+        return jsonify({"data": results, "next_cursor": next_cursor, "seq": seq})
     return jsonify(results)
 
 
+@app.route("/get_result/<int:id>", methods=["GET"])
+@cached_response("results", version=results_version)
+def get_result(id):
+    with get_db(DATABASE_RESULTS) as conn:
+        row = conn.execute("SELECT * FROM results WHERE id=?", (id,)).fetchone()
+    if row is None:
+        return jsonify({"success": False, "message": "Result not found"}), 404
+    return jsonify({"success": True, "data": dict(row)})
+
+
 @app.route("/delete_result/<int:id>", methods=["DELETE"])
 def delete_result(id):
-    conn = sqlite3.connect(DATABASE_RESULTS)
-    c = conn.cursor()
-    c.execute("DELETE FROM results WHERE id=?", (id,))
-    conn.commit()
-    conn.close()
+    with get_db(DATABASE_RESULTS) as conn:
+        row = conn.execute("SELECT student_id, term, year FROM results WHERE id=?", (id,)).fetchone()
+        conn.execute("DELETE FROM results WHERE id=?", (id,))
+        if row:
+            refresh_student_summary(conn, *row)
+    data_changed("results")
+    if row:
+        events.publish("results", action="deleted", id=id)
     return jsonify({"ok": True, "message": "Result deleted"})
 
 
 # ============ STUDENT ROUTES ============
 
-@app.route("/student")
-def student_login_page():
-    return send_from_directory("student", "studentlog.html")
-
-@app.route("/student/studentlog.css")
-def student_login_css():
-    return send_from_directory("student", "studentlog.css")
-
-@app.route("/student/studentlog.js")
-def student_login_js():
-    return send_from_directory("student", "studentlog.js")
-
-@app.route("/student/student_dashboard.html")
-def student_dashboard():
-    return send_from_directory("student", "student_dashboard.html")
-
 # Optional: Catch-all route for any other student files
 @app.route("/student/<path:filename>")
 def serve_student_files(filename):
@@ -539,34 +2140,18 @@ def verify_student():
         data = request.json or {}
         student_id = data.get("studentId", "").strip()
         
-        print("=" * 50)
-        print("STUDENT VERIFICATION:")
-        print(f"Student ID received: '{student_id}'")
-        
         if not student_id:
             return jsonify({
                 "valid": False, 
                 "message": "Please provide Student ID"
             }), 400
         
-        conn = sqlite3.connect(DATABASE_STUDENTS)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        
-        # Search for student - try exact match first
-        c.execute("SELECT * FROM students WHERE student_id=?", (student_id,))
-        student = c.fetchone()
+        with get_db(DATABASE_STUDENTS) as conn:
+            # Any case / stray spaces, always through an index
+            student = find_student(conn, student_id)
         
-        # If not found, try case-insensitive search
         if not student:
-            c.execute("SELECT * FROM students WHERE LOWER(student_id)=LOWER(?)", (student_id,))
-            student = c.fetchone()
-        
-        conn.close()
-        
-        if not student:
-            print(f"❌ Student not found in database")
-            print("=" * 50)
+            auth_log.info("verify student: not found", extra={"student_id": student_id})
             return jsonify({
                 "valid": False, 
                 "message": f"Student ID '{student_id}' not found in database. Please check your ID or contact administration."
@@ -590,9 +2175,8 @@ def verify_student():
         
         has_password = bool(student_dict.get("password"))
         
-        print(f"✅ Student found: {student_info['name']}")
-        print(f"Has password: {has_password}")
-        print("=" * 50)
+        auth_log.info("verify student ok", extra={"student_id": student_id, "has_password": has_password,
+                                                  "sampled": True})
         
         return jsonify({
             "valid": True,
@@ -601,10 +2185,7 @@ def verify_student():
         })
         
     except Exception as e:
-        print(f"❌ ERROR in verify_student: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        print("=" * 50)
+        auth_log.exception("verify student failed")
         return jsonify({
             "valid": False,
             "message": f"Server error: {str(e)}"
@@ -619,78 +2200,58 @@ def create_student_password():
         student_id = data.get("studentId", "").strip()
         password = data.get("password", "")
         
-        print("=" * 50)
-        print("CREATE PASSWORD REQUEST:")
-        print(f"Student ID: '{student_id}'")
-        print(f"Password length: {len(password)}")
-        
         if not student_id:
-            print("❌ Missing student ID")
-            print("=" * 50)
             return jsonify({
                 "success": False, 
                 "message": "Student ID is required"
             }), 400
         
         if not password:
-            print("❌ Missing password")
-            print("=" * 50)
             return jsonify({
                 "success": False, 
                 "message": "Password is required"
             }), 400
         
         if len(password) < 8:
-            print("❌ Password too short")
-            print("=" * 50)
             return jsonify({
                 "success": False, 
                 "message": "Password must be at least 8 characters"
             }), 400
         
-        conn = sqlite3.connect(DATABASE_STUDENTS)
-        c = conn.cursor()
-        
-        # First check if student exists
-        c.execute("SELECT student_id FROM students WHERE student_id=?", (student_id,))
-        student = c.fetchone()
-        
-        if not student:
-            conn.close()
-            print(f"❌ Student '{student_id}' not found")
-            print("=" * 50)
-            return jsonify({
-                "success": False, 
-                "message": "Student not found"
-            }), 404
-        
-        # Update password
-        c.execute("UPDATE students SET password=? WHERE student_id=?", (password, student_id))
-        rows_affected = c.rowcount
-        conn.commit()
-        conn.close()
+        with get_db(DATABASE_STUDENTS) as conn:
+            # First check if student exists
+            student = find_student(conn, student_id)
+            
+            if not student:
+                auth_log.info("create password: student not found", extra={"student_id": student_id})
+                return jsonify({
+                    "success": False, 
+                    "message": "Student not found"
+                }), 404
+            
+            # Update password (hashed off the request thread, see credentials.py)
+            c = conn.execute("UPDATE students SET password=? WHERE id=?", (make_password(password), student["id"]))
+            rows_affected = c.rowcount
         
         if rows_affected == 0:
-            print(f"❌ No rows updated for student '{student_id}'")
-            print("=" * 50)
+            auth_log.error("create password: no rows updated", extra={"student_id": student_id})
             return jsonify({
                 "success": False, 
                 "message": "Failed to update password"
             }), 500
         
-        print(f"✅ Password created successfully for student '{student_id}'")
-        print("=" * 50)
+        response_cache.invalidate("students")
+        auth_log.info("student password created", extra={"student_id": student_id})
         
         return jsonify({
             "success": True, 
             "message": "Password created successfully"
         })
         
+    except CredentialsBusy as e:
+        return jsonify({"success": False, "message": str(e)}), 503
     except Exception as e:
-        print(f"❌ ERROR in create_student_password: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        print("=" * 50)
+        auth_log.exception("create password failed")
         return jsonify({
             "success": False, 
             "message": f"Server error: {str(e)}"
@@ -705,28 +2266,17 @@ def student_login():
         student_id = data.get("studentId", "").strip()
         password = data.get("password", "")
         
-        print("=" * 50)
-        print("STUDENT LOGIN ATTEMPT:")
-        print(f"Student ID: '{student_id}'")
-        
         if not student_id or not password:
-            print("❌ Missing credentials")
-            print("=" * 50)
             return jsonify({
                 "success": False, 
                 "message": "Student ID and password required"
             }), 400
         
-        conn = sqlite3.connect(DATABASE_STUDENTS)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        c.execute("SELECT * FROM students WHERE student_id=?", (student_id,))
-        student = c.fetchone()
-        conn.close()
+        with get_db(DATABASE_STUDENTS) as conn:
+            student = find_student(conn, student_id)
         
         if not student:
-            print(f"❌ Student '{student_id}' not found")
-            print("=" * 50)
+            auth_log.info("student login: unknown id", extra={"student_id": student_id})
             return jsonify({
                 "success": False, 
                 "message": "Student ID not found"
@@ -736,123 +2286,138 @@ def student_login():
         stored_password = student_dict.get("password")
         
         if not stored_password:
-            print("❌ No password set for this student")
-            print("=" * 50)
             return jsonify({
                 "success": False, 
                 "message": "Please set up your password first"
             }), 400
         
-        if stored_password != password:
-            print("❌ Incorrect password")
-            print("=" * 50)
+        ok, new_hash = verify_password(password, stored_password)
+        if not ok:
+            auth_log.info("student login: wrong password", extra={"student_id": student_id})
             return jsonify({
                 "success": False, 
                 "message": "Incorrect password"
             }), 401
+        if new_hash:
+            upgrade_password_hash(DATABASE_STUDENTS, "students", student_dict["id"], new_hash)
         
         # Build student info for response
         name = student_dict.get('name', '')
         surname = student_dict.get('surname', '')
         full_name = f"{name} {surname}".strip() if surname else name
         
-        print(f"✅ Login successful for '{student_id}'")
-        print("=" * 50)
+        auth_log.info("student login ok", extra={"student_id": student_id, "sampled": True})
         
-        return jsonify({
+        return login_response({
             "success": True,
-            "redirect": f"/student/student_dashboard.html?studentId={student_id}",
+            "redirect": f"/student/student_dashboard.html?studentId={student_dict['student_id']}",
             "student": {
                 "id": student_dict.get("student_id"),
                 "name": full_name or "Student",
                 "class": student_dict.get("class") or "Not Assigned"
             }
-        })
+        }, "student", student_dict.get("student_id"), full_name or "Student")
         
+    except CredentialsBusy as e:
+        auth_log.warning("student login: hash pool busy", extra={"student_id": data.get("studentId")})
+        return jsonify({"success": False, "message": str(e)}), 503
     except Exception as e:
-        print(f"❌ ERROR in student_login: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        print("=" * 50)
+        auth_log.exception("student login failed")
         return jsonify({
             "success": False, 
             "message": f"Server error: {str(e)}"
         }), 500
 
 
+STUDENT_RESULTS_QUERY = """
+    SELECT * FROM results 
+    WHERE student_id=? 
+    ORDER BY year DESC, term DESC, created_at DESC
+"""
+
+STUDENT_SUMMARY_QUERY = """
+    SELECT * FROM student_summary
+    WHERE student_id=?
+    ORDER BY year DESC, term DESC
+"""
+
+
+def combine_summaries(summaries):
+    """Overall dashboard statistics from the per-term student_summary rows"""
+    total = sum(s["total_subjects"] for s in summaries)
+    if not total:
+        return {
+            "totalSubjects": 0,
+            "average": 0,
+            "bestSubject": "N/A",
+            "bestScore": 0,
+            "weakestSubject": "N/A",
+            "weakestScore": 0,
+            "passed": 0,
+            "failed": 0
+        }
+    
+    # Rows are newest term first, so ties go to the most recent term
+    marked = [s for s in summaries if s["best_score"] is not None]
+    best = max(marked, key=lambda s: s["best_score"]) if marked else None
+    weak = min(marked, key=lambda s: s["weak_score"]) if marked else None
+    passed = sum(s["passed"] for s in summaries)
+    
+    return {
+        "totalSubjects": total,
+        "average": round(sum(s["total_marks"] for s in summaries) / total, 2),
+        "bestSubject": best["best_subject"] if best else "N/A",
+        "bestScore": best["best_score"] if best else 0,
+        "weakestSubject": weak["weak_subject"] if weak else "N/A",
+        "weakestScore": weak["weak_score"] if weak else 0,
+        "passed": passed,
+        "failed": total - passed
+    }
+
+
+def read_student_results(student_id):
+    with get_db(DATABASE_RESULTS) as conn:
+        c = conn.execute(STUDENT_RESULTS_QUERY, (student_id,))
+        results = [dict(row) for row in c]
+        summaries = [dict(row) for row in conn.execute(STUDENT_SUMMARY_QUERY, (student_id,))]
+    # Statistics come precomputed from student_summary
+    return {
+        "results": results,
+        "statistics": combine_summaries(summaries),
+        "termSummaries": summaries
+    }
+
+
+def require_own_results(view):
+    """Route decorator: a student session may only read its own <student_id>.
+
+    Sits outside cached_response, so a cached answer never skips it.
+    """
+    @wraps(view)
+    def wrapper(student_id, *args, **kwargs):
+        session = current_session() if REQUIRE_SESSIONS else None
+        if (session and session["role"] == "student"
+                and normalize_student_id(session["user_id"]) != normalize_student_id(student_id)):
+            return jsonify({"success": False, "message": "Not allowed"}), 403
+        return view(student_id, *args, **kwargs)
+    return wrapper
+
+
 @app.route("/student_results/<student_id>", methods=["GET"])
+@require_session("student", "teacher", "admin")
+@require_own_results
+@cached_response("results", version=results_version)
 def get_student_results(student_id):
     """Get all results for a specific student"""
+    student_id = normalize_student_id(student_id)
     try:
-        print("=" * 50)
-        print(f"FETCHING RESULTS for student: '{student_id}'")
-        
-        conn = sqlite3.connect(DATABASE_RESULTS)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        
-        c.execute("""
-            SELECT * FROM results 
-            WHERE student_id=? 
-            ORDER BY year DESC, term DESC, created_at DESC
-        """, (student_id,))
-        
-        results = [dict(row) for row in c.fetchall()]
-        conn.close()
-        
-        print(f"Found {len(results)} results")
-        
-        # Calculate statistics
-        if results:
-            total_marks = sum(r["marks"] for r in results if r["marks"] is not None)
-            average = total_marks / len(results) if results else 0
-            
-            valid_results = [r for r in results if r["marks"] is not None]
-            if valid_results:
-                best_subject = max(valid_results, key=lambda x: x["marks"])
-                weak_subject = min(valid_results, key=lambda x: x["marks"])
-            else:
-                best_subject = {"subject": "N/A", "marks": 0}
-                weak_subject = {"subject": "N/A", "marks": 0}
-            
-            passed = sum(1 for r in results if r.get("status") == "Pass")
-            failed = len(results) - passed
-            
-            statistics = {
-                "totalSubjects": len(results),
-                "average": round(average, 2),
-                "bestSubject": best_subject["subject"],
-                "bestScore": best_subject["marks"],
-                "weakestSubject": weak_subject["subject"],
-                "weakestScore": weak_subject["marks"],
-                "passed": passed,
-                "failed": failed
-            }
-        else:
-            statistics = {
-                "totalSubjects": 0,
-                "average": 0,
-                "bestSubject": "N/A",
-                "bestScore": 0,
-                "weakestSubject": "N/A",
-                "weakestScore": 0,
-                "passed": 0,
-                "failed": 0
-            }
-        
-        print(f"✅ Results fetched successfully")
-        print("=" * 50)
-        
-        return jsonify({
-            "results": results,
-            "statistics": statistics
-        })
+        payload = read_student_results(student_id)
+        results_log.debug("student results", extra={"student_id": student_id,
+                                                      "results": len(payload["results"])})
+        return jsonify(payload)
         
     except Exception as e:
-        print(f"❌ ERROR in get_student_results: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        print("=" * 50)
+        results_log.exception("student results failed", extra={"student_id": student_id})
         return jsonify({
             "results": [],
             "statistics": {},
@@ -860,17 +2425,336 @@ def get_student_results(student_id):
         }), 500
 
 
+# ---------------------- CLASS ANALYTICS ----------------------
+# Positions, subject statistics and term-over-term trends for a whole form,
+# each computed by one SQL statement (window functions) over the form's
+# results for a term - rather than per student. The statements read the
+# term's rows through idx_results_form_year_term; left to itself the planner
+# may walk every year of the form in subject order instead. A result counts
+# as passed unless its status is "Fail".
+#
+# Answers are cached per (report, form, year, term, exam_type). An entry
+# is reused while results_seq() hasn't moved; when it has, the slice's row
+# count and highest change_seq (index-only) tell whether this form/term was
+# among the changes. Both live in the database, so this is right across
+# workers too.
+ANALYTICS_CACHE_SIZE = 256
+
+ANALYTICS_POSITIONS_SQL = """
+    WITH totals AS (
+        SELECT student_id, MAX(student_name) AS student_name, MAX(level) AS level, COUNT(*) AS subjects,
+               SUM(marks) AS total_marks, ROUND(AVG(marks), 2) AS average,
+               SUM(status IS NOT 'Fail') AS passed
+        FROM results INDEXED BY idx_results_form_year_term WHERE {where}
+        GROUP BY student_id
+    )
+    SELECT *, RANK() OVER (ORDER BY average DESC) AS position, COUNT(*) OVER () AS out_of
+    FROM totals
+    ORDER BY position, student_id
+"""
+
+ANALYTICS_SUBJECT_POSITIONS_SQL = """
+    SELECT student_id, subject, marks, grade, comment,
+           RANK() OVER (PARTITION BY subject ORDER BY marks DESC) AS position,
+           COUNT(*) OVER (PARTITION BY subject) AS out_of,
+           ROUND(AVG(marks) OVER (PARTITION BY subject), 2) AS subject_average
+    FROM results INDEXED BY idx_results_form_year_term WHERE {where}
+    ORDER BY student_id, subject
+"""
+
+ANALYTICS_SUBJECTS_SQL = """
+    SELECT subject, COUNT(*) AS entries, ROUND(AVG(marks), 2) AS average,
+           MIN(marks) AS lowest, MAX(marks) AS highest,
+           SUM(status IS NOT 'Fail') AS passed,
+           ROUND(100.0 * SUM(status IS NOT 'Fail') / COUNT(*), 1) AS pass_rate,
+           RANK() OVER (ORDER BY AVG(marks) DESC) AS position
+    FROM results INDEXED BY idx_results_form_year_term WHERE {where}
+    GROUP BY subject
+    ORDER BY position, subject
+"""
+
+ANALYTICS_GRADES_SQL = """
+    SELECT subject, grade, COUNT(*) AS n
+    FROM results INDEXED BY idx_results_form_year_term WHERE {where}
+    GROUP BY subject, grade
+"""
+
+ANALYTICS_STUDENT_TRENDS_SQL = """
+    WITH per_term AS (
+        SELECT student_id, MAX(student_name) AS student_name, term, ROUND(AVG(marks), 2) AS average
+        FROM results INDEXED BY idx_results_form_year_term WHERE {where}
+        GROUP BY student_id, term
+    )
+    SELECT *,
+           ROUND(average - LAG(average) OVER (PARTITION BY student_id ORDER BY term), 2) AS change,
+           RANK() OVER (PARTITION BY term ORDER BY average DESC) AS position
+    FROM per_term
+    ORDER BY student_id, term
+"""
+
+ANALYTICS_SUBJECT_TRENDS_SQL = """
+    SELECT subject, term, ROUND(AVG(marks), 2) AS average,
+           ROUND(AVG(marks) - LAG(AVG(marks)) OVER (PARTITION BY subject ORDER BY term), 2) AS change
+    FROM results INDEXED BY idx_results_form_year_term WHERE {where}
+    GROUP BY subject, term
+    ORDER BY subject, term
+"""
+
+_analytics_cache = OrderedDict()
+_analytics_lock = threading.Lock()
+
+
+class AnalyticsArgsError(ValueError):
+    pass
+
+
+def analytics_slice(form, year, term=None, exam_type=None):
+    """WHERE clause + params for one form's results in a year (and term)"""
+    where, params = "form=? AND year=?", [form, year]
+    if term is not None:
+        where += " AND term=?"
+        params.append(term)
+    if exam_type is not None:
+        where += " AND exam_type=?"
+        params.append(exam_type)
+    return where, params
+
+
+def analytics_args(need_term=True):
+    """form/year/term/exam_type from the query string"""
+    form = request.args.get("form", "")
+    term = request.args.get("term") or None
+    if not form or (need_term and term is None):
+        raise AnalyticsArgsError("form, year and term are required" if need_term else "form and year are required")
+    try:
+        year = int(request.args.get("year", ""))
+    except ValueError:
+        raise AnalyticsArgsError("year must be a number")
+    return form, year, term, request.args.get("exam_type")
+
+
+def build_positions(conn, where, params):
+    students = [dict(row) for row in conn.execute(ANALYTICS_POSITIONS_SQL.format(where=where), params)]
+    by_student = {s["student_id"]: s for s in students}
+    for s in students:
+        s["subjects"] = []
+    for row in conn.execute(ANALYTICS_SUBJECT_POSITIONS_SQL.format(where=where), params):
+        by_student[row["student_id"]]["subjects"].append({
+            "subject": row["subject"], "marks": row["marks"], "grade": row["grade"],
+            "position": row["position"], "out_of": row["out_of"], "subject_average": row["subject_average"],
+        })
+    return {"students": students}
+
+
+def build_subject_stats(conn, where, params):
+    subjects = [dict(row) for row in conn.execute(ANALYTICS_SUBJECTS_SQL.format(where=where), params)]
+    by_subject = {s["subject"]: s for s in subjects}
+    overall = {}
+    for s in subjects:
+        s["grades"] = {}
+    for subject, grade, n in conn.execute(ANALYTICS_GRADES_SQL.format(where=where), params):
+        by_subject[subject]["grades"][grade or ""] = n
+        overall[grade or ""] = overall.get(grade or "", 0) + n
+    return {"subjects": subjects, "grades": overall}
+
+
+def build_trends(conn, where, params):
+    students = OrderedDict()
+    for row in conn.execute(ANALYTICS_STUDENT_TRENDS_SQL.format(where=where), params):
+        student = students.setdefault(row["student_id"], {"student_id": row["student_id"],
+                                                          "student_name": row["student_name"], "terms": []})
+        student["terms"].append({"term": row["term"], "average": row["average"],
+                                 "change": row["change"], "position": row["position"]})
+    subjects = OrderedDict()
+    for row in conn.execute(ANALYTICS_SUBJECT_TRENDS_SQL.format(where=where), params):
+        subjects.setdefault(row["subject"], []).append(
+            {"term": row["term"], "average": row["average"], "change": row["change"]})
+    return {"students": list(students.values()),
+            "subjects": [{"subject": k, "terms": v} for k, v in subjects.items()]}
+
+
+def cached_analytics(report, build, form, year, term=None, exam_type=None):
+    """(JSON body, etag) of a report, from the cache while still current"""
+    key = (report, form, year, term, exam_type)
+    where, params = analytics_slice(form, year, term, exam_type)
+    with get_db(DATABASE_RESULTS) as conn:
+        seq = results_seq(conn)
+        with _analytics_lock:
+            entry = _analytics_cache.get(key)
+            if entry is not None:
+                _analytics_cache.move_to_end(key)
+        if entry is not None and entry["seq"] == seq:
+            return entry["body"], entry["etag"]
+        token = tuple(conn.execute(f"SELECT COUNT(*), MAX(change_seq) FROM results WHERE {where}", params).fetchone())
+        if entry is not None and entry["token"] == token:
+            entry["seq"] = seq
+            return entry["body"], entry["etag"]
+        payload = build(conn, where, params)
+    # Kept serialized: a form's positions run to a few MB of JSON
+    response = jsonify(dict(payload, success=True, form=form, year=year, term=term, exam_type=exam_type))
+    response.add_etag()
+    body, etag = response.get_data(), response.get_etag()[0]
+    with _analytics_lock:
+        _analytics_cache[key] = {"seq": seq, "token": token, "body": body, "etag": etag}
+        while len(_analytics_cache) > ANALYTICS_CACHE_SIZE:
+            _analytics_cache.popitem(last=False)
+    return body, etag
+
+
+def analytics_response(report, build, need_term=True):
+    try:
+        form, year, term, exam_type = analytics_args(need_term)
+    except AnalyticsArgsError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    body, etag = cached_analytics(report, build, form, year, term, exam_type)
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+@app.route("/analytics/positions", methods=["GET"])
+@require_session("teacher", "admin")
+def analytics_positions():
+    """Class positions by average mark, with each student's subject positions
+
+    ?form=&year=&term= (and optionally &exam_type=)
+    """
+    return analytics_response("positions", build_positions)
+
+
+@app.route("/analytics/subjects", methods=["GET"])
+@require_session("teacher", "admin")
+def analytics_subjects():
+    """Per-subject averages, ranges, pass rates and grade distributions for a form's term"""
+    return analytics_response("subjects", build_subject_stats)
+
+
+@app.route("/analytics/trends", methods=["GET"])
+@require_session("teacher", "admin")
+def analytics_trends():
+    """Term-by-term averages, changes and positions for a form's year (?form=&year=)"""
+    return analytics_response("trends", build_trends, need_term=False)
+
+
+# ---------------------- REPORT CARDS ----------------------
+# POST /reports/report_cards queues a "report_cards" job that writes a
+# printable card per student of a form/term (reports.py renders them on a
+# process pool) into REPORTS_DIR; poll it at /jobs/<id>, and once done the
+# zip is at /jobs/<id>/download. The cards come from the same two
+# window-function queries as /analytics/positions: totals and positions
+# first (one row per student), then every subject row of the term in
+# student order, grouped into cards REPORT_CHUNK_SIZE students at a time
+# while the pool renders earlier chunks. One such job runs at a time (the
+# pool already uses every core).
+REPORTS_DIR = os.path.abspath(os.environ.get("REPORTS_DIR", "reports"))
+REPORT_CHUNK_SIZE = 50
+REPORT_FORMATS = ("zip", "dir")
+
+REPORT_STUDENTS_SQL = "SELECT student_id, name, surname, class FROM students WHERE student_id IN ({marks})"
+
+
+def report_card_chunks(form, year, term, exam_type=None):
+    """(student count, generator of card-dict chunks) for a form's term"""
+    where, params = analytics_slice(form, year, term, exam_type)
+    with get_db(DATABASE_RESULTS) as conn:
+        totals = {row["student_id"]: dict(row) for row in
+                  conn.execute(ANALYTICS_POSITIONS_SQL.format(where=where), params)}
+
+    def student_details(ids):
+        with get_db(DATABASE_STUDENTS) as conn:
+            rows = conn.execute(REPORT_STUDENTS_SQL.format(marks=", ".join("?" * len(ids))), ids)
+            return {row["student_id"]: row for row in rows}
+
+    def make_chunk(batch):
+        details = student_details([student_id for student_id, _ in batch])
+        chunk = []
+        for student_id, subjects in batch:
+            total, student = totals[student_id], details.get(student_id)
+            name = " ".join(filter(None, (student["name"], student["surname"]))) if student else ""
+            chunk.append({
+                "student_id": student_id, "name": name or total["student_name"],
+                "class": student["class"] if student else None, "level": total["level"],
+                "form": form, "year": year, "term": term, "exam_type": exam_type,
+                "subjects": subjects, "total_marks": total["total_marks"], "average": total["average"],
+                "position": total["position"], "out_of": total["out_of"],
+                "passed": total["passed"], "subject_count": total["subjects"],
+            })
+        return chunk
+
+    def chunks():
+        batch = []
+        with get_db(DATABASE_RESULTS) as conn:
+            rows = conn.execute(ANALYTICS_SUBJECT_POSITIONS_SQL.format(where=where), params)
+            for student_id, group in itertools.groupby(rows, key=lambda row: row["student_id"]):
+                batch.append((student_id, [
+                    {k: row[k] for k in ("subject", "marks", "grade", "position", "out_of",
+                                         "subject_average", "comment")} for row in group
+                ]))
+                if len(batch) == REPORT_CHUNK_SIZE:
+                    yield make_chunk(batch)
+                    batch = []
+        if batch:
+            yield make_chunk(batch)
+
+    return len(totals), chunks()
+
+
+def report_title(form, year, term, exam_type=None):
+    return f"Form {form} report cards, term {term} {year}" + (f" ({exam_type})" if exam_type else "")
+
+
+def report_path(form, year, term, exam_type, fmt, job_id=None):
+    name = f"{form}-{year}-term{term}" + (f"-{exam_type}" if exam_type else "") + (f"-{job_id}" if job_id else "")
+    name = "".join(c if c.isalnum() or c in "-_" else "-" for c in name)
+    return os.path.join(REPORTS_DIR, name + (".zip" if fmt == "zip" else ""))
+
+
+@jobs.task("report_cards", concurrency=1, attempts=2)
+def report_cards_job(job):
+    form, year, term, exam_type, fmt = (job.args[k] for k in ("form", "year", "term", "exam_type", "format"))
+    path = report_path(form, year, term, exam_type, fmt, job.id)
+    total, chunks = report_card_chunks(form, year, term, exam_type)
+    job.progress(0, total)
+    written = reports.write_report_cards(chunks, path, report_title(form, year, term, exam_type), fmt=fmt,
+                                         progress=job.progress)
+    result = {"cards": written, "path": path}
+    if fmt == "zip":
+        result["download"] = {"path": path, "name": "report-cards-" + os.path.basename(
+            report_path(form, year, term, exam_type, fmt))}
+    return result
+
+
+@app.route("/reports/report_cards", methods=["POST"])
+@require_session("admin")
+def start_report_cards():
+    """Queue report cards for a form's term; poll the returned job
+
+    JSON body: form, year, term, optional exam_type and format ("zip", the
+    default, or "dir"). The same cards already queued or being written
+    return that job instead.
+    """
+    data = request.get_json(silent=True) or {}
+    form, term, exam_type = str(data.get("form") or ""), str(data.get("term") or ""), data.get("exam_type") or None
+    fmt = data.get("format", "zip")
+    try:
+        year = int(data.get("year", ""))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "message": "year must be a number"}), 400
+    if not form or not term:
+        return jsonify({"success": False, "message": "form, year and term are required"}), 400
+    if fmt not in REPORT_FORMATS:
+        return jsonify({"success": False, "message": "format must be zip or dir"}), 400
+    return accepted(jobs.enqueue("report_cards", {"form": form, "year": year, "term": term,
+                                                  "exam_type": exam_type, "format": fmt}))
+
+
 # ---------------------- DEBUG ROUTES ----------------------
 @app.route("/debug/students")
 def debug_students():
     try:
-        conn = sqlite3.connect(DATABASE_STUDENTS)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        c.execute("SELECT * FROM students")
-        students = [dict(row) for row in c.fetchall()]
-        conn.close()
-        return jsonify({"success": True, "count": len(students), "data": students})
+        students, next_cursor, _ = list_table(DATABASE_STUDENTS, "students")
+        return jsonify({"success": True, "count": len(students), "data": students, "next_cursor": next_cursor})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
@@ -878,13 +2762,8 @@ def debug_students():
 @app.route("/debug/teachers")
 def debug_teachers():
     try:
-        conn = sqlite3.connect(DATABASE_TEACHERS)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        c.execute("SELECT * FROM teachers")
-        teachers = [dict(row) for row in c.fetchall()]
-        conn.close()
-        return jsonify({"success": True, "count": len(teachers), "data": teachers})
+        teachers, next_cursor, _ = list_table(DATABASE_TEACHERS, "teachers")
+        return jsonify({"success": True, "count": len(teachers), "data": teachers, "next_cursor": next_cursor})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
@@ -892,17 +2771,317 @@ def debug_teachers():
 @app.route("/debug/results")
 def debug_results():
     try:
-        conn = sqlite3.connect(DATABASE_RESULTS)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        c.execute("SELECT * FROM results")
-        results = [dict(row) for row in c.fetchall()]
-        conn.close()
-        return jsonify({"success": True, "count": len(results), "data": results})
+        _, limit, cursor, columns = page_args(DATABASE_RESULTS, "results", RESULTS_PAGE_KEYS)
+        fmt = stream_format()
+        if fmt:
+            query, params = build_results_query(columns=columns, cursor=cursor)
+            return stream_rows(DATABASE_RESULTS, query, params, fmt)
+        query, params = build_results_query(columns=columns, cursor=cursor, limit=limit)
+        with get_db(DATABASE_RESULTS) as conn:
+            results = [dict(row) for row in conn.execute(query, params)]
+        results, next_cursor = finish_page(results, limit, RESULTS_PAGE_KEYS)
+        return jsonify({"success": True, "count": len(results), "data": results, "next_cursor": next_cursor})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
 
+@app.route("/debug/cache")
+def debug_cache():
+    """Response cache counters for this worker process"""
+    return jsonify({"success": True, "pid": os.getpid(), "cache": response_cache.stats()})
+
+
+def internal_gauges():
+    """Pool, cache, session, log queue, event stream and job counters for /metrics"""
+    pool, cache, sessions, log_queue = db_pool.stats(), response_cache.stats(), session_store.stats(), logs.stats()
+    stream_stats, job_stats = events.stats(), jobs.stats()
+    return [
+        ("school_db_pool_connections", "gauge", "Open SQLite connections", pool["open_connections"]),
+        ("school_db_pool_reuses_total", "counter", "Connections served from the pool", pool["hits"]),
+        ("school_db_pool_opens_total", "counter", "Connections opened", pool["opens"]),
+        ("school_response_cache_entries", "gauge", "Cached responses", cache["entries"]),
+        ("school_response_cache_bytes", "gauge", "Size of cached response bodies", cache["bytes"]),
+        ("school_response_cache_hits_total", "counter", "Response cache hits", cache["hits"]),
+        ("school_response_cache_misses_total", "counter", "Response cache misses", cache["misses"]),
+        ("school_response_cache_evictions_total", "counter", "Entries evicted to stay in budget", cache["evictions"]),
+        ("school_response_cache_invalidations_total", "counter", "Entries dropped by writes", cache["invalidations"]),
+        ("school_sessions", "gauge", "Sessions held in this worker", sessions["sessions"]),
+        ("school_log_records_dropped_total", "counter", "Log records dropped on a full queue", log_queue["dropped"]),
+        ("school_event_streams", "gauge", "Open /events streams held by a thread", stream_stats["thread_streams"]),
+        ("school_event_loop_streams", "gauge", "Open /events streams held by the event loop", stream_stats["loop_streams"]),
+        ("school_events_published_total", "counter", "Change events published", stream_stats["published"]),
+        ("school_events_delivered_total", "counter", "Events queued to streams", stream_stats["delivered"]),
+        ("school_event_streams_refused_total", "counter", "Streams refused (full or not available)", stream_stats["refused"]),
+        ("school_jobs_running", "gauge", "Background jobs running in this process", job_stats["running"]),
+        ("school_jobs_completed_total", "counter", "Background jobs finished", job_stats["completed"]),
+        ("school_jobs_failed_total", "counter", "Background jobs failed after their last try", job_stats["failed"]),
+        ("school_jobs_retried_total", "counter", "Background job tries queued again", job_stats["retried"]),
+    ]
+
+
+metrics.register_collector(internal_gauges)
+
+
+@app.route("/debug/pool")
+def debug_pool():
+    """Connection pool and session cache counters for this worker process"""
+    return jsonify({"success": True, "pid": os.getpid(), "pool": db_pool.stats(),
+                    "sessions": session_store.stats()})
+
+
+# ---------------------- QUERY PLAN AUDIT ----------------------
+# Every query the routes issue, with the parameters shape they use.
+# full_scan_ok marks queries that read the whole table on purpose (listings,
+# counts) or can't use an index yet; anything else must SEARCH an index.
+def audited_queries():
+    queries = []
+    for form in ("", "x"):
+        for subject in ("", "x"):
+            for term in ("", "x"):
+                sql, params = build_results_query(form, subject, term)
+                name = "get_results(" + ",".join(
+                    f for f, v in (("form", form), ("subject", subject), ("term", term)) if v
+                ) + ")"
+                # The unfiltered listing walks idx_results_created in order
+                queries.append((name, DATABASE_RESULTS, sql, params, not (form or subject or term)))
+                sql, params = build_results_query(form, subject, term, cursor=["x", 1], limit=100)
+                queries.append((name + ".page", DATABASE_RESULTS, sql, params, False))
+                sql, params = build_results_query(form, subject, term, limit=100, since=1)
+                queries.append((name + ".since", DATABASE_RESULTS, sql, params, False))
+    queries += [
+        ("student_results", DATABASE_RESULTS, STUDENT_RESULTS_QUERY, ["x"], False),
+        ("student_summary", DATABASE_RESULTS, STUDENT_SUMMARY_QUERY, ["x"], False),
+        ("refresh_summary", DATABASE_RESULTS,
+         "SELECT subject, marks, status FROM results WHERE student_id=? AND year=? AND term=? ORDER BY created_at DESC",
+         ["x", 1, "x"], False),
+        ("result_keys", DATABASE_RESULTS, "SELECT student_id, term, year FROM results WHERE id=?", [1], False),
+        ("result_by_key", DATABASE_RESULTS, RESULT_BY_KEY_SQL, ["x", "x", "x", 1, ""], False),
+        ("result_by_id", DATABASE_RESULTS, "SELECT * FROM results WHERE id=?", [1], False),
+        ("results_deleted", DATABASE_RESULTS, RESULTS_DELETED_SQL, [1, 100], False),
+        ("results_seq", DATABASE_RESULTS, "SELECT value FROM sequences WHERE name='results'", [], False),
+        ("events_since", EVENTS_DATABASE, "SELECT id, topic, data FROM events WHERE id > ? ORDER BY id LIMIT 1000", [1], False),
+        ("events_prune", EVENTS_DATABASE, "DELETE FROM events WHERE created < ?", [1.0], False),
+        ("delete_result", DATABASE_RESULTS, "DELETE FROM results WHERE id=?", [1], False),
+        ("statistics.subjects", DATABASE_RESULTS, "SELECT COUNT(*) FROM subject_counts", [], True),
+        ("student_by_id", DATABASE_STUDENTS, "SELECT * FROM students WHERE student_id=?", ["x"], False),
+        ("student_by_id_nocase", DATABASE_STUDENTS, "SELECT * FROM students WHERE student_id=? COLLATE NOCASE", ["x"], False),
+        # Only the outer walk over the MATCH candidates is a SCAN
+        ("search_students_fts", DATABASE_STUDENTS, STUDENT_SEARCH_SQL, ['"x"*', 200, 10], True),
+        ("update_student_password", DATABASE_STUDENTS, "UPDATE students SET password=? WHERE id=?", ["x", 1], False),
+        ("delete_student", DATABASE_STUDENTS, "DELETE FROM students WHERE id=?", [1], False),
+        ("get_students", DATABASE_STUDENTS, *build_list_query("students"), True),
+        ("get_students.page", DATABASE_STUDENTS, *build_list_query("students", cursor=[1], limit=100), False),
+        ("statistics.students", DATABASE_STUDENTS, "SELECT value FROM stats WHERE name='students'", [], False),
+        ("import_students_existing", DATABASE_STUDENTS, "SELECT student_id FROM students WHERE student_id IN (?, ?)", ["x", "y"], False),
+        ("import_teachers_existing", DATABASE_TEACHERS, "SELECT teacher_id FROM teachers WHERE teacher_id IN (?, ?)", ["x", "y"], False),
+        ("teacher_by_id", DATABASE_TEACHERS, "SELECT * FROM teachers WHERE teacher_id=?", ["x"], False),
+        ("delete_teacher", DATABASE_TEACHERS, "DELETE FROM teachers WHERE id=?", [1], False),
+        ("get_teachers", DATABASE_TEACHERS, *build_list_query("teachers"), True),
+        ("get_teachers.page", DATABASE_TEACHERS, *build_list_query("teachers", cursor=[1], limit=100), False),
+        ("statistics.teachers", DATABASE_TEACHERS, "SELECT value FROM stats WHERE name='teachers'", [], False),
+        ("admin_by_id", DATABASE_ADMIN, "SELECT * FROM admins WHERE admin_id=?", ["x"], False),
+    ]
+    where, params = analytics_slice("x", 1, "x")
+    year_where, year_params = analytics_slice("x", 1)
+    queries += [
+        ("analytics_token", DATABASE_RESULTS,
+         f"SELECT COUNT(*), MAX(change_seq) FROM results WHERE {where}", params, False),
+        ("analytics_positions", DATABASE_RESULTS, ANALYTICS_POSITIONS_SQL.format(where=where), params, False),
+        ("analytics_subject_positions", DATABASE_RESULTS,
+         ANALYTICS_SUBJECT_POSITIONS_SQL.format(where=where), params, False),
+        ("analytics_subjects", DATABASE_RESULTS, ANALYTICS_SUBJECTS_SQL.format(where=where), params, False),
+        ("analytics_grades", DATABASE_RESULTS, ANALYTICS_GRADES_SQL.format(where=where), params, False),
+        ("analytics_student_trends", DATABASE_RESULTS,
+         ANALYTICS_STUDENT_TRENDS_SQL.format(where=year_where), year_params, False),
+        ("analytics_subject_trends", DATABASE_RESULTS,
+         ANALYTICS_SUBJECT_TRENDS_SQL.format(where=year_where), year_params, False),
+        ("report_students", DATABASE_STUDENTS, REPORT_STUDENTS_SQL.format(marks="?, ?"), ["x", "y"], False),
+        ("job_by_id", JOBS_DATABASE, "SELECT * FROM jobs WHERE id=?", ["x"], False),
+        ("jobs_active", JOBS_DATABASE,
+         "SELECT id FROM jobs WHERE kind=? AND args=? AND status IN ('queued', 'running')", ["x", "{}"], False),
+        ("jobs_stale", JOBS_DATABASE, "SELECT id FROM jobs WHERE status='running' AND updated < ?", [1.0], False),
+        ("jobs_list", JOBS_DATABASE, "SELECT * FROM jobs ORDER BY created DESC LIMIT ?", [50], True),
+    ]
+    return queries
+
+
+def check_query_plans():
+    """Run EXPLAIN QUERY PLAN over audited_queries().
+
+    Returns (problems, report). A problem is any unexpected full table SCAN;
+    temp B-tree sorts are only noted in the report.
+    """
+    problems = []
+    report = []
+    for name, path, sql, params, full_scan_ok in audited_queries():
+        with get_db(path) as conn:
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        report.append((name, plan))
+        # CTEs and subqueries (window functions run over one) are already
+        # cut down to the rows an index found; scanning those is fine
+        derived = {step.split(" ", 1)[1] for step in plan if step.startswith(("CO-ROUTINE ", "MATERIALIZE "))}
+        for step in plan:
+            # A virtual table "scan" driven by MATCH (idxStr has an M) is an index lookup
+            if step.startswith("SCAN") and not full_scan_ok and not re.search(r"VIRTUAL TABLE INDEX \d+:\S*M", step) \
+                    and step[5:] not in derived:
+                problems.append(f"{name}: {step}")
+    return problems, report
+
+
+@app.cli.command("check-query-plans")
+def check_query_plans_command():
+    """Fail (exit 1) if any audited query falls back to a table scan."""
+    problems, report = check_query_plans()
+    for name, plan in report:
+        print(f"{name}:")
+        for step in plan:
+            print(f"    {step}")
+    if problems:
+        print("❌ Query plan regressions:")
+        for problem in problems:
+            print(f"    {problem}")
+        raise SystemExit(1)
+    print("✅ All queries use an index")
+
+
+@app.cli.command("build-assets")
+def build_assets_command():
+    """Minify, fingerprint and precompress the pages and their CSS/JS."""
+    for line in assets.report(assets.build()):
+        print(line)
+    print(f"✅ Built into {assets.ASSET_BUILD_DIR}" + ("" if assets.brotli else " (gzip only: brotli isn't installed)"))
+
+
+@app.cli.command("rebuild-summaries")
+def rebuild_summaries_command():
+    """Recompute student_summary from the results table."""
+    with get_db(DATABASE_RESULTS) as conn:
+        count = rebuild_student_summaries(conn)
+    print(f"✅ Rebuilt {count} student/term summaries")
+
+
+@app.cli.command("report-cards")
+@click.argument("form")
+@click.argument("year", type=int)
+@click.argument("term")
+@click.option("--exam-type", default=None, help="Only results of this exam type.")
+@click.option("--format", "fmt", type=click.Choice(REPORT_FORMATS), default="zip", show_default=True)
+@click.option("--out", default=None, help="Output path (default: under REPORTS_DIR).")
+def report_cards_command(form, year, term, exam_type, fmt, out):
+    """Write report cards for FORM's TERM of YEAR, without a web worker."""
+    out = out or report_path(form, year, term, exam_type, fmt)
+    started = time.perf_counter()
+    total, chunks = report_card_chunks(form, year, term, exam_type)
+    written = reports.write_report_cards(
+        chunks, out, report_title(form, year, term, exam_type), fmt=fmt,
+        progress=lambda done: print(f"    {done}/{total}", end="\r", flush=True))
+    print(f"\r✅ Wrote {written} report cards to {out} in {time.perf_counter() - started:.1f}s")
+
+
+@app.cli.command("jobs-worker")
+@click.option("--threads", default=jobs.JOB_THREADS or 2, show_default=True, help="Jobs run at once.")
+def jobs_worker_command(threads):
+    """Run background jobs in this process until interrupted (pair with JOB_THREADS=0 for the web workers)."""
+    print(f"✅ Running jobs from {JOBS_DATABASE} on {threads} threads (Ctrl-C to stop)", flush=True)
+    jobs.run_worker(threads)
+
+
+@app.cli.command("merge-databases")
+@click.argument("target")
+@click.option("--drop-orphans", is_flag=True,
+              help="Skip results whose student_id is not in students instead of stopping.")
+def merge_databases_command(target, drop_orphans):
+    """Copy the four separate database files into one TARGET file.
+
+    Run it with the separate-file configuration (SCHOOL_DB unset), then
+    start the app with SCHOOL_DB=TARGET.
+    """
+    if SINGLE_DATABASE:
+        raise click.ClickException("Unset SCHOOL_DB first; the merge reads the separate files")
+    if os.path.exists(target):
+        raise click.ClickException(f"{target} already exists")
+
+    init_databases(target, target, target)
+    init_admin_database(target)
+    run_migrations({"students": target, "teachers": target, "results": target})
+
+    sources = [
+        ("src_students", DATABASE_STUDENTS, ["students"]),
+        ("src_teachers", DATABASE_TEACHERS, ["teachers"]),
+        ("src_admin", DATABASE_ADMIN, ["admins"]),
+        ("src_results", DATABASE_RESULTS, ["results"]),
+    ]
+    conn = db_pool.acquire(target)
+    for alias, path, _ in sources:
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
+    merged = False
+    try:
+        orphans = conn.execute("""
+            SELECT COUNT(*), GROUP_CONCAT(DISTINCT student_id) FROM src_results.results
+            WHERE student_id NOT IN (SELECT student_id FROM src_students.students WHERE student_id IS NOT NULL)
+        """).fetchone()
+        if orphans[0] and not drop_orphans:
+            raise click.ClickException(
+                f"{orphans[0]} results belong to unknown students ({(orphans[1] or '')[:200]}). "
+                "Add those students or rerun with --drop-orphans.")
+
+        counts = {}
+        for alias, _, tables in sources:
+            for table in tables:
+                # Copy by column name; the source may predate newer columns
+                target_cols = table_columns(target, table)
+                source_cols = [r[1] for r in conn.execute(f"PRAGMA {alias}.table_info({table})")]
+                cols = ", ".join(c for c in target_cols if c in source_cols)
+                where = ""
+                if table == "results":
+                    where = " WHERE student_id IN (SELECT student_id FROM main.students)"
+                # Default admins were just seeded; the source's rows win
+                verb = "INSERT OR REPLACE" if table == "admins" else "INSERT"
+                c = conn.execute(f"{verb} INTO main.{table} ({cols}) SELECT {cols} FROM {alias}.{table}{where}")
+                counts[table] = c.rowcount
+        rebuild_student_summaries(conn)
+        conn.commit()
+        merged = True
+    finally:
+        if not merged:
+            conn.rollback()
+        for alias, _, _ in sources:
+            conn.execute(f"DETACH DATABASE {alias}")
+        if not merged:
+            # Don't leave a half-built file behind for the next attempt
+            db_pool.discard(target)
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(target + suffix):
+                    os.remove(target + suffix)
+
+    for table, count in counts.items():
+        print(f"✅ {table}: {count} rows")
+    if orphans[0]:
+        print(f"Skipped {orphans[0]} results for unknown students")
+    print(f"Start the app with SCHOOL_DB={target} to use it")
+
+
+@app.cli.command("migrate")
+def migrate_command():
+    """Apply pending schema migrations to every database file."""
+    applied = run_migrations()
+    for path, component, number in applied:
+        print(f"✅ {path}: applied {component} migration {number}")
+    if not applied:
+        print("Databases already up to date")
+
+
+# Check plans at startup too. Set STRICT_QUERY_PLANS=1 to refuse to start
+# instead of just logging the regressions.
+_plan_problems, _ = check_query_plans()
+if _plan_problems:
+    log.warning("query plan regressions", extra={"problems": _plan_problems})
+    if os.environ.get("STRICT_QUERY_PLANS") == "1":
+        raise RuntimeError("Query plan check failed: " + "; ".join(_plan_problems))
+
+
 # ==================== FLASK APP RUNNER ====================
+# Development server only; debug mode with FLASK_DEBUG=1. In production run
+# `gunicorn` from this directory (settings in gunicorn.conf.py).
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=int(os.environ.get("PORT", 5000)))
\ No newline at end of file
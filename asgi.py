@@ -0,0 +1,312 @@
+"""ASGI entry point: the same app, served from an event loop.
+
+    pip install -r requirements-asgi.txt
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 2
+
+or under gunicorn with GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker
+(see gunicorn.conf.py, and requirements-asgi.txt for newer uvicorn).
+uvicorn is an optional dependency, only needed for this mode; its
+[standard] extra brings the httptools parser and uvloop, without which
+this is slower than gunicorn's sync workers.
+
+A gunicorn sync worker belongs to one connection from the first byte of
+the request to the last byte of the response, so a handful of slow school
+network connections can tie up every worker. Here connections live on the
+event loop and cost a few KB each while they wait:
+
+- Pages and their CSS/JS (see assets.py) are answered on the loop, from
+  memory, without touching a thread.
+- Every other request runs the Flask app on a pool of ASGI_THREADS threads
+  once its body has fully arrived. SQLite calls block, so that pool is
+  what bounds concurrent DB work; requests beyond it wait on the loop.
+  A response body is handed back to the loop to send, so a thread is free
+  as soon as the view returns (streamed exports keep theirs while the
+  client reads, a few chunks ahead).
+- Server-sent event streams (/events, see events.py) are handed to the
+  loop by the view and cost no thread at all while they are open.
+
+Async Flask views wouldn't buy this: Flask runs each one on its own
+thread-bound event loop for the whole request.
+
+Static files bypass Flask, so they don't show up in /metrics here.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.http import parse_accept_header, parse_etags
+from werkzeug.utils import get_content_type
+
+import assets
+import events
+from app import app
+from logs import get_logger
+
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", 8))
+# Request bodies bigger than this are spooled to a temporary file
+BODY_SPOOL_BYTES = 1024 * 1024
+# Chunks of a streamed response buffered ahead of a slow client
+STREAM_AHEAD = 4
+
+log = get_logger("asgi")
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        # Threads don't survive a fork; each worker process gets its own pool
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix="wsgi")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _header(scope, name):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+# ---------------------- STATIC FILES ON THE LOOP ----------------------
+def _built_file(path):
+    if path.startswith(assets.ASSET_URL_PREFIX):
+        return assets.built_assets.file(path[len(assets.ASSET_URL_PREFIX):]), assets.IMMUTABLE
+    built = assets.built_assets.by_url.get(path)
+    return built, "no-cache"
+
+
+async def send_built(scope, send, built, cache_control):
+    """Same response assets._send() gives, without a trip through Flask"""
+    encoding, body = built.pick(parse_accept_header(_header(scope, b"accept-encoding")))
+    etag = f"{built.digest}-{encoding}"
+    headers = [(b"content-type", get_content_type(built.mimetype, "utf-8").encode()),
+               (b"cache-control", cache_control.encode()),
+               (b"etag", f'"{etag}"'.encode()),
+               (b"vary", b"Accept-Encoding")]
+    if encoding != "identity":
+        headers.append((b"content-encoding", encoding.encode()))
+    if parse_etags(_header(scope, b"if-none-match")).contains(etag):
+        await send({"type": "http.response.start", "status": 304, "headers": headers})
+        await send({"type": "http.response.body", "body": b""})
+        return
+    headers.append((b"content-length", str(len(body)).encode()))
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
+
+
+# ---------------------- FLASK ON THE THREAD POOL ----------------------
+async def read_body(receive):
+    body = tempfile.SpooledTemporaryFile(BODY_SPOOL_BYTES)
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            body.close()
+            return None
+        body.write(message.get("body", b""))
+        if not message.get("more_body", False):
+            body.seek(0)
+            return body
+
+
+def wsgi_environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "CONTENT_LENGTH": str(body.seek(0, os.SEEK_END)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        events.LOOP_STREAMS_KEY: True,
+    }
+    body.seek(0)
+    for name, value in scope["headers"]:
+        name, value = name.decode("latin-1"), value.decode("latin-1")
+        if name == "content-type":
+            environ["CONTENT_TYPE"] = value
+        elif name != "content-length":
+            key = "HTTP_" + name.upper().replace("-", "_")
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class Abandoned(Exception):
+    """The loop stopped waiting for this response"""
+
+
+def run_wsgi(environ, loop, queue, abandoned):
+    """Run the Flask app on a pool thread, passing its output to the loop.
+
+    The whole request, including iterating a streamed body, stays on this
+    one thread: Flask's request context and the per-thread DB connection
+    can't follow a generator to another thread.
+    """
+    def put(item):
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                return future.result(timeout=1)
+            except TimeoutError:
+                if abandoned.is_set():
+                    future.cancel()
+                    raise Abandoned()
+
+    def start_response(status, headers, exc_info=None):
+        put(("start", int(status.split(" ", 1)[0]),
+             [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]))
+
+    def put_last(item):
+        try:
+            put(item)
+        except Abandoned:
+            pass
+
+    result = None
+    try:
+        result = app(environ, start_response)
+        subscriber = environ.get(events.LOOP_STREAMS_KEY)
+        if isinstance(subscriber, events.Subscriber):
+            put(("events", subscriber))
+        for chunk in result:
+            if abandoned.is_set():
+                break
+            if chunk:
+                put(("body", chunk))
+    except Abandoned:
+        pass
+    except Exception:
+        log.exception("response failed", extra={"path": environ["PATH_INFO"]})
+        put_last(("error", None))
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+        environ["wsgi.input"].close()
+        put_last(("end", None))
+
+
+async def send_wsgi(scope, receive, send):
+    body = await read_body(receive)
+    if body is None:
+        return
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(STREAM_AHEAD)
+    abandoned = threading.Event()
+    done = loop.run_in_executor(_get_executor(), run_wsgi, wsgi_environ(scope, body), loop, queue, abandoned)
+    failed = started = client_gone = False
+    subscriber = None
+    try:
+        while True:
+            kind, *payload = await queue.get()
+            if kind == "end":
+                break
+            if failed:
+                continue
+            try:
+                if kind == "start":
+                    started = True
+                    await send({"type": "http.response.start", "status": payload[0], "headers": payload[1]})
+                elif kind == "body":
+                    await send({"type": "http.response.body", "body": payload[0], "more_body": True})
+                elif kind == "events":
+                    subscriber = payload[0]
+                else:
+                    failed = True
+            except OSError:
+                # Client went away; let the thread wind down
+                failed = client_gone = True
+                abandoned.set()
+    except asyncio.CancelledError:
+        abandoned.set()
+        raise
+    finally:
+        await asyncio.shield(done)
+        if subscriber is not None and (failed or client_gone):
+            events.broker.unsubscribe(subscriber)
+    if client_gone:
+        return
+    if failed and started:
+        # Cut the connection so the client can tell the body is incomplete
+        raise RuntimeError("response aborted")
+    if failed:
+        await send({"type": "http.response.start", "status": 500,
+                    "headers": [(b"content-type", b"text/plain; charset=utf-8")]})
+        await send({"type": "http.response.body", "body": b"Internal Server Error"})
+        return
+    if subscriber is not None:
+        await send_events(subscriber, receive, send)
+        return
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+# ---------------------- EVENT STREAMS ON THE LOOP ----------------------
+async def _disconnected(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def send_events(subscriber, receive, send):
+    """Send an event stream the /events view handed over, until the client leaves"""
+    chunks = events.stream_async(subscriber)
+    gone = asyncio.ensure_future(_disconnected(receive))
+    try:
+        while True:
+            chunk = asyncio.ensure_future(chunks.__anext__())
+            await asyncio.wait({chunk, gone}, return_when=asyncio.FIRST_COMPLETED)
+            if not chunk.done():
+                # The generator can't be closed while a step of it is running
+                chunk.cancel()
+                await asyncio.gather(chunk, return_exceptions=True)
+                break
+            await send({"type": "http.response.body", "body": chunk.result().encode(), "more_body": True})
+    except OSError:
+        pass
+    finally:
+        gone.cancel()
+        await chunks.aclose()
+        events.broker.unsubscribe(subscriber)
+
+
+# ---------------------- ENTRY POINT ----------------------
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            _get_executor()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _executor is not None:
+                _executor.shutdown(wait=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+    if scope["method"] in ("GET", "HEAD"):
+        built, cache_control = _built_file(scope["path"])
+        if built is not None:
+            return await send_built(scope, send, built, cache_control)
+    await send_wsgi(scope, receive, send)
@@ -0,0 +1,351 @@
+"""Built, fingerprinted and precompressed pages, CSS and JS.
+
+build() minifies every page in PAGES and every file in ASSETS, then writes
+them to ASSET_BUILD_DIR:
+
+- CSS/JS as name.<hash>.ext, the hash being of the minified content.
+  Pages refer to those names, so browsers keep them for a year
+  (Cache-Control: immutable); a changed file simply gets a new name.
+- Pages keep their URLs and are revalidated on every load (no-cache + ETag,
+  so a repeat visit is a 304 with an empty body).
+- Each file also precompressed as .gz, and as .br when the brotli package
+  is installed; a variant is only kept when it is smaller.
+
+At runtime one handler answers all of these URLs from memory, choosing the
+smallest variant the browser accepts. The old CSS/JS URLs still work (with
+no-cache) for pages a browser kept from before. The app builds on startup
+when the manifest is missing or older than a source file
+(ASSETS_AUTO_BUILD=0 turns that off); `flask build-assets` or
+`python assets.py` builds ahead of time, e.g. when deploying.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import threading
+import time
+
+from flask import Response, abort, request
+
+from logs import get_logger
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSET_BUILD_DIR = os.path.join(BASE_DIR, os.environ.get("ASSET_BUILD_DIR", "build/assets"))
+ASSETS_AUTO_BUILD = os.environ.get("ASSETS_AUTO_BUILD", "1") != "0"
+ASSET_URL_PREFIX = "/assets/"
+MANIFEST = "manifest.json"
+IMMUTABLE = "public, max-age=31536000, immutable"
+ENCODING_SUFFIX = {"gzip": ".gz", "br": ".br"}
+# Files of earlier builds stay servable this long for pages still open
+# in a browser (or served by a worker that hasn't restarted yet)
+KEEP_OLD_BUILDS = 7 * 24 * 3600
+
+# URL -> source file, relative to BASE_DIR
+PAGES = {
+    "/": "index.html",
+    "/admin": "admin/adminlogin/adminlogin.html",
+    "/admin/dashboard": "admin/templates/admin_dashboard.html",
+    "/teacher": "teacher/teacherlogin/teacherlogin.html",
+    "/teacher/teacher_dashboard.html": "teacher/teacher_dashboard.html",
+    "/student": "student/studentlog.html",
+    "/student/student_dashboard.html": "student/student_dashboard.html",
+}
+ASSETS = {
+    "/admin/adminlogin.css": "admin/adminlogin/adminlogin.css",
+    "/admin/adminlogin.js": "admin/adminlogin/adminlogin.js",
+    "/admin/static/admin_dashboard.css": "admin/static/admin_dashboard.css",
+    "/admin/static/admin_dashboard.js": "admin/static/admin_dashboard.js",
+    "/teacher/teacherlog.css": "teacher/teacherlogin/teacherlog.css",
+    "/teacher/teacherlog.js": "teacher/teacherlogin/teacherlog.js",
+    "/teacher/teacher_dashboard.css": "teacher/teacher_dashboard.css",
+    "/teacher/teacher_dashboard.js": "teacher/teacher_dashboard.js",
+    "/student/studentlog.css": "student/studentlog.css",
+    "/student/studentlog.js": "student/studentlog.js",
+}
+
+_BUILT_NAME = re.compile(r"^[A-Za-z0-9_-]+\.[0-9a-f]{12}\.(css|js|html)$")
+
+
+# ---------------------- MINIFY ----------------------
+# Deliberately conservative: only whitespace and comments go, and newlines
+# stay in JS so automatic semicolon insertion behaves exactly as before.
+_CSS_TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/|[^"\'/]+|/', re.S)
+
+
+def minify_css(text):
+    out = []
+    for token in _CSS_TOKEN.findall(text):
+        if token[0] in "\"'":
+            out.append(token)
+        elif token.startswith("/*"):
+            continue
+        else:
+            token = re.sub(r"\s+", " ", token)
+            out.append(re.sub(r" ?([{};,>]) ?", r"\1", token))
+    return "".join(out).replace(";}", "}").strip()
+
+
+def _template_toggles(line):
+    """Number of backticks on a line that open or close a template literal"""
+    toggles, quote, i = 0, None, 0
+    while i < len(line):
+        ch = line[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+        elif ch == "`":
+            toggles += 1
+        elif line.startswith("//", i):
+            break
+        i += 1
+    return toggles
+
+
+def minify_js(text):
+    """Drop indentation, blank lines and whole-line comments"""
+    out, in_template, in_comment = [], False, False
+    for line in text.split("\n"):
+        if in_template:
+            out.append(line)
+            if line.count("`") % 2:
+                in_template = False
+            continue
+        stripped = line.strip()
+        if in_comment:
+            in_comment = not stripped.endswith("*/")
+            continue
+        if not stripped or stripped.startswith("//"):
+            continue
+        if stripped.startswith("/*") and "*/" not in stripped[2:]:
+            in_comment = True
+            continue
+        if stripped.startswith("/*") and stripped.endswith("*/") and stripped.count("*/") == 1:
+            continue
+        out.append(stripped)
+        in_template = bool(_template_toggles(stripped) % 2)
+    return "\n".join(out)
+
+
+_HTML_BLOCK = re.compile(r"(<script\b[^>]*>)(.*?)(</script\s*>)|(<style\b[^>]*>)(.*?)(</style\s*>)"
+                         r"|(<pre\b.*?</pre\s*>|<textarea\b.*?</textarea\s*>)|(<!--(?!\[if).*?-->)", re.S | re.I)
+
+
+def _minify_html_text(text):
+    return "\n".join(line.strip() for line in text.split("\n") if line.strip())
+
+
+def minify_html(text):
+    out, pos = [], 0
+    for match in _HTML_BLOCK.finditer(text):
+        out.append(_minify_html_text(text[pos:match.start()]))
+        pos = match.end()
+        script_open, script, script_close, style_open, style, style_close, verbatim, _comment = match.groups()
+        if script_open:
+            plain_js = re.search(r"\btype\s*=", script_open, re.I) is None or "javascript" in script_open.lower()
+            out.append(script_open + (minify_js(script) if plain_js else script) + script_close)
+        elif style_open:
+            out.append(style_open + minify_css(style) + style_close)
+        elif verbatim:
+            out.append(verbatim)
+    out.append(_minify_html_text(text[pos:]))
+    return "\n".join(part for part in out if part)
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js, ".html": minify_html}
+
+
+# ---------------------- BUILD ----------------------
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _write(path, data):
+    # Workers may build at the same time; never let one read a half-written file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _compress(data):
+    variants = {"gzip": gzip.compress(data, 9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    return {enc: body for enc, body in variants.items() if len(body) < len(data)}
+
+
+def _build_file(source, out_dir, rewrite=None):
+    with open(os.path.join(BASE_DIR, source), encoding="utf-8") as f:
+        text = f.read().replace("\r\n", "\n")
+    stem, ext = os.path.splitext(os.path.basename(source))
+    text = MINIFIERS[ext](text)
+    if rewrite:
+        text = rewrite(text)
+    data = text.encode("utf-8")
+    name = f"{stem}.{_digest(data)}{ext}"
+    _write(os.path.join(out_dir, name), data)
+    sizes = {"identity": len(data)}
+    for encoding, body in _compress(data).items():
+        _write(os.path.join(out_dir, name + ENCODING_SUFFIX[encoding]), body)
+        sizes[encoding] = len(body)
+    return {"file": name, "source": source, "original": os.path.getsize(os.path.join(BASE_DIR, source)),
+            "sizes": sizes}
+
+
+
+def build(out_dir=ASSET_BUILD_DIR):
+    """Build everything and write the manifest; returns the manifest"""
+    os.makedirs(out_dir, exist_ok=True)
+    assets = {url: _build_file(source, out_dir) for url, source in ASSETS.items()}
+
+    def link_built(html):
+        def swap(match):
+            entry = assets.get(match.group(3))
+            if entry is None:
+                return match.group(0)
+            return f"{match.group(1)}={match.group(2)}{ASSET_URL_PREFIX}{entry['file']}{match.group(2)}"
+        return re.sub(r"""\b(href|src)=(["'])(/[^"']*)\2""", swap, html)
+
+    pages = {url: _build_file(source, out_dir, link_built) for url, source in PAGES.items()}
+    manifest = {"built": time.time(), "pages": pages, "assets": assets}
+    _write(os.path.join(out_dir, MANIFEST), json.dumps(manifest, indent=1).encode("utf-8"))
+    _prune(out_dir, manifest)
+    return manifest
+
+
+def _prune(out_dir, manifest):
+    keep = {entry["file"] for group in ("pages", "assets") for entry in manifest[group].values()}
+    cutoff = time.time() - KEEP_OLD_BUILDS
+    for name in os.listdir(out_dir):
+        base = name[:-3] if name.endswith((".gz", ".br")) else name
+        path = os.path.join(out_dir, name)
+        if _BUILT_NAME.match(base) and base not in keep and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+
+def is_stale(out_dir=ASSET_BUILD_DIR):
+    try:
+        built = os.path.getmtime(os.path.join(out_dir, MANIFEST))
+    except OSError:
+        return True
+    sources = list(PAGES.values()) + list(ASSETS.values())
+    return any(os.path.getmtime(os.path.join(BASE_DIR, source)) > built for source in sources)
+
+
+def report(manifest):
+    """One line per built file: bytes before, minified, gzip and brotli"""
+    lines = [f"{'url':<34} {'source':>8} {'minified':>9} {'gzip':>7} {'br':>7}  file"]
+    for group in ("pages", "assets"):
+        for url, entry in manifest[group].items():
+            sizes = entry["sizes"]
+            lines.append(f"{url:<34} {entry['original']:>8} {sizes['identity']:>9} "
+                         f"{sizes.get('gzip', '-'):>7} {sizes.get('br', '-'):>7}  {entry['file']}")
+    return lines
+
+
+# ---------------------- SERVING ----------------------
+class BuiltFile:
+    """One built file held in memory with its precompressed variants"""
+
+    def __init__(self, directory, name):
+        self.name = name
+        self.digest = name.rsplit(".", 2)[1]
+        self.mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.variants = {}
+        for encoding, suffix in [("identity", "")] + list(ENCODING_SUFFIX.items()):
+            try:
+                with open(os.path.join(directory, name + suffix), "rb") as f:
+                    self.variants[encoding] = f.read()
+            except FileNotFoundError:
+                pass
+
+    def pick(self, accept_encodings):
+        """Smallest variant the client accepts"""
+        best = "identity"
+        for encoding, body in self.variants.items():
+            if accept_encodings[encoding] and len(body) < len(self.variants[best]):
+                best = encoding
+        return best, self.variants[best]
+
+
+class BuiltAssets:
+    def __init__(self, directory=ASSET_BUILD_DIR):
+        self.directory = directory
+        self.by_url = {}
+        self.by_name = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        with open(os.path.join(self.directory, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        by_url, by_name = {}, {}
+        for group in ("pages", "assets"):
+            for url, entry in manifest[group].items():
+                built = by_name[entry["file"]] = BuiltFile(self.directory, entry["file"])
+                by_url[url] = built
+        self.by_url, self.by_name = by_url, by_name
+
+    def file(self, name):
+        built = self.by_name.get(name)
+        if built is None and _BUILT_NAME.match(name) and os.path.exists(os.path.join(self.directory, name)):
+            # From another build: a page loaded before a redeploy
+            with self._lock:
+                built = self.by_name[name] = BuiltFile(self.directory, name)
+        return built
+
+
+built_assets = BuiltAssets()
+
+
+def _send(built, cache_control):
+    encoding, body = built.pick(request.accept_encodings)
+    response = Response(body, mimetype=built.mimetype)
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.set_etag(f"{built.digest}-{encoding}")
+    response.headers["Cache-Control"] = cache_control
+    return response.make_conditional(request)
+
+
+def serve_url(url):
+    """A page, or a CSS/JS file under its old unhashed URL"""
+    built = built_assets.by_url.get(url)
+    if built is None:
+        abort(404)
+    return _send(built, "no-cache")
+
+
+def serve_built(name):
+    """A fingerprinted file; its content never changes under this name"""
+    built = built_assets.file(name)
+    if built is None:
+        abort(404)
+    return _send(built, IMMUTABLE)
+
+
+def init_app(app):
+    if ASSETS_AUTO_BUILD and is_stale():
+        manifest = build()
+        get_logger("assets").info("assets built", extra={"files": len(manifest["pages"]) + len(manifest["assets"])})
+    built_assets.load()
+    for url in list(PAGES) + list(ASSETS):
+        app.add_url_rule(url, "built_asset", serve_url, defaults={"url": url})
+    app.add_url_rule(ASSET_URL_PREFIX + "<name>", "built_file", serve_built)
+
+
+if __name__ == "__main__":
+    for line in report(build()):
+        print(line)
@@ -0,0 +1,548 @@
+"""Load test / benchmark for the Flask API.
+
+Seeds a scratch directory with a synthetic school, then drives realistic
+request mixes at the app and reports req/s and p50/p95/p99 latency:
+
+    python bench.py --scale small                      # in-process test client
+    python bench.py --scale medium --driver gunicorn --workers 4 --concurrency 8
+    python bench.py --driver asgi --workers 2 --scenarios dashboard --concurrency 200 --slow-clients 50
+    python bench.py --scale small --save baseline.json
+    python bench.py --scale small --compare baseline.json   # exit 1 on regression
+
+Scenarios (--scenarios, default all):
+    login       login storm: student logins (any ID case) plus some teacher logins
+    results     results-release day: logged-in students loading /student_results
+    marking     teachers saving marks one at a time via /save_result
+    admin       admin paging through /get_students, /get_results and statistics
+    dashboard   index page visitors: the page, its assets and statistics polls
+    mixed       all of the above in release-day proportions
+
+Drivers (--driver): the in-process test client, gunicorn with the
+production settings from gunicorn.conf.py, or uvicorn serving
+asgi:application. --slow-clients N keeps N
+extra connections open that send their request a header line per second,
+the way phones on a poor network do, while a scenario runs.
+
+Seeded data lives in --workdir (default ./bench-data) and is reused while
+the scale settings stay the same; --reseed forces a fresh copy. Every seeded
+student and teacher has the password BENCH_PASSWORD, so the login paths do
+real hash checks.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import date
+from urllib.parse import quote
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCALES = {
+    "small": {"students": 1000, "teachers": 40},
+    "medium": {"students": 20000, "teachers": 400},
+    "large": {"students": 100000, "teachers": 2000},
+}
+BENCH_PASSWORD = "bench-password"
+SEED_FILE = "bench_seed.json"
+BATCH = 10000
+
+FIRST_NAMES = ["Tendai", "Rudo", "Tatenda", "Farai", "Chipo", "Blessing", "Kuda", "Nyasha",
+               "John", "Mary", "Tafadzwa", "Rumbidzai", "Takudzwa", "Ruvimbo", "Tinashe", "Panashe"]
+SURNAMES = ["Moyo", "Ncube", "Sibanda", "Dube", "Mpofu", "Chirwa", "Banda", "Phiri",
+            "Mutasa", "Chikomo", "Ndlovu", "Nyathi", "Zhou", "Marufu", "Gumbo", "Shumba"]
+SUBJECTS = ["English Language", "Mathematics", "Biology", "Chemistry", "Physics", "Geography",
+            "Agriculture", "Computer Science", "Heritage Studies", "Accounting", "Business Studies",
+            "History", "Shona / Mutauro", "French", "Religious Studies", "Literature in English"]
+TERMS = ["Term 1", "Term 2", "Term 3"]
+
+
+def grade_for(marks):
+    for limit, grade in ((80, "A"), (70, "B"), (60, "C"), (50, "D")):
+        if marks >= limit:
+            return grade
+    return "E"
+
+
+# ---------------------- SEEDING ----------------------
+def seed(app_module, settings, rng):
+    """Fill the (fresh) databases; returns seconds taken"""
+    get_db = app_module.get_db
+    password = app_module.hash_password(BENCH_PASSWORD)
+    year = date.today().year
+    started = time.perf_counter()
+
+    students = []
+    for n in range(settings["students"]):
+        form = rng.randint(1, 6)
+        students.append((f"ST{n:06d}", rng.choice(FIRST_NAMES), rng.choice(SURNAMES),
+                         f"Form {form}{rng.choice('ABCD')}", password))
+    with get_db(app_module.DATABASE_STUDENTS) as conn:
+        for i in range(0, len(students), BATCH):
+            conn.executemany("INSERT INTO students (student_id, name, surname, class, password) "
+                             "VALUES (?, ?, ?, ?, ?)", students[i:i + BATCH])
+
+    with get_db(app_module.DATABASE_TEACHERS) as conn:
+        conn.executemany(
+            "INSERT INTO teachers (teacher_id, name, surname, class, phone, password, role) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(f"T{n:05d}", rng.choice(FIRST_NAMES), rng.choice(SURNAMES), f"Form {rng.randint(1, 6)}",
+              "0770000000", password, "teacher") for n in range(settings["teachers"])])
+
+    subjects = SUBJECTS[:settings["subjects"]]
+    terms = TERMS[:settings["terms"]]
+    batch = []
+    with get_db(app_module.DATABASE_RESULTS) as conn:
+        for student_id, name, surname, klass, _ in students:
+            form = klass.split()[1][0]
+            for term in terms:
+                for subject in subjects:
+                    marks = rng.randint(20, 100)
+                    batch.append((student_id, f"{name} {surname}", form, "O Level" if form < "5" else "A Level",
+                                  subject, term, year, "End of Term", f"{year}-04-01", marks, grade_for(marks),
+                                  "Pass" if marks >= 50 else "Fail", "", f"T{rng.randrange(settings['teachers']):05d}"))
+            if len(batch) >= BATCH:
+                conn.executemany(app_module.SAVE_RESULT_SQL, batch)
+                batch = []
+        if batch:
+            conn.executemany(app_module.SAVE_RESULT_SQL, batch)
+        app_module.rebuild_student_summaries(conn)
+    app_module.data_changed("students", "teachers", "results")
+    return time.perf_counter() - started
+
+
+def prepare_workdir(args, settings):
+    """chdir into the workdir and import the app there, seeding if needed"""
+    workdir = os.path.abspath(args.workdir)
+    marker = os.path.join(workdir, SEED_FILE)
+    reuse = False
+    if os.path.exists(marker) and not args.reseed:
+        with open(marker) as f:
+            reuse = json.load(f) == settings
+    if not reuse and os.path.isdir(workdir):
+        shutil.rmtree(workdir)
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    import app as app_module
+
+    if reuse:
+        print(f"Reusing seeded data in {workdir}")
+    else:
+        print(f"Seeding {settings['students']} students, {settings['teachers']} teachers, "
+              f"{settings['students'] * settings['subjects'] * settings['terms']} results in {workdir} ...")
+        took = seed(app_module, settings, random.Random(args.seed))
+        with open(marker, "w") as f:
+            json.dump(settings, f)
+        print(f"Seeded in {took:.1f}s")
+    return workdir, app_module
+
+
+# ---------------------- DRIVERS ----------------------
+class TestClientDriver:
+    """Requests through Flask's test client, in this process"""
+    name = "client"
+
+    def __init__(self, app_module):
+        self.app = app_module.app
+
+    def connect(self):
+        client = self.app.test_client()
+
+        def request(method, path, body=None, headers=None):
+            response = client.open(path, method=method, json=body, headers=headers or {})
+            data = response.get_data()
+            response.close()
+            return response.status_code, data
+
+        return request
+
+    def close(self):
+        pass
+
+
+class ServerDriver:
+    """Requests over HTTP to a local server process serving the seeded workdir"""
+
+    def __init__(self, name, command, workdir, port):
+        self.name = name
+        self.port = port
+        env = dict(os.environ, SESSION_STORE="sqlite", PYTHONPATH=REPO_DIR)
+        started = time.perf_counter()
+        self.process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL)
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise SystemExit(f"{command[2]} exited during startup (is it installed?)")
+            status, _ = self.connect()("GET", "/api/statistics")
+            if status == 200:
+                print(f"{name} answering after {time.perf_counter() - started:.2f}s")
+                return
+            time.sleep(0.2)
+        self.close()
+        raise SystemExit(f"{command[2]} did not start within 60s")
+
+    def connect(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+
+        def request(method, path, body=None, headers=None):
+            headers = dict(headers or {})
+            payload = None
+            if body is not None:
+                payload = json.dumps(body)
+                headers["Content-Type"] = "application/json"
+            try:
+                try:
+                    conn.request(method, path, payload, headers)
+                    response = conn.getresponse()
+                except (http.client.HTTPException, ConnectionError):
+                    # sync workers close idle keep-alive connections; retry once
+                    conn.close()
+                    conn.request(method, path, payload, headers)
+                    response = conn.getresponse()
+                return response.status, response.read()
+            except (OSError, http.client.HTTPException) as e:
+                # Timed out or refused: count it as an error and start afresh
+                conn.close()
+                return 599, str(e).encode()
+
+        return request
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            self.process.wait(timeout=30)
+
+
+def server_command(driver, workers, port):
+    if driver == "gunicorn":
+        # The production profile, with the worker count and address from here
+        return [sys.executable, "-m", "gunicorn", "--config", os.path.join(REPO_DIR, "gunicorn.conf.py"),
+                "--workers", str(workers), "--bind", f"127.0.0.1:{port}", "--log-level", "warning", "app:app"]
+    return [sys.executable, "-m", "uvicorn", "asgi:application", "--workers", str(workers),
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+
+
+class SlowClients:
+    """Connections that take forever to send their request headers"""
+
+    def __init__(self, port, count, interval=1.0):
+        self.port = port
+        self.count = count
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _open(self):
+        sock = socket.create_connection(("127.0.0.1", self.port), timeout=5)
+        sock.sendall(b"GET /api/statistics HTTP/1.1\r\nHost: bench\r\n")
+        return sock
+
+    def _run(self):
+        socks = []
+        while not self._stop.is_set():
+            # Top up connections the server has closed, then send one more line on each
+            while len(socks) < self.count and not self._stop.is_set():
+                try:
+                    socks.append(self._open())
+                except OSError:
+                    break
+            alive = []
+            for sock in socks:
+                try:
+                    sock.sendall(b"X-Slow: 1\r\n")
+                    alive.append(sock)
+                except OSError:
+                    sock.close()
+            socks = alive
+            self._stop.wait(self.interval)
+        for sock in socks:
+            sock.close()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+# ---------------------- SCENARIOS ----------------------
+# Each scenario returns (label, method, path, body, headers) for the next
+# request; `state` is per worker thread.
+def random_student_id(ctx, rng):
+    return f"ST{rng.randrange(ctx['students']):06d}"
+
+
+def login_request(ctx, rng, state):
+    if rng.random() < 0.9:
+        student_id = random_student_id(ctx, rng)
+        # Students type their ID in any case
+        if rng.random() < 0.3:
+            student_id = student_id.lower()
+        return "student_login", "POST", "/student_login", {"studentId": student_id, "password": BENCH_PASSWORD}, None
+    teacher_id = f"T{rng.randrange(ctx['teachers']):05d}"
+    return "teacher_login", "POST", "/teacher_login", {"teacherId": teacher_id, "password": BENCH_PASSWORD}, None
+
+
+def results_request(ctx, rng, state):
+    student_id, token = rng.choice(ctx["tokens"])
+    return ("student_results", "GET", f"/student_results/{student_id}", None,
+            {"Authorization": f"Bearer {token}"})
+
+
+def marking_request(ctx, rng, state):
+    marks = rng.randint(20, 100)
+    student_id = random_student_id(ctx, rng)
+    body = {
+        "student_id": student_id, "student_name": "Bench Student", "form": "3", "level": "O Level",
+        "subject": rng.choice(SUBJECTS[:ctx["subjects"]]), "term": rng.choice(TERMS[:ctx["terms"]]),
+        "year": date.today().year, "exam_type": "End of Term", "marks": marks, "grade": grade_for(marks),
+        "status": "Pass" if marks >= 50 else "Fail", "teacher_id": "T00000",
+    }
+    return "save_result", "POST", "/save_result", body, None
+
+
+def admin_request(ctx, rng, state):
+    roll = rng.random()
+    if roll < 0.5:
+        cursor = state.get("students_cursor")
+        path = "/get_students?limit=50" + (f"&cursor={quote(cursor)}" if cursor else "")
+        state["expect_cursor"] = True
+        return "get_students", "GET", path, None, None
+    if roll < 0.8:
+        return ("get_results", "GET", f"/get_results?limit=100&form={rng.randint(1, 6)}", None, None)
+    return "statistics", "GET", "/api/statistics", None, None
+
+
+DASHBOARD_ASSETS = ["/student/studentlog.css", "/student/studentlog.js", "/teacher/teacherlog.css"]
+
+
+def dashboard_request(ctx, rng, state):
+    roll = rng.random()
+    if roll < 0.7:
+        return "statistics", "GET", "/api/statistics", None, None
+    if roll < 0.9:
+        return "index", "GET", "/", None, {"Accept-Encoding": "gzip, br"}
+    return "asset", "GET", rng.choice(DASHBOARD_ASSETS), None, {"Accept-Encoding": "gzip, br"}
+
+
+def mixed_request(ctx, rng, state):
+    roll = rng.random()
+    if roll < 0.5:
+        return results_request(ctx, rng, state)
+    if roll < 0.6:
+        return login_request(ctx, rng, state)
+    if roll < 0.75:
+        return marking_request(ctx, rng, state)
+    return admin_request(ctx, rng, state)
+
+
+SCENARIOS = {
+    "login": login_request,
+    "results": results_request,
+    "marking": marking_request,
+    "admin": admin_request,
+    "dashboard": dashboard_request,
+    "mixed": mixed_request,
+}
+
+
+def login_tokens(driver, ctx, count, rng):
+    """Log `count` random students in (untimed) for the results scenarios"""
+    request = driver.connect()
+    tokens = []
+    for student_id in rng.sample(range(ctx["students"]), min(count, ctx["students"])):
+        student_id = f"ST{student_id:06d}"
+        status, data = request("POST", "/student_login", {"studentId": student_id, "password": BENCH_PASSWORD})
+        if status != 200:
+            raise SystemExit(f"Setup login for {student_id} failed with {status}: {data[:200]!r}")
+        tokens.append((student_id, json.loads(data)["token"]))
+    return tokens
+
+
+def run_scenario(driver, name, ctx, args):
+    """Drive one scenario; returns {label: [latencies]} and error counts"""
+    make_request = SCENARIOS[name]
+    per_thread = max(1, args.requests // args.concurrency)
+    samples = {}
+    errors = {}
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(args.seed * 1000 + index)
+        request = driver.connect()
+        state = {}
+        local_samples, local_errors = {}, {}
+        for i in range(args.warmup + per_thread):
+            label, method, path, body, headers = make_request(ctx, rng, state)
+            started = time.perf_counter()
+            status, data = request(method, path, body, headers)
+            elapsed = time.perf_counter() - started
+            if state.pop("expect_cursor", False) and status == 200:
+                state["students_cursor"] = json.loads(data).get("next_cursor")
+            if i < args.warmup:
+                continue
+            local_samples.setdefault(label, []).append(elapsed)
+            if status >= 400:
+                local_errors[label] = local_errors.get(label, 0) + 1
+        with lock:
+            for label, values in local_samples.items():
+                samples.setdefault(label, []).extend(values)
+            for label, count in local_errors.items():
+                errors[label] = errors.get(label, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, errors, time.perf_counter() - started
+
+
+# ---------------------- REPORT ----------------------
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    # Nearest rank: the smallest value with at least `fraction` of the samples at or below it
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(values, wall_time, error_count):
+    values = sorted(values)
+    return {
+        "requests": len(values),
+        "errors": error_count,
+        "rps": round(len(values) / wall_time, 1) if wall_time else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+def print_report(report):
+    print(f"\n{'scenario':<28} {'requests':>8} {'errors':>6} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, row in report.items():
+        print(f"{name:<28} {row['requests']:>8} {row['errors']:>6} {row['rps']:>8} "
+              f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} {row['max_ms']:>8}")
+
+
+def compare(report, baseline, tolerance):
+    """Regressions against a saved report: p95 up or req/s down by more than tolerance"""
+    problems = []
+    for name, row in report.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        if old["p95_ms"] and row["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            problems.append(f"{name}: p95 {old['p95_ms']}ms -> {row['p95_ms']}ms")
+        if old["rps"] and row["rps"] < old["rps"] * (1 - tolerance):
+            problems.append(f"{name}: req/s {old['rps']} -> {row['rps']}")
+        if row["errors"] > old.get("errors", 0):
+            problems.append(f"{name}: errors {old.get('errors', 0)} -> {row['errors']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a synthetic school and benchmark the API")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--students", type=int, help="override the scale's student count")
+    parser.add_argument("--subjects", type=int, default=10, help="results per student per term")
+    parser.add_argument("--terms", type=int, default=3)
+    parser.add_argument("--workdir", default="bench-data")
+    parser.add_argument("--reseed", action="store_true")
+    parser.add_argument("--driver", choices=["client", "gunicorn", "asgi"], default="client")
+    parser.add_argument("--workers", type=int, default=2, help="server worker processes")
+    parser.add_argument("--port", type=int, default=5077)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=1000, help="timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per thread first")
+    parser.add_argument("--concurrency", type=int, default=1, help="client threads")
+    parser.add_argument("--users", type=int, default=200, help="logged-in students for 'results'")
+    parser.add_argument("--slow-clients", type=int, default=0,
+                        help="connections trickling their headers during each scenario (server drivers)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write the report as JSON")
+    parser.add_argument("--compare", help="baseline JSON from --save; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    # Paths given on the command line are relative to where we were started
+    args.save = args.save and os.path.abspath(args.save)
+    args.compare = args.compare and os.path.abspath(args.compare)
+
+    # Keep the report readable; set LOG_LEVEL yourself to include logging cost
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    settings = dict(SCALES[args.scale], subjects=min(args.subjects, len(SUBJECTS)),
+                    terms=min(args.terms, len(TERMS)))
+    if args.students:
+        settings["students"] = args.students
+    workdir, app_module = prepare_workdir(args, settings)
+
+    if args.driver == "client":
+        if args.slow_clients:
+            raise SystemExit("--slow-clients needs a server driver (gunicorn or asgi)")
+        driver = TestClientDriver(app_module)
+    else:
+        # Leave the databases to the server processes
+        app_module.db_pool.close_all()
+        driver = ServerDriver(args.driver, server_command(args.driver, args.workers, args.port), workdir, args.port)
+
+    report = {}
+    try:
+        ctx = dict(settings)
+        names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+        if {"results", "mixed"} & set(names):
+            ctx["tokens"] = login_tokens(driver, ctx, args.users, random.Random(args.seed))
+        for name in names:
+            if name not in SCENARIOS:
+                raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+            slow = SlowClients(args.port, args.slow_clients) if args.slow_clients else None
+            try:
+                samples, errors, wall_time = run_scenario(driver, name, ctx, args)
+            finally:
+                if slow:
+                    slow.close()
+            report[name] = summarize([v for values in samples.values() for v in values],
+                                     wall_time, sum(errors.values()))
+            if len(samples) > 1:
+                for label, values in sorted(samples.items()):
+                    report[f"{name}/{label}"] = summarize(values, wall_time, errors.get(label, 0))
+    finally:
+        driver.close()
+
+    server = driver.name != "client"
+    run = {"driver": driver.name, "workers": args.workers if server else None,
+           "slow_clients": args.slow_clients if server else None,
+           "concurrency": args.concurrency, "requests": args.requests, **settings}
+    print("\n" + " ".join(f"{k}={v}" for k, v in run.items() if v is not None))
+    print_report(report)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"run": run, "scenarios": report}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["run"] != run:
+            raise SystemExit(f"Baseline was recorded with different settings: {baseline['run']}")
+        problems = compare(report, baseline["scenarios"], args.tolerance)
+        if problems:
+            print("\n❌ Regressions:")
+            for problem in problems:
+                print(f"    {problem}")
+            raise SystemExit(1)
+        print("\n✅ No regressions against", args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Password hashing for admin, teacher and student logins.
+
+Passwords are stored as "pbkdf2_sha256$<iterations>$<salt>$<hash>".
+Rows still holding a plaintext password keep working: they are checked
+as before and check_password() hands back a hash to store in their place,
+so every account is upgraded on its next successful login. Raising
+PASSWORD_HASH_ITERATIONS upgrades older hashes the same way.
+
+Hashing is deliberately slow, so logins run it on a small bounded thread
+pool (hashlib releases the GIL while it works). A burst of logins then
+queues for the pool instead of taking every CPU away from the rest of the
+app, and once the queue is full callers get CredentialsBusy.
+
+Run `python credentials.py` to see logins/second per core at a few work
+factors before changing PASSWORD_HASH_ITERATIONS.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+ALGORITHM = "pbkdf2_sha256"
+ITERATIONS = int(os.environ.get("PASSWORD_HASH_ITERATIONS", 100000))
+SALT_BYTES = 16
+
+# Threads doing hash work at once, and how many logins may wait for them
+HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+HASH_QUEUE_LIMIT = HASH_WORKERS * 8
+# Pool threads one batch (an import) may keep busy at once
+BATCH_WORKERS = max(1, HASH_WORKERS // 2)
+HASH_WAIT_TIMEOUT = 10  # seconds
+
+
+class CredentialsBusy(Exception):
+    """Too many password checks are already queued; retry shortly"""
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def hash_password(password, iterations=None):
+    iterations = iterations or ITERATIONS
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = _pbkdf2(password, salt, iterations)
+    return f"{ALGORITHM}${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+def is_hashed(stored):
+    return bool(stored) and stored.startswith(ALGORITHM + "$")
+
+
+def check_password(password, stored, iterations=None):
+    """Return (ok, new_hash).
+
+    new_hash is set when the login succeeded but the stored value is
+    plaintext or uses fewer iterations than configured; the caller should
+    write it back.
+    """
+    iterations = iterations or ITERATIONS
+    if not stored or password is None:
+        return False, None
+
+    if not is_hashed(stored):
+        ok = hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8"))
+        return ok, (hash_password(password, iterations) if ok else None)
+
+    try:
+        _, rounds, salt, digest = stored.split("$")
+        rounds = int(rounds)
+        expected = _unb64(digest)
+        actual = _pbkdf2(password, _unb64(salt), rounds)
+    except (ValueError, TypeError):
+        return False, None
+    ok = hmac.compare_digest(expected, actual)
+    if ok and rounds < iterations:
+        return True, hash_password(password, iterations)
+    return ok, None
+
+
+# ---------------------- BOUNDED HASH POOL ----------------------
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        # A pool inherited through fork has no live threads; start a new one
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hash")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _run_pooled(fn, *args):
+    if not _slots.acquire(timeout=HASH_WAIT_TIMEOUT):
+        raise CredentialsBusy("Too many logins in progress, please try again")
+    try:
+        return _get_executor().submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def verify_password(password, stored):
+    """check_password() on the hash pool; raises CredentialsBusy when full"""
+    return _run_pooled(check_password, password, stored)
+
+
+def make_password(password):
+    """hash_password() on the hash pool; raises CredentialsBusy when full"""
+    return _run_pooled(hash_password, password)
+
+
+def make_passwords(passwords):
+    """hash_password() for a batch (imports) on the hash pool.
+
+    At most BATCH_WORKERS hashes of the batch are in flight at once, each
+    holding a queue slot like a login does, so logins keep the rest of the
+    pool and queue behind a few hashes rather than the whole batch. The
+    batch waits for slots instead of raising CredentialsBusy.
+    """
+    hashed = [None] * len(passwords)
+    pending = deque()
+
+    def collect():
+        i, future = pending.popleft()
+        try:
+            hashed[i] = future.result()
+        finally:
+            _slots.release()
+
+    try:
+        for i, password in enumerate(passwords):
+            if len(pending) >= BATCH_WORKERS:
+                collect()
+            _slots.acquire()
+            try:
+                pending.append((i, _get_executor().submit(hash_password, password)))
+            except BaseException:
+                _slots.release()
+                raise
+        while pending:
+            collect()
+    finally:
+        # Only after an error: let the rest finish, then give their slots back
+        while pending:
+            _, future = pending.popleft()
+            future.exception()
+            _slots.release()
+    return hashed
+
+
+# ---------------------- BENCHMARK ----------------------
+def benchmark(iterations_list, seconds=2.0, threads=None):
+    """Verifications/second at each work factor, single thread and pooled"""
+    threads = threads or HASH_WORKERS
+    rows = []
+    for iterations in iterations_list:
+        stored = hash_password("correct horse", iterations)
+
+        done = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            check_password("correct horse", stored, iterations)
+            done += 1
+        single = done / (time.perf_counter() - start)
+
+        counter = [0]
+        counter_lock = threading.Lock()
+        stop_at = time.perf_counter() + seconds
+
+        def worker():
+            while time.perf_counter() < stop_at:
+                check_password("correct horse", stored, iterations)
+                with counter_lock:
+                    counter[0] += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for _ in range(threads):
+                pool.submit(worker)
+        pooled = counter[0] / (time.perf_counter() - start)
+
+        rows.append({
+            "iterations": iterations,
+            "ms_per_login": round(1000 / single, 2),
+            "logins_per_sec_per_core": round(single, 1),
+            "logins_per_sec_pooled": round(pooled, 1),
+            "threads": threads,
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Password hashing cost benchmark")
+    parser.add_argument("--iterations", type=int, nargs="+",
+                        default=[50000, 100000, 200000, 400000, 600000])
+    parser.add_argument("--seconds", type=float, default=2.0, help="time spent per setting")
+    parser.add_argument("--threads", type=int, default=None, help="pool size (default: cores)")
+    args = parser.parse_args()
+
+    print(f"{'iterations':>10} {'ms/login':>9} {'logins/s/core':>14} {'logins/s pooled':>16} {'threads':>8}")
+    for row in benchmark(args.iterations, args.seconds, args.threads):
+        print(f"{row['iterations']:>10} {row['ms_per_login']:>9} {row['logins_per_sec_per_core']:>14} "
+              f"{row['logins_per_sec_pooled']:>16} {row['threads']:>8}")
@@ -0,0 +1,365 @@
+"""Change events, pushed to open pages as server-sent events (GET /events).
+
+Routes that write call publish(topic, **data) once the write is committed.
+The event is appended to the `events` table, and that table is what carries
+it to every gunicorn worker: a process with subscribers runs one thread that
+reads the rows it hasn't seen (straight away after a publish of its own,
+otherwise every POLL_INTERVAL seconds) and hands them to its subscribers.
+A process nobody is subscribed to doesn't poll at all.
+
+The row id is the SSE event id. A browser that reconnects sends it back as
+Last-Event-ID and gets the events it missed replayed, or a "reset" event if
+they have been pruned (KEEP_SECONDS) and it should reload instead.
+
+"statistics" is a derived topic: after a burst of student, teacher or result
+events its subscribers get the index page numbers once, at most every
+STATISTICS_MIN_INTERVAL seconds, instead of every tab asking for them.
+
+An open stream holds a thread under a WSGI server, so there it is capped at
+THREAD_STREAMS per process, closed after THREAD_STREAM_SECONDS (the browser
+reconnects and resumes), and refused on single-threaded workers; pages fall
+back to polling when refused. asgi.py takes streams off the thread and keeps
+them on the event loop instead, up to MAX_STREAMS per process.
+
+EVENTS=0 turns publishing off and /events answers 503.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from flask import Response, request
+
+from logs import get_logger
+
+ENABLED = os.environ.get("EVENTS", "1") != "0"
+POLL_INTERVAL = float(os.environ.get("EVENTS_POLL_INTERVAL", 0.5))
+KEEP_SECONDS = int(os.environ.get("EVENTS_KEEP_SECONDS", 3600))
+HEARTBEAT_SECONDS = 20
+RETRY_MS = 3000
+THREAD_STREAMS = int(os.environ.get("EVENTS_THREAD_STREAMS", 2))
+THREAD_STREAM_SECONDS = int(os.environ.get("EVENTS_THREAD_STREAM_SECONDS", 300))
+MAX_STREAMS = int(os.environ.get("EVENTS_MAX_STREAMS", 1000))
+# Events waiting for one slow subscriber before it is sent "reset" instead
+SUBSCRIBER_BACKLOG = 500
+REPLAY_LIMIT = 500
+STATISTICS_MIN_INTERVAL = 2.0
+STATISTICS_SOURCES = frozenset({"students", "teachers", "results"})
+TOPICS = STATISTICS_SOURCES | {"statistics"}
+
+# Set on the WSGI environ by asgi.py; the view swaps in the Subscriber to
+# hand the stream over to the loop
+LOOP_STREAMS_KEY = "school.loop_streams"
+
+log = get_logger("events")
+
+Event = namedtuple("Event", "id topic data")
+RESET = Event(None, "reset", "{}")
+
+
+class Subscriber:
+    """One open stream: a queue of events, waited on by a thread or the loop"""
+
+    def __init__(self, topics, on_loop):
+        self.topics = topics
+        self.on_loop = on_loop
+        self.start_id = 0
+        self._events = []
+        self._overflowed = False
+        self._cond = threading.Condition()
+        self._loop = None
+        self._ready = None
+
+    def deliver(self, events):
+        with self._cond:
+            if self._overflowed or len(self._events) + len(events) > SUBSCRIBER_BACKLOG:
+                # It isn't keeping up; tell it to reload rather than queue forever
+                self._events = []
+                self._overflowed = True
+            else:
+                self._events.extend(events)
+            self._cond.notify()
+            loop, ready = self._loop, self._ready
+        if loop is not None:
+            loop.call_soon_threadsafe(ready.set)
+
+    def _take(self):
+        if self._overflowed:
+            self._overflowed = False
+            return [RESET]
+        events, self._events = self._events, []
+        return events
+
+    def get(self, timeout):
+        """Events delivered so far, waiting up to `timeout` for the first one"""
+        with self._cond:
+            if not self._events and not self._overflowed:
+                self._cond.wait(timeout)
+            return self._take()
+
+    def attach_loop(self, loop):
+        with self._cond:
+            self._loop = loop
+            self._ready = asyncio.Event()
+
+    async def get_async(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if self._events or self._overflowed:
+                    return self._take()
+                self._ready.clear()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            try:
+                await asyncio.wait_for(self._ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                return []
+
+
+class Broker:
+    """Reads the events table and fans rows out to this process's subscribers"""
+
+    def __init__(self):
+        self.database = None
+        self.connect = None
+        self.statistics = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._last_id = 0
+        self._stats_dirty = False
+        self._stats_sent = 0.0
+        self._pruned = 0.0
+        self.published = 0
+        self.delivered = 0
+        self.resets = 0
+        self.refused = 0
+
+    def setup(self, database, connect, statistics):
+        self.database = database
+        self.connect = connect
+        self.statistics = statistics
+        with connect(database) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    topic TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_events_created ON events(created)")
+
+    def publish(self, topic, data):
+        now = time.time()
+        try:
+            with self.connect(self.database) as conn:
+                conn.execute("INSERT INTO events (topic, data, created) VALUES (?, ?, ?)",
+                             (topic, json.dumps(data, default=str), now))
+                if now - self._pruned > 60:
+                    self._pruned = now
+                    conn.execute("DELETE FROM events WHERE created < ?", (now - KEEP_SECONDS,))
+        except sqlite3.Error:
+            # The write itself went through; a missed notification only
+            # leaves pages stale until their next reload
+            log.exception("publishing event failed", extra={"topic": topic})
+            return
+        self.published += 1
+        self._wake.set()
+
+    # ---- subscribers ----
+    def streams(self):
+        with self._lock:
+            self._check_pid()
+            on_loop = sum(1 for s in self._subscribers if s.on_loop)
+            return len(self._subscribers) - on_loop, on_loop
+
+    def subscribe(self, topics, on_loop, last_event_id=None):
+        """A Subscriber for `topics`, or None when this process is full"""
+        subscriber = Subscriber(frozenset(topics), on_loop)
+        with self._lock:
+            self._check_pid()
+            same_kind = sum(1 for s in self._subscribers if s.on_loop == on_loop)
+            if same_kind >= (MAX_STREAMS if on_loop else THREAD_STREAMS):
+                return None
+            with self.connect(self.database) as conn:
+                if not self._subscribers:
+                    # Nobody was listening, so the poller's position is stale
+                    self._last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+                if last_event_id is not None and last_event_id < self._last_id:
+                    subscriber.deliver(self._replay(conn, subscriber.topics, last_event_id))
+            subscriber.start_id = self._last_id
+            self._subscribers.add(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="events", daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def _replay(self, conn, topics, last_event_id):
+        first = conn.execute("SELECT MIN(id) FROM events").fetchone()[0]
+        rows = conn.execute("SELECT id, topic, data FROM events WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+                            (last_event_id, self._last_id, REPLAY_LIMIT + 1)).fetchall()
+        if first is None or first > last_event_id + 1 or len(rows) > REPLAY_LIMIT:
+            # Some of what it missed is gone
+            self.resets += 1
+            return [RESET]
+        if "statistics" in topics and any(r[1] in STATISTICS_SOURCES for r in rows):
+            self._stats_dirty = True
+        return [Event(*r) for r in rows if r[1] in topics]
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _check_pid(self):
+        # A forked worker inherits neither the thread nor the streams
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = None
+            self._subscribers = set()
+
+    # ---- poller thread ----
+    def _run(self):
+        while True:
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+            try:
+                self._poll()
+            except Exception:
+                log.exception("event poll failed")
+                time.sleep(POLL_INTERVAL)
+
+    def _poll(self):
+        with self._lock:
+            if not self._subscribers:
+                return
+            with self.connect(self.database) as conn:
+                rows = conn.execute("SELECT id, topic, data FROM events WHERE id > ? ORDER BY id LIMIT 1000",
+                                    (self._last_id,)).fetchall()
+            if rows:
+                self._last_id = rows[-1][0]
+                if len(rows) == 1000:
+                    self._wake.set()
+                for subscriber in self._subscribers:
+                    wanted = [Event(*r) for r in rows if r[1] in subscriber.topics]
+                    if wanted:
+                        subscriber.deliver(wanted)
+                        self.delivered += len(wanted)
+                if any(r[1] in STATISTICS_SOURCES for r in rows):
+                    self._stats_dirty = True
+            listeners = [s for s in self._subscribers if "statistics" in s.topics]
+            if not listeners:
+                self._stats_dirty = False
+            if not self._stats_dirty or time.monotonic() - self._stats_sent < STATISTICS_MIN_INTERVAL:
+                return
+            self._stats_dirty = False
+            self._stats_sent = time.monotonic()
+            last_id = self._last_id
+        # Built outside the lock: it reads three databases
+        event = Event(last_id, "statistics", json.dumps(self.statistics()))
+        for subscriber in listeners:
+            subscriber.deliver([event])
+        self.delivered += len(listeners)
+
+    def stats(self):
+        threads, loop = self.streams()
+        return {"thread_streams": threads, "loop_streams": loop, "published": self.published,
+                "delivered": self.delivered, "resets": self.resets, "refused": self.refused}
+
+
+broker = Broker()
+
+
+def init_app(app, database, connect, statistics):
+    """Create the events table in `database`.
+
+    `connect(path)` is the app's get_db; `statistics()` builds the payload
+    of the "statistics" topic.
+    """
+    if ENABLED:
+        broker.setup(database, connect, statistics)
+
+
+def publish(topic, **data):
+    """Tell every subscriber of `topic`; call after the change is committed"""
+    if ENABLED:
+        broker.publish(topic, data)
+
+
+def stats():
+    return broker.stats()
+
+
+# ---------------------- SSE ----------------------
+def render(events):
+    parts = []
+    for event in events:
+        if event.id is not None:
+            parts.append(f"id: {event.id}\n")
+        parts.append(f"event: {event.topic}\ndata: {event.data}\n\n")
+    return "".join(parts)
+
+
+def preamble(subscriber):
+    # A bare id sets the browser's Last-Event-ID without firing an event, so
+    # even a stream that has seen nothing yet resumes from the right place
+    return f"retry: {RETRY_MS}\nid: {subscriber.start_id}\n\n"
+
+
+def stream(subscriber):
+    """SSE body for a stream served on a WSGI thread"""
+    yield preamble(subscriber)
+    # Give the thread back now and then; the browser reconnects and resumes
+    deadline = time.monotonic() + THREAD_STREAM_SECONDS
+    while time.monotonic() < deadline:
+        events = subscriber.get(HEARTBEAT_SECONDS)
+        yield render(events) if events else ": ping\n\n"
+
+
+async def stream_async(subscriber):
+    """SSE body for a stream served on the event loop (see asgi.py)"""
+    subscriber.attach_loop(asyncio.get_running_loop())
+    yield preamble(subscriber)
+    while True:
+        events = await subscriber.get_async(HEARTBEAT_SECONDS)
+        yield render(events) if events else ": ping\n\n"
+
+
+def _refuse(message):
+    broker.refused += 1
+    response = Response(message + "\n", status=503, mimetype="text/plain")
+    response.headers["Retry-After"] = "60"
+    return response
+
+
+def stream_response(topics):
+    """Response for GET /events (topics already checked by the caller)"""
+    if not ENABLED:
+        return _refuse("Events are turned off")
+    environ = request.environ
+    on_loop = bool(environ.get(LOOP_STREAMS_KEY))
+    if not on_loop and not environ.get("wsgi.multithread"):
+        # A single-threaded worker would be gone for the whole stream
+        return _refuse("Streams are not available on this server")
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    subscriber = broker.subscribe(topics, on_loop, int(last_event_id) if last_event_id.isdigit() else None)
+    if subscriber is None:
+        return _refuse("Too many open streams")
+    if on_loop:
+        # asgi.py sends the body itself and unsubscribes when it is done
+        environ[LOOP_STREAMS_KEY] = subscriber
+        response = Response(iter(()), mimetype="text/event-stream")
+    else:
+        response = Response(stream(subscriber), mimetype="text/event-stream")
+        response.call_on_close(lambda: broker.unsubscribe(subscriber))
+    response.headers["Cache-Control"] = "no-cache"
+    # Tell nginx-style proxies not to buffer the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,91 @@
+"""Production settings for gunicorn, read when it is started from this directory:
+
+    gunicorn                        # serves app:app with the settings below
+    WEB_CONCURRENCY=8 gunicorn      # more worker processes
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn   # asgi.py mode
+
+The asgi.py mode needs the optional requirements-asgi.txt (uvicorn 0.29).
+Newer uvicorn deprecates uvicorn.workers: install uvicorn-worker and use
+GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker there.
+
+- The app is imported once, in the master (preload_app). Table creation,
+  the default admins, migrations and the asset build happen there before
+  any worker exists, so workers never race each other on the schema and a
+  new worker is a fork of a ready app rather than a fresh import.
+- SQLite connections must not cross a fork: the master closes its own
+  before forking, and each request thread of a worker opens its own on
+  first use. post_fork only fills the worker's statistics cache and
+  starts its job dispatcher (see warm_worker in app.py).
+- Workers are recycled after max_requests (plus jitter, so they don't all
+  restart at once) and get graceful_timeout seconds to finish in-flight
+  requests when stopped or recycled.
+- Live updates (/events, see events.py) hold a gthread thread per open
+  page for up to EVENTS_THREAD_STREAM_SECONDS, so each worker takes only
+  EVENTS_THREAD_STREAMS of them: one per 4 threads, at least one. With the
+  defaults that is one pushed page per worker while the other 3 threads
+  serve requests. A page that is refused (or loses its slot when its
+  stream is closed and another page took it) polls for as long as it
+  stays open. Where many pages should get pushes, raise GUNICORN_THREADS
+  or use GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker, which keeps
+  streams off threads and serves them all.
+- Background jobs (jobs.py) run on threads of the workers, so a job in a
+  recycled worker is retried elsewhere once it goes stale. To keep them
+  out of the web workers, start them with JOB_THREADS=0 and run
+  `flask --app app jobs-worker` next to gunicorn.
+
+Reloading:
+- kill -HUP <pid in gunicorn.pid>: re-reads this file and replaces the
+  workers gracefully. The app code stays what the master preloaded.
+- New code: kill -USR2 <pid> starts a second master running the new code
+  next to the old one; once it serves, stop the old master with
+  kill -TERM (gunicorn docs, "Upgrading to a new binary on the fly").
+"""
+import os
+import sys
+
+wsgi_app = "app:app"
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+
+# (2 x cores) + 1 is gunicorn's rule of thumb; SQLite work is short and the
+# GIL is released while it runs, so it holds here too
+workers = int(os.environ.get("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+# gthread: a few requests per process, and idle keep-alive connections
+# wait in the worker's poller instead of holding a thread
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+if "uvicorn" in worker_class:
+    wsgi_app = "asgi:application"
+
+preload_app = True
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = max_requests // 10
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+pidfile = os.environ.get("GUNICORN_PIDFILE", "gunicorn.pid")
+# Heartbeat files on tmpfs, so a slow disk can't get workers killed
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+# Logins must work on whichever worker the next request lands on
+os.environ.setdefault("SESSION_STORE", "sqlite")
+# An open /events page holds one of the worker's threads for minutes; keep
+# at least 3 in 4 for requests
+os.environ.setdefault("EVENTS_THREAD_STREAMS", str(max(1, threads // 4)))
+
+
+def _app_module():
+    # Only there when preloaded; never import the app into the master here
+    return sys.modules.get("app")
+
+
+def pre_fork(server, worker):
+    app_module = _app_module()
+    if app_module is not None:
+        app_module.db_pool.close_all()
+
+
+def post_fork(server, worker):
+    app_module = _app_module()
+    if app_module is not None:
+        app_module.warm_worker()
@@ -0,0 +1,403 @@
+"""Background jobs: long admin operations run off the request thread.
+
+A route validates its input, calls enqueue(kind, args) and answers 202 with
+the job; GET /jobs/<id> (app.py) reports its progress and result, and
+POST /jobs/<id>/cancel stops it. Handlers are registered with @task(kind)
+and receive a Job.
+
+The queue is the `jobs` table, so any process can enqueue, report on or
+cancel any job. Each process that runs jobs has one dispatcher thread: it
+claims queued jobs (straight away after an enqueue of its own, otherwise
+every POLL_INTERVAL seconds) and runs each on a thread of its own, at most
+JOB_THREADS at once. A kind's `concurrency` caps how many of its jobs run
+at once across all processes - the claim checks it in the same statement
+that takes the job.
+
+A failed job is retried until it has had `attempts` tries, RETRY_DELAY
+seconds later and twice as long each time after that. The dispatcher
+touches its running jobs every HEARTBEAT_SECONDS; a running job nobody
+has touched for STALE_SECONDS lost its process (a recycled or killed
+worker) and counts as failed, so it is retried the same way.
+
+Cancelling a queued job is immediate. A running job is asked to stop and
+does so at its next Job.progress() call, which raises JobCancelled.
+
+Identical jobs (same kind and args) aren't queued twice: while one is
+queued or running, enqueue() returns it.
+
+JOB_THREADS=0 leaves running jobs to another process: `flask jobs-worker`
+runs them in the foreground, so web workers only enqueue.
+"""
+import json
+import os
+import secrets
+import threading
+import time
+from collections import namedtuple
+
+from logs import get_logger
+
+JOB_THREADS = int(os.environ.get("JOB_THREADS", 2))
+POLL_INTERVAL = float(os.environ.get("JOBS_POLL_INTERVAL", 1.0))
+HEARTBEAT_SECONDS = 10
+STALE_SECONDS = int(os.environ.get("JOBS_STALE_SECONDS", 60))
+# Least time between two progress writes of one job
+PROGRESS_INTERVAL = 1.0
+RETRY_DELAY = 5
+KEEP_DAYS = int(os.environ.get("JOBS_KEEP_DAYS", 7))
+
+log = get_logger("jobs")
+
+Task = namedtuple("Task", "func concurrency attempts retry_delay")
+_tasks = {}
+
+
+class JobCancelled(Exception):
+    """Raised by Job.progress() once the job has been cancelled"""
+
+
+class Job:
+    """What a handler gets: its args, and progress() to report and stop"""
+
+    def __init__(self, queue, job_id, kind, args, attempt):
+        self.queue = queue
+        self.id = job_id
+        self.kind = kind
+        self.args = args
+        self.attempt = attempt
+        self.done = None
+        self.total = None
+        self._written = 0.0
+        self._cancelled = False
+
+    def progress(self, done, total=None):
+        """Record progress; raises JobCancelled if the job was cancelled"""
+        self.done = done
+        if total is not None:
+            self.total = total
+        now = time.monotonic()
+        if now - self._written >= PROGRESS_INTERVAL:
+            self._written = now
+            with self.queue.connect(self.queue.database) as conn:
+                row = conn.execute("""
+                    UPDATE jobs SET done=?, total=?, updated=? WHERE id=?
+                    RETURNING cancel_requested
+                """, (self.done, self.total, time.time(), self.id)).fetchone()
+            self._cancelled = bool(row and row[0])
+        if self._cancelled:
+            raise JobCancelled()
+
+
+class JobQueue:
+    """Enqueues, claims and runs the jobs of this process"""
+
+    def __init__(self):
+        self.database = None
+        self.connect = None
+        self.threads = JOB_THREADS
+        self._running = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._beat = 0.0
+        self._pruned = 0.0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.cancelled = 0
+
+    def setup(self, database, connect):
+        self.database = database
+        self.connect = connect
+        with connect(database) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    args TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    run_after REAL NOT NULL,
+                    done INTEGER,
+                    total INTEGER,
+                    result TEXT,
+                    error TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    owner INTEGER,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    finished REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, run_after)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_kind ON jobs(kind, status)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created)")
+            # At most one queued or running job per kind and args
+            conn.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active ON jobs(kind, args)
+                WHERE status IN ('queued', 'running')
+            """)
+
+    # ---- API ----
+    def enqueue(self, kind, args):
+        if kind not in _tasks:
+            raise KeyError(f"Unknown job kind: {kind}")
+        args = json.dumps(args, sort_keys=True)
+        job_id = secrets.token_hex(8)
+        now = time.time()
+        with self.connect(self.database) as conn:
+            inserted = conn.execute("""
+                INSERT OR IGNORE INTO jobs (id, kind, args, status, max_attempts, run_after, created, updated)
+                VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)
+            """, (job_id, kind, args, _tasks[kind].attempts, now, now, now)).rowcount
+            if not inserted:
+                job_id = conn.execute("""
+                    SELECT id FROM jobs WHERE kind=? AND args=? AND status IN ('queued', 'running')
+                """, (kind, args)).fetchone()[0]
+        self.ensure_started()
+        self._wake.set()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self.connect(self.database) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return _job_dict(row) if row is not None else None
+
+    def list_jobs(self, kind=None, status=None, limit=50):
+        where, params = [], []
+        if kind:
+            where.append("kind=?")
+            params.append(kind)
+        if status:
+            where.append("status=?")
+            params.append(status)
+        sql = "SELECT * FROM jobs" + (" WHERE " + " AND ".join(where) if where else "")
+        with self.connect(self.database) as conn:
+            rows = conn.execute(sql + " ORDER BY created DESC LIMIT ?", params + [limit]).fetchall()
+        return [_job_dict(row) for row in rows]
+
+    def cancel(self, job_id):
+        now = time.time()
+        with self.connect(self.database) as conn:
+            conn.execute("""
+                UPDATE jobs SET status='cancelled', cancel_requested=1, finished=?, updated=?
+                WHERE id=? AND status='queued'
+            """, (now, now, job_id))
+            conn.execute("UPDATE jobs SET cancel_requested=1 WHERE id=? AND status='running'", (job_id,))
+        return self.get(job_id)
+
+    # ---- dispatcher ----
+    def ensure_started(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker inherits neither the thread nor its jobs
+                self._pid = os.getpid()
+                self._thread = None
+                self._running = {}
+            if self._thread is None and self.threads > 0 and self.database is not None:
+                self._thread = threading.Thread(target=self._run, name="jobs", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+            try:
+                self._tick()
+            except Exception:
+                log.exception("job dispatch failed")
+                time.sleep(POLL_INTERVAL)
+
+    def _tick(self):
+        now = time.time()
+        if now - self._beat >= HEARTBEAT_SECONDS:
+            self._beat = now
+            self._heartbeat(now)
+        while len(self._running) < self.threads:
+            job = self._claim()
+            if job is None:
+                break
+            with self._lock:
+                self._running[job.id] = job
+            threading.Thread(target=self._execute, args=(job,), name=f"job-{job.kind}", daemon=True).start()
+
+    def _heartbeat(self, now):
+        with self._lock:
+            mine = list(self._running)
+        with self.connect(self.database) as conn:
+            if mine:
+                conn.execute(f"UPDATE jobs SET updated=? WHERE id IN ({', '.join('?' * len(mine))})",
+                             [now] + mine)
+            stale = conn.execute("""
+                SELECT id, kind, attempts, max_attempts, cancel_requested FROM jobs
+                WHERE status='running' AND updated < ?
+            """, (now - STALE_SECONDS,)).fetchall()
+            for row in stale:
+                log.warning("job lost its worker", extra={"job": row["id"], "kind": row["kind"]})
+                self._fail(conn, row, "Interrupted: the process running it stopped")
+            if now - self._pruned > 3600:
+                self._pruned = now
+                conn.execute("DELETE FROM jobs WHERE created < ? AND status IN ('done', 'failed', 'cancelled')",
+                             (now - KEEP_DAYS * 86400,))
+
+    def _claim(self):
+        limits = [(kind, task.concurrency) for kind, task in _tasks.items()]
+        if not limits:
+            return None
+        now = time.time()
+        with self.connect(self.database) as conn:
+            row = conn.execute(f"""
+                WITH limits(kind, n) AS (VALUES {', '.join('(?, ?)' for _ in limits)})
+                UPDATE jobs SET status='running', attempts=attempts + 1, owner=?, updated=?
+                WHERE id = (
+                    SELECT q.id FROM jobs q INDEXED BY idx_jobs_status
+                    WHERE q.status='queued' AND q.run_after <= ?
+                      AND (SELECT COUNT(*) FROM jobs r WHERE r.kind = q.kind AND r.status='running')
+                          < (SELECT n FROM limits WHERE limits.kind = q.kind)
+                    ORDER BY q.run_after
+                    LIMIT 1
+                )
+                RETURNING id, kind, args, attempts
+            """, [v for limit in limits for v in limit] + [os.getpid(), now, now]).fetchone()
+        if row is None:
+            return None
+        return Job(self, row["id"], row["kind"], json.loads(row["args"]), row["attempts"])
+
+    def _execute(self, job):
+        started = time.perf_counter()
+        try:
+            result = _tasks[job.kind].func(job)
+        except JobCancelled:
+            self._finish(job, "cancelled")
+            self.cancelled += 1
+            log.info("job cancelled", extra={"job": job.id, "kind": job.kind})
+        except Exception as e:
+            log.exception("job failed", extra={"job": job.id, "kind": job.kind, "attempt": job.attempt})
+            with self.connect(self.database) as conn:
+                row = conn.execute("""
+                    SELECT id, kind, attempts, max_attempts, cancel_requested FROM jobs
+                    WHERE id=? AND status='running' AND owner=?
+                """, (job.id, os.getpid())).fetchone()
+                if row is not None:
+                    self._fail(conn, row, str(e) or type(e).__name__)
+        else:
+            self._finish(job, "done", result)
+            self.completed += 1
+            log.info("job done", extra={"job": job.id, "kind": job.kind,
+                                        "seconds": round(time.perf_counter() - started, 2)})
+        finally:
+            with self._lock:
+                self._running.pop(job.id, None)
+            self._wake.set()
+
+    def _finish(self, job, status, result=None):
+        # Unless it went stale meanwhile and belongs to another try now
+        now = time.time()
+        with self.connect(self.database) as conn:
+            conn.execute("""
+                UPDATE jobs SET status=?, result=?, done=?, total=?, finished=?, updated=?
+                WHERE id=? AND status='running' AND owner=?
+            """, (status, json.dumps(result, default=str) if result is not None else None,
+                  job.done, job.total, now, now, job.id, os.getpid()))
+
+    def _fail(self, conn, row, error):
+        """A try of `row` failed: queue it again, or give up"""
+        now = time.time()
+        task = _tasks.get(row["kind"])
+        if row["cancel_requested"]:
+            status, run_after = "cancelled", now
+        elif task is not None and row["attempts"] < row["max_attempts"]:
+            status, run_after = "queued", now + task.retry_delay * 2 ** (row["attempts"] - 1)
+        else:
+            status, run_after = "failed", now
+        conn.execute("""
+            UPDATE jobs SET status=?, run_after=?, error=?, owner=NULL, updated=?, finished=?
+            WHERE id=?
+        """, (status, run_after, error, now, now if status != "queued" else None, row["id"]))
+        if status == "queued":
+            self.retried += 1
+        elif status == "failed":
+            self.failed += 1
+
+    def stats(self):
+        with self._lock:
+            running = len(self._running)
+        return {"running": running, "threads": self.threads if self._thread else 0,
+                "completed": self.completed, "failed": self.failed,
+                "retried": self.retried, "cancelled": self.cancelled}
+
+
+def _job_dict(row):
+    job = {k: row[k] for k in ("id", "kind", "status", "attempts", "max_attempts", "done", "total",
+                               "error", "created", "updated", "finished")}
+    job["args"] = json.loads(row["args"])
+    job["result"] = json.loads(row["result"]) if row["result"] is not None else None
+    job["cancelling"] = bool(row["cancel_requested"]) and row["status"] == "running"
+    return job
+
+
+queue = JobQueue()
+
+
+def init_app(app, database, connect):
+    """Create the jobs table in `database` and run jobs in this app's processes.
+
+    `connect(path)` is the app's get_db. The dispatcher starts with the
+    first request (or enqueue) in each process, so the preloading gunicorn
+    master never runs jobs itself.
+    """
+    queue.setup(database, connect)
+    app.before_request(queue.ensure_started)
+
+
+def start():
+    """Start this process's dispatcher now rather than on its first request"""
+    queue.ensure_started()
+
+
+def task(kind, concurrency=1, attempts=1, retry_delay=RETRY_DELAY):
+    """Register the decorated function(job) as the handler of `kind` jobs.
+
+    Its return value (JSON-serializable) becomes the job's result.
+    """
+    def decorator(func):
+        _tasks[kind] = Task(func, concurrency, attempts, retry_delay)
+        return func
+    return decorator
+
+
+def enqueue(kind, args):
+    """Queue a `kind` job (or find the identical one already queued); returns it"""
+    return queue.enqueue(kind, args)
+
+
+def get(job_id):
+    return queue.get(job_id)
+
+
+def list_jobs(kind=None, status=None, limit=50):
+    return queue.list_jobs(kind, status, limit)
+
+
+def cancel(job_id):
+    """Cancel a queued job, or ask a running one to stop; returns it"""
+    return queue.cancel(job_id)
+
+
+def stats():
+    return queue.stats()
+
+
+def run_worker(threads):
+    """Run jobs in the foreground until interrupted (flask jobs-worker)"""
+    queue.threads = threads
+    queue.ensure_started()
+    log.info("job worker started", extra={"threads": threads, "pid": os.getpid()})
+    try:
+        while queue._thread.is_alive():
+            queue._thread.join(1)
+    except KeyboardInterrupt:
+        # Jobs still running here are picked up again once they go stale
+        pass
@@ -0,0 +1,223 @@
+"""Structured logging for the app.
+
+Route code logs to "school.<area>" loggers. Records are put on an
+in-process queue and written out by one listener thread, so a request
+never waits on stdout; if the queue is ever full the record is dropped
+and counted instead of blocking. Output is one JSON object per line
+(LOG_FORMAT=text for a readable console while developing).
+
+- Levels: LOG_LEVEL for everything, LOG_LEVELS="school.auth=WARNING,..."
+  per area.
+- Sampling: records logged with extra={"sampled": True} (busy success
+  paths) are kept one in LOG_SAMPLE_EVERY.
+- Redaction: password/token style fields are replaced before a record
+  leaves the request thread.
+- Request IDs: every request gets one (or keeps the caller's
+  X-Request-ID); it is added to each record and echoed in the response.
+"""
+import atexit
+import copy
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "")
+LOG_SAMPLE_EVERY = int(os.environ.get("LOG_SAMPLE_EVERY", 20))
+LOG_QUEUE_SIZE = 10000
+
+REDACTED = "[redacted]"
+REDACTED_FIELDS = {"password", "new_password", "confirm_password", "confirmpassword",
+                   "token", "authorization", "cookie", "secret", "secret_key"}
+REQUEST_ID_HEADER = "X-Request-ID"
+_REQUEST_ID_OK = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sampled"}
+
+
+def get_logger(area):
+    return logging.getLogger(f"school.{area}")
+
+
+def redact(value):
+    """Copy of a dict/list with credential fields replaced"""
+    if isinstance(value, dict):
+        return {k: REDACTED if str(k).lower() in REDACTED_FIELDS else redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+def record_fields(record):
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and not k.startswith("_")}
+
+
+# ---------------------- FILTERS (run on the request thread) ----------------------
+class RequestContextFilter(logging.Filter):
+    def filter(self, record):
+        if not hasattr(record, "request_id") and has_request_context() and "request_id" in g:
+            record.request_id = g.request_id
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """Keep one in `every` records marked sampled=True, per logger"""
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = every
+        self._counters = {}
+
+    def filter(self, record):
+        if not getattr(record, "sampled", False) or self.every <= 1:
+            return True
+        counter = self._counters.setdefault(record.name, itertools.count())
+        if next(counter) % self.every:
+            return False
+        record.sample_rate = self.every
+        return True
+
+
+class RedactFilter(logging.Filter):
+    def filter(self, record):
+        for key, value in record_fields(record).items():
+            if key.lower() in REDACTED_FIELDS:
+                setattr(record, key, REDACTED)
+            elif isinstance(value, (dict, list, tuple)):
+                setattr(record, key, redact(value))
+        if isinstance(record.args, dict):
+            record.args = redact(record.args)
+        return True
+
+
+# ---------------------- FORMATTERS (run on the listener thread) ----------------------
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items() if v is not None)
+        return line
+
+
+# ---------------------- QUEUE ----------------------
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread; drops them if the queue is full"""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Merge the message here (args may be mutable) but leave the
+        # formatting to the listener thread
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        return record
+
+    def enqueue(self, record):
+        _ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_queue = queue.Queue(LOG_QUEUE_SIZE)
+_handler = NonBlockingQueueHandler(_queue)
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def _ensure_listener():
+    global _listener, _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        # The listener thread doesn't survive a fork (gunicorn --preload)
+        if _listener_pid != os.getpid():
+            output = logging.StreamHandler(sys.stdout)
+            output.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+            _listener = QueueListener(_queue, output)
+            _listener.start()
+            _listener_pid = os.getpid()
+
+
+def flush():
+    """Write out everything queued so far"""
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+        _listener.start()
+
+
+@atexit.register
+def _drain():
+    # The listener is a daemon thread; don't lose what's still queued
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+
+
+def stats():
+    return {"queued": _queue.qsize(), "dropped": _handler.dropped}
+
+
+def setup_logging():
+    root = logging.getLogger("school")
+    if _handler in root.handlers:
+        return
+    _handler.addFilter(SampleFilter(LOG_SAMPLE_EVERY))
+    _handler.addFilter(RequestContextFilter())
+    _handler.addFilter(RedactFilter())
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+    for item in LOG_LEVELS.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+
+def init_app(app):
+    """Set up logging and give every request an ID"""
+    setup_logging()
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, "")
+        g.request_id = incoming if _REQUEST_ID_OK.match(incoming) else uuid.uuid4().hex[:16]
+
+    @app.after_request
+    def echo_request_id(response):
+        if "request_id" in g:
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
@@ -0,0 +1,214 @@
+"""Request and SQLite instrumentation, exported on /metrics.
+
+init_app() adds request hooks that record, per route:
+- a latency histogram
+- a response size histogram
+- SQLite time and query count histograms
+- request counts by status
+- the number of requests in flight
+
+Query counts come from CountingConnection (handed to sqlite3.connect as the
+connection factory). DB time is the time a request spends inside get_db()
+blocks. The numbers are kept per process, and /metrics prints them in the
+Prometheus text format. Each gunicorn worker exposes its own numbers
+(school_process_start_time_seconds carries the worker's pid).
+
+METRICS=0 turns all of it off: no hooks are registered, connections are
+plain sqlite3.Connection objects and /metrics isn't routed.
+"""
+import bisect
+import os
+import sqlite3
+import threading
+import time
+
+from flask import Response, request
+
+ENABLED = os.environ.get("METRICS", "1") != "0"
+
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+SIZE_BUCKETS = [100, 1000, 10000, 100000, 1000000, 10000000]
+QUERY_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100]
+
+START_TIME = time.time()
+_lock = threading.Lock()
+_local = threading.local()
+_collectors = []
+
+
+class RequestStats:
+    __slots__ = ("start", "route", "method", "db_time", "queries")
+
+    def __init__(self, route, method):
+        self.start = time.perf_counter()
+        self.route = route
+        self.method = method
+        self.db_time = 0.0
+        self.queries = 0
+
+
+def current():
+    """RequestStats of the request this thread is serving, or None"""
+    return getattr(_local, "stats", None)
+
+
+class CountingConnection(sqlite3.Connection):
+    """sqlite3.Connection that counts statements for the current request"""
+
+    def execute(self, *args):
+        stats = getattr(_local, "stats", None)
+        if stats is not None:
+            stats.queries += 1
+        return super().execute(*args)
+
+    def executemany(self, *args):
+        stats = getattr(_local, "stats", None)
+        if stats is not None:
+            stats.queries += 1
+        return super().executemany(*args)
+
+
+def connection_factory():
+    return CountingConnection if ENABLED else sqlite3.Connection
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+
+request_latency = Histogram(LATENCY_BUCKETS)
+response_size = Histogram(SIZE_BUCKETS)
+db_time = Histogram(LATENCY_BUCKETS)
+db_queries = Histogram(QUERY_BUCKETS)
+requests_total = {}  # (route, method, status) -> count
+in_flight = 0
+
+
+def _finish(stats, status, size):
+    global in_flight
+    elapsed = time.perf_counter() - stats.start
+    key = (stats.route, stats.method)
+    with _lock:
+        in_flight -= 1
+        request_latency.observe(key, elapsed)
+        db_time.observe(key, stats.db_time)
+        db_queries.observe(key, stats.queries)
+        if size is not None:
+            response_size.observe(key, size)
+        counter = (stats.route, stats.method, status)
+        requests_total[counter] = requests_total.get(counter, 0) + 1
+
+
+def availability():
+    """Share of requests answered without a 5xx since start, e.g. '99.8%'"""
+    with _lock:
+        total = sum(requests_total.values())
+        failed = sum(n for (_, _, status), n in requests_total.items() if status >= 500)
+    if not total:
+        return "100%"
+    return f"{100.0 * (total - failed) / total:.1f}%"
+
+
+def register_collector(collect):
+    """collect() -> [(name, type, help, value)], added to /metrics as-is"""
+    _collectors.append(collect)
+
+
+# ---------------------- TEXT FORMAT ----------------------
+def _labels(names, values, extra=""):
+    parts = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}"
+
+
+def _histogram_lines(name, help_text, histogram, label_names):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, series in sorted(histogram.series.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + ["+Inf"], series):
+            cumulative += count
+            le = f'le="{bound}"'
+            lines.append(f"{name}_bucket{_labels(label_names, labels, le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(label_names, labels)} {series[-1]}")
+        lines.append(f"{name}_count{_labels(label_names, labels)} {cumulative}")
+    return lines
+
+
+def render():
+    pid = os.getpid()
+    with _lock:
+        lines = [
+            "# HELP school_http_requests_total Requests answered, by route, method and status",
+            "# TYPE school_http_requests_total counter",
+        ]
+        for (route, method, status), count in sorted(requests_total.items()):
+            lines.append(f"school_http_requests_total{_labels(('route', 'method', 'status'), (route, method, status))} {count}")
+        lines += _histogram_lines("school_http_request_duration_seconds", "Time to answer a request, including streaming",
+                                  request_latency, ("route", "method"))
+        lines += _histogram_lines("school_http_response_size_bytes", "Response body size when known up front",
+                                  response_size, ("route", "method"))
+        lines += _histogram_lines("school_db_seconds_per_request", "Time spent inside get_db() blocks per request",
+                                  db_time, ("route", "method"))
+        lines += _histogram_lines("school_db_queries_per_request", "SQL statements executed per request",
+                                  db_queries, ("route", "method"))
+        lines += [
+            "# HELP school_http_requests_in_flight Requests currently being answered",
+            "# TYPE school_http_requests_in_flight gauge",
+            f"school_http_requests_in_flight {in_flight}",
+        ]
+    lines += [
+        "# HELP school_process_start_time_seconds Unix time this worker started",
+        "# TYPE school_process_start_time_seconds gauge",
+        f"school_process_start_time_seconds{{pid=\"{pid}\"}} {START_TIME}",
+    ]
+    for collect in _collectors:
+        for name, kind, help_text, value in collect():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------- FLASK HOOKS ----------------------
+def init_app(app):
+    if not ENABLED:
+        return
+
+    @app.before_request
+    def start_request():
+        global in_flight
+        rule = request.url_rule
+        _local.stats = RequestStats(rule.rule if rule else "unmatched", request.method)
+        with _lock:
+            in_flight += 1
+
+    @app.after_request
+    def finish_request(response):
+        stats = getattr(_local, "stats", None)
+        if stats is None:
+            return response
+        status, size = response.status_code, response.content_length
+
+        # Recorded when the body has been sent, so streamed responses
+        # count their full duration and DB time
+        def on_close():
+            _local.stats = None
+            _finish(stats, status, size)
+
+        response.call_on_close(on_close)
+        return response
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
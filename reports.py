@@ -0,0 +1,201 @@
+"""Printable report cards, rendered on a process pool.
+
+app.py gathers the cards (one grouped query per form/term, see REPORT
+CARDS there) and hands them over in chunks; write_report_cards() renders
+each chunk on a pool of REPORT_PROCESSES processes and writes the pages
+into a zip (or a directory) as the chunks come back, so memory holds a
+few chunks rather than the whole school. Only a bounded number of chunks
+is in flight at once, and the output appears under its final name only
+once it is complete.
+
+Each card is a standalone HTML page sized for A4 (print it, or feed it to
+any HTML-to-PDF tool); index.html lists the form by position.
+
+Nothing here imports the app: the pool uses the "spawn" start method
+(forking a threaded web worker is unsafe), so the children import only
+this module - and the __main__ script, which is gunicorn or flask except
+under `python app.py`.
+"""
+import html
+import multiprocessing
+import os
+import shutil
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+SCHOOL_NAME = os.environ.get("SCHOOL_NAME", "First Class Group of Schools")
+REPORT_PROCESSES = int(os.environ.get("REPORT_PROCESSES", os.cpu_count() or 1))
+# Chunks queued per process, ahead of the one it is rendering
+CHUNKS_AHEAD = 2
+
+CARD_STYLE = """
+@page { size: A4; margin: 15mm; }
+body { font-family: Arial, sans-serif; color: #222; margin: 0; }
+header { text-align: center; border-bottom: 2px solid #1a3c6e; margin-bottom: 12px; }
+header h1 { margin: 0; font-size: 20px; color: #1a3c6e; }
+header h2 { margin: 4px 0 8px; font-size: 15px; font-weight: normal; }
+.details, .marks { width: 100%; border-collapse: collapse; margin-bottom: 12px; font-size: 13px; }
+.details td { padding: 3px 6px; }
+.marks th, .marks td { border: 1px solid #999; padding: 4px 6px; text-align: left; }
+.marks th { background: #e8eef7; }
+.num { text-align: right; }
+.summary { display: flex; gap: 12px; margin-bottom: 16px; font-size: 13px; }
+.summary div { flex: 1; border: 1px solid #999; padding: 6px; text-align: center; }
+.summary b { display: block; font-size: 18px; }
+.remarks p { border-bottom: 1px dotted #999; min-height: 22px; margin: 6px 0; font-size: 13px; }
+"""
+
+
+def _e(value):
+    return html.escape("" if value is None else str(value))
+
+
+def card_filename(card):
+    # Student IDs are normalized (upper-case, trimmed) but may hold slashes
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in str(card["student_id"])) + ".html"
+
+
+def render_card(card):
+    """HTML page for one student's card (a dict built by app.report_card_chunks)"""
+    title = f"Form {card['form']} · Term {card['term']} {card['year']}"
+    if card.get("exam_type"):
+        title += f" · {card['exam_type']}"
+    rows = "".join(
+        f"<tr><td>{_e(s['subject'])}</td><td class=num>{_e(s['marks'])}</td><td>{_e(s['grade'])}</td>"
+        f"<td class=num>{_e(s['position'])} / {_e(s['out_of'])}</td><td class=num>{_e(s['subject_average'])}</td>"
+        f"<td>{_e(s['comment'])}</td></tr>"
+        for s in card["subjects"]
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>{_e(card['name'])} - {_e(title)}</title>
+<style>{CARD_STYLE}</style></head>
+<body>
+<header><h1>{_e(SCHOOL_NAME)}</h1><h2>Report Card · {_e(title)}</h2></header>
+<table class="details">
+<tr><td>Name: <b>{_e(card['name'])}</b></td><td>Student ID: <b>{_e(card['student_id'])}</b></td></tr>
+<tr><td>Class: {_e(card.get('class'))}</td><td>Level: {_e(card.get('level'))}</td></tr>
+</table>
+<table class="marks">
+<tr><th>Subject</th><th class=num>Marks</th><th>Grade</th><th class=num>Position</th><th class=num>Class average</th><th>Comment</th></tr>
+{rows}
+</table>
+<div class="summary">
+<div>Total marks<b>{_e(card['total_marks'])}</b></div>
+<div>Average<b>{_e(card['average'])}</b></div>
+<div>Position<b>{_e(card['position'])} / {_e(card['out_of'])}</b></div>
+<div>Subjects passed<b>{_e(card['passed'])} / {_e(card['subject_count'])}</b></div>
+</div>
+<div class="remarks">
+<p>Class teacher's remarks:</p><p></p>
+<p>Head's remarks:</p><p></p>
+<p>Signature: ____________________ &nbsp; Date: ______________</p>
+</div>
+</body></html>
+"""
+
+
+def render_chunk(cards):
+    """Pool task: [(filename, html bytes)] for a chunk of cards"""
+    return [(card_filename(card), render_card(card).encode("utf-8")) for card in cards]
+
+
+def render_index(title, entries):
+    """Class list by position, linking each card; entries are (card file, card)"""
+    rows = "".join(
+        f"<tr><td class=num>{_e(card['position'])}</td><td><a href=\"{_e(name)}\">{_e(card['name'])}</a></td>"
+        f"<td>{_e(card['student_id'])}</td><td class=num>{_e(card['total_marks'])}</td>"
+        f"<td class=num>{_e(card['average'])}</td></tr>"
+        for name, card in sorted(entries, key=lambda e: (e[1]["position"] or 0, str(e[1]["student_id"])))
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>{_e(title)}</title><style>{CARD_STYLE}</style></head>
+<body><header><h1>{_e(SCHOOL_NAME)}</h1><h2>{_e(title)}</h2></header>
+<table class="marks"><tr><th class=num>Position</th><th>Name</th><th>Student ID</th>
+<th class=num>Total</th><th class=num>Average</th></tr>{rows}</table>
+</body></html>
+""".encode("utf-8")
+
+
+class ReportWriter:
+    """Files into a zip or a directory, written under a .part name until close()"""
+
+    def __init__(self, path, fmt="zip"):
+        self.path = path
+        self.fmt = fmt
+        self.partial = path + ".part"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if fmt == "zip":
+            self._zip = zipfile.ZipFile(self.partial, "w", zipfile.ZIP_DEFLATED)
+        else:
+            shutil.rmtree(self.partial, ignore_errors=True)
+            os.makedirs(self.partial)
+
+    def add(self, name, data):
+        if self.fmt == "zip":
+            self._zip.writestr(name, data)
+        else:
+            with open(os.path.join(self.partial, name), "wb") as f:
+                f.write(data)
+
+    def close(self):
+        if self.fmt == "zip":
+            self._zip.close()
+        else:
+            shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self.partial, self.path)
+
+    def abort(self):
+        if self.fmt == "zip":
+            self._zip.close()
+            os.remove(self.partial)
+        else:
+            shutil.rmtree(self.partial, ignore_errors=True)
+
+
+def write_report_cards(chunks, path, title, fmt="zip", progress=None, processes=None):
+    """Render `chunks` (lists of card dicts) into `path`; returns the card count.
+
+    progress(cards_written) is called after every chunk; an exception from
+    it (a cancelled job) or anywhere else ends the run and removes the
+    partial output.
+    """
+    writer = ReportWriter(path, fmt)
+    processes = processes or REPORT_PROCESSES
+    written = 0
+    entries = []
+    try:
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+            pending = deque()
+            chunks = iter(chunks)
+            exhausted = False
+            try:
+                while pending or not exhausted:
+                    # Keep every process busy, but don't read the whole form ahead
+                    while not exhausted and len(pending) < processes * (CHUNKS_AHEAD + 1):
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            exhausted = True
+                        else:
+                            pending.append((chunk, pool.submit(render_chunk, chunk)))
+                    if not pending:
+                        break
+                    chunk, future = pending.popleft()
+                    for (name, data), card in zip(future.result(), chunk):
+                        writer.add(name, data)
+                        entries.append((name, {k: card[k] for k in
+                                               ("student_id", "name", "position", "total_marks", "average")}))
+                    written += len(chunk)
+                    if progress:
+                        progress(written)
+            except BaseException:
+                # Don't wait for chunks nobody will write
+                for _, queued in pending:
+                    queued.cancel()
+                raise
+        writer.add("index.html", render_index(title, entries))
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return written
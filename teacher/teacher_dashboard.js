@@ -10,12 +10,19 @@ let subjects = [
   ];
   
   let studentVerified = false;   // will be true after successful search
+  const RESULTS_PAGE_SIZE = 100;  // rows fetched per "Load more"
+  let resultsCursor = null;       // next_cursor from the last /get_results page
+  let resultsSeq = null;          // change sequence the table is up to date with
+  const RESULT_FIELDS = 'student_id,student_name,form,subject,term,year,marks,grade,status,comment';
+  let liveResults = false;        // true while the /events stream is connected
   
   document.addEventListener("DOMContentLoaded", () => {
     initYearSelect();
     populateSubjects();
     wireEvents();
+    addBulkRows(10);
     loadResults();            // initial load
+    watchResults();           // then follow changes as they happen
   });
   
   // ---------------- utils ----------------
@@ -53,10 +60,18 @@ let subjects = [
     $('newSubject').addEventListener('keydown', (e) => { if (e.key === 'Enter') { addNewSubject(); e.preventDefault(); }});
     $('subject').addEventListener('change', (e) => { if (e.target.value === '__add__') toggleNewSubject(); });
     $('btnSearch').addEventListener('click', onSearchStudent);
+    $('studentID').addEventListener('input', (e) => suggestStudents(e.target.value));
+    $('studentName').addEventListener('input', (e) => suggestStudents(e.target.value));
     $('marks').addEventListener('input', updateGradePreview);
     $('btnSave').addEventListener('click', onSaveResult);
     $('btnClear').addEventListener('click', clearForm);
-    $('btnApply').addEventListener('click', loadResults);
+    $('btnApply').addEventListener('click', () => loadResults());
+    $('btnMoreResults').addEventListener('click', () => loadResults(true));
+    $('btnBulkAddRows').addEventListener('click', () => addBulkRows(10));
+    $('btnBulkClear').addEventListener('click', clearBulkSheet);
+    $('btnBulkSave').addEventListener('click', onBulkSave);
+    $('btnBulkUpload').addEventListener('click', onBulkUpload);
+    document.querySelector('#bulkTable tbody').addEventListener('paste', onBulkPaste);
   }
   
   // --------------- subject helpers ---------------
@@ -79,6 +94,42 @@ let subjects = [
   }
   
   // ----------------- search student -----------------
+  let suggestTimer = null;
+  let suggestSeq = 0;       // ignore answers to queries the user has typed past
+  
+  function suggestStudents(text) {
+    clearTimeout(suggestTimer);
+    text = text.trim();
+    if (text.length < 2) { $('studentSuggest').innerHTML = ''; return; }
+    suggestTimer = setTimeout(async () => {
+      const seq = ++suggestSeq;
+      try {
+        const res = await fetch(`/search_students?q=${encodeURIComponent(text)}&limit=8`);
+        const j = await res.json();
+        if (seq === suggestSeq) renderSuggestions(j.students || []);
+      } catch (err) {
+        console.error(err);
+      }
+    }, 150);
+  }
+  
+  function renderSuggestions(students) {
+    const box = $('studentSuggest');
+    box.innerHTML = '';
+    students.forEach(s => {
+      const item = document.createElement('div');
+      item.className = 'suggest-item';
+      item.textContent = `${s.student_id} — ${s.name || ''} ${s.surname || ''} (${s.class || ''})`;
+      item.addEventListener('click', () => {
+        box.innerHTML = '';
+        $('studentID').value = s.student_id;
+        $('studentName').value = s.name || '';
+        onSearchStudent();
+      });
+      box.appendChild(item);
+    });
+  }
+  
   async function onSearchStudent() {
     const student_id = $('studentID').value.trim();
     const name = $('studentName').value.trim();
@@ -205,15 +256,142 @@ let subjects = [
       }
       alert('Saved successfully');
       clearForm();
-      loadResults();
+      if (!liveResults) syncResults();
     } catch (err) {
       console.error(err);
       alert('Save error');
     }
   }
   
+  // ---------------- bulk entry (spreadsheet mode) ----------------
+  // One row per student; the shared fields come from the selects above.
+  // Everything is sent in a single /save_results_bulk request.
+  function addBulkRows(n) {
+    const tbody = document.querySelector('#bulkTable tbody');
+    for (let i = 0; i < n; i++) {
+      const tr = document.createElement('tr');
+      tr.innerHTML = `
+        <td class="bulk-num">${tbody.children.length + 1}</td>
+        <td><input class="bulk-id" placeholder="Student ID"></td>
+        <td><input class="bulk-name" placeholder="Name"></td>
+        <td><input class="bulk-marks" type="number" min="0" max="100"></td>
+        <td class="bulk-grade"></td>
+        <td><input class="bulk-comment" placeholder="Optional"></td>
+      `;
+      tr.querySelector('.bulk-marks').addEventListener('input', (e) => {
+        tr.querySelector('.bulk-grade').textContent = e.target.value === '' ? '' : calculateGrade(e.target.value);
+      });
+      tbody.appendChild(tr);
+    }
+  }
+  
+  function clearBulkSheet() {
+    document.querySelector('#bulkTable tbody').innerHTML = '';
+    $('bulkStatus').textContent = '';
+    addBulkRows(10);
+  }
+  
+  // Paste tab-separated rows (as Excel copies them) starting at the focused row
+  function onBulkPaste(e) {
+    const text = (e.clipboardData || window.clipboardData).getData('text');
+    if (!text.includes('\t') && !text.includes('\n')) return;  // single cell: normal paste
+    e.preventDefault();
+    const tbody = document.querySelector('#bulkTable tbody');
+    const lines = text.replace(/\r/g, '').split('\n').filter(l => l.trim() !== '');
+    let start = Array.from(tbody.children).indexOf(e.target.closest('tr'));
+    if (start < 0) start = 0;
+    const missing = start + lines.length - tbody.children.length;
+    if (missing > 0) addBulkRows(missing);
+    lines.forEach((line, i) => {
+      const [id = '', name = '', marks = '', comment = ''] = line.split('\t');
+      const tr = tbody.children[start + i];
+      tr.querySelector('.bulk-id').value = id.trim();
+      tr.querySelector('.bulk-name').value = name.trim();
+      tr.querySelector('.bulk-marks').value = marks.trim();
+      tr.querySelector('.bulk-comment').value = comment.trim();
+      tr.querySelector('.bulk-grade').textContent = marks.trim() === '' ? '' : calculateGrade(marks);
+    });
+  }
+  
+  async function onBulkSave() {
+    const shared = {
+      form: $('form').value,
+      level: $('level').value,
+      subject: $('subject').value,
+      term: $('term').value,
+      year: Number($('year').value),
+      exam_type: $('examType').value || '',
+      exam_date: $('examDate').value || '',
+      teacher_id: ''
+    };
+    if (!shared.form || !shared.level || !shared.subject || !shared.term || !shared.year) {
+      return alert('Choose Term, Year, Level, Form and Subject above before saving the sheet.');
+    }
+  
+    // Remember which table row each payload entry came from for error display
+    const payload = [];
+    const sheetRows = [];
+    document.querySelectorAll('#bulkTable tbody tr').forEach(tr => {
+      tr.style.background = '';
+      const student_id = tr.querySelector('.bulk-id').value.trim();
+      const marks = tr.querySelector('.bulk-marks').value;
+      if (!student_id && marks === '') return;  // empty row
+      const grade = marks === '' ? '' : calculateGrade(marks);
+      payload.push(Object.assign({}, shared, {
+        student_id,
+        student_name: tr.querySelector('.bulk-name').value.trim(),
+        marks: marks === '' ? '' : Number(marks),
+        grade,
+        status: grade ? calculateStatus(grade) : '',
+        comment: tr.querySelector('.bulk-comment').value
+      }));
+      sheetRows.push(tr);
+    });
+    if (!payload.length) return alert('The sheet is empty.');
+  
+    try {
+      const res = await fetch('/save_results_bulk', {
+        method: 'POST',
+        headers: {'Content-Type':'application/json'},
+        body: JSON.stringify(payload)
+      });
+      const j = await res.json();
+      showBulkResult(j, sheetRows);
+      if (j.saved && !liveResults) syncResults();
+    } catch (err) {
+      console.error(err);
+      alert('Bulk save error');
+    }
+  }
+  
+  async function onBulkUpload() {
+    const file = $('bulkCsv').files[0];
+    if (!file) return alert('Choose a CSV file first');
+    const body = new FormData();
+    body.append('file', file);
+    try {
+      const res = await fetch('/save_results_bulk', { method: 'POST', body });
+      const j = await res.json();
+      showBulkResult(j, []);
+      if (j.saved && !liveResults) syncResults();
+    } catch (err) {
+      console.error(err);
+      alert('Upload error');
+    }
+  }
+  
+  function showBulkResult(j, sheetRows) {
+    const errors = j.errors || [];
+    errors.forEach(e => {
+      const tr = sheetRows[e.row - 1];
+      if (tr) tr.style.background = '#fde2e2';
+    });
+    const details = errors.slice(0, 10).map(e => `row ${e.row}: ${e.message}`).join('; ');
+    $('bulkStatus').textContent = (j.message || '') + (details ? ' — ' + details : '');
+  }
+  
   // ---------------- load results ----------------
-  async function loadResults() {
+  function resultsParams() {
     const params = new URLSearchParams();
     const f = $('filterForm').value;
     const subj = $('filterSubject').value;
@@ -221,36 +399,26 @@ let subjects = [
     if (f) params.set('form', f);
     if (subj) params.set('subject', subj);
     if (term) params.set('term', term);
+    params.set('fields', RESULT_FIELDS);
+    return params;
+  }
+  
+  // Fetches one page at a time; append=true continues from the last cursor.
+  async function loadResults(append = false) {
+    const params = resultsParams();
+    params.set('limit', RESULTS_PAGE_SIZE);
+    if (append && resultsCursor) params.set('cursor', resultsCursor);
   
     try {
       const res = await fetch('/get_results?' + params.toString());
-      const rows = await res.json();
+      const page = await res.json();
+      const rows = page.data;
+      resultsCursor = page.next_cursor;
+      if (!append) resultsSeq = page.seq;
+      $('btnMoreResults').style.display = resultsCursor ? 'inline-block' : 'none';
       const tbody = document.querySelector('#resultsTable tbody');
-      tbody.innerHTML = '';
-      rows.forEach(r => {
-        const tr = document.createElement('tr');
-        const gradeClass = 'grade-' + (r.grade || 'E');
-        const statusClass = (r.status && r.status.toLowerCase().includes('excellent')) ? 'status-excellent' :
-                            (r.status && r.status.toLowerCase().includes('good')) ? 'status-good' :
-                            (r.status && r.status.toLowerCase().includes('satisf')) ? 'status-average' :
-                            (r.status && r.status.toLowerCase().includes('pass')) ? 'status-average' : 'status-fail';
-        tr.innerHTML = `
-          <td>${r.student_id}</td>
-          <td>${r.student_name}</td>
-          <td>${r.form}</td>
-          <td>${r.subject}</td>
-          <td>Term ${r.term} ${r.year}</td>
-          <td>${r.marks}</td>
-          <td><span class="grade-badge ${gradeClass}">${r.grade}</span></td>
-          <td><span class="status-badge ${statusClass}">${r.status}</span></td>
-          <td>${r.comment || ''}</td>
-          <td>
-            <button onclick="onEditResult(${r.id})">Edit</button>
-            <button onclick="onDeleteResult(${r.id})" style="margin-left:6px;background:#dc3545;color:white;">Delete</button>
-          </td>
-        `;
-        tbody.appendChild(tr);
-      });
+      if (!append) tbody.innerHTML = '';
+      rows.forEach(r => tbody.appendChild(resultRow(r)));
   
       // update filterSubject options from loaded results if not present
       const filterSel = $('filterSubject');
@@ -268,13 +436,102 @@ let subjects = [
     }
   }
   
+  // Only what changed since the table was loaded: changed rows move to the
+  // top, deleted ones go. Falls back to a full reload when the server says
+  // too much has changed.
+  async function syncResults() {
+    if (resultsSeq == null) return loadResults();
+    const params = resultsParams();
+    params.set('since', resultsSeq);
+    try {
+      const res = await fetch('/get_results?' + params.toString());
+      const delta = await res.json();
+      if (!res.ok || delta.reset) return loadResults();
+      delta.deleted.forEach(removeResultRow);
+      const tbody = document.querySelector('#resultsTable tbody');
+      delta.data.forEach(r => {
+        removeResultRow(r.id);
+        tbody.prepend(resultRow(r));
+      });
+      resultsSeq = delta.seq;
+    } catch (err) {
+      console.error(err);
+    }
+  }
+  
+  function removeResultRow(id) {
+    const tr = document.querySelector(`#resultsTable tbody tr[data-id="${id}"]`);
+    if (tr) tr.remove();
+  }
+  
+  function resultRow(r) {
+    const tr = document.createElement('tr');
+    tr.dataset.id = r.id;
+    const gradeClass = 'grade-' + (r.grade || 'E');
+    const statusClass = (r.status && r.status.toLowerCase().includes('excellent')) ? 'status-excellent' :
+                        (r.status && r.status.toLowerCase().includes('good')) ? 'status-good' :
+                        (r.status && r.status.toLowerCase().includes('satisf')) ? 'status-average' :
+                        (r.status && r.status.toLowerCase().includes('pass')) ? 'status-average' : 'status-fail';
+    tr.innerHTML = `
+      <td>${r.student_id}</td>
+      <td>${r.student_name}</td>
+      <td>${r.form}</td>
+      <td>${r.subject}</td>
+      <td>Term ${r.term} ${r.year}</td>
+      <td>${r.marks}</td>
+      <td><span class="grade-badge ${gradeClass}">${r.grade}</span></td>
+      <td><span class="status-badge ${statusClass}">${r.status}</span></td>
+      <td>${r.comment || ''}</td>
+      <td>
+        <button onclick="onEditResult(${r.id})">Edit</button>
+        <button onclick="onDeleteResult(${r.id})" style="margin-left:6px;background:#dc3545;color:white;">Delete</button>
+      </td>
+    `;
+    return tr;
+  }
+  
+  // ---------------- live updates ----------------
+  // Saves and deletes, from this tab or anyone else's, arrive over /events
+  // and are patched into the table; only bulk saves and resets reload it.
+  // Without the stream the page reloads the list after its own changes.
+  function watchResults() {
+    if (!window.EventSource) return;
+    const source = new EventSource('/events?topics=results');
+    source.onopen = () => { liveResults = true; };
+    source.onerror = () => { liveResults = false; };
+    source.addEventListener('results', e => applyResultEvent(JSON.parse(e.data)));
+    // Too much was missed while disconnected
+    source.addEventListener('reset', () => syncResults());
+  }
+  
+  function matchesFilters(r) {
+    const f = $('filterForm').value;
+    const subj = $('filterSubject').value;
+    const term = $('filterTerm').value;
+    return (!f || r.form === f) && (!subj || r.subject === subj) && (!term || String(r.term) === term);
+  }
+  
+  function applyResultEvent(ev) {
+    if (ev.action !== 'saved' && ev.action !== 'deleted') {
+      // Bulk changes: fetch just the changed rows
+      syncResults();
+      return;
+    }
+    // A re-saved mark replaces the old row (and gets a new id)
+    const gone = ev.action === 'deleted' ? ev.id : ev.replaced;
+    if (gone != null) removeResultRow(gone);
+    // Newest first, like /get_results
+    if (ev.action === 'saved' && matchesFilters(ev.result)) {
+      document.querySelector('#resultsTable tbody').prepend(resultRow(ev.result));
+    }
+  }
+  
   // ---------------- edit / delete ----------------
   async function onEditResult(id) {
     try {
-      const res = await fetch('/get_results');
-      const rows = await res.json();
-      const r = rows.find(x => x.id === id);
-      if (!r) return alert('Record not found');
+      const res = await fetch('/get_result/' + id);
+      if (res.status === 404) return alert('Record not found');
+      const r = (await res.json()).data;
   
       // populate form (and mark studentVerified true because student exists)
       $('studentID').value = r.student_id;
@@ -303,7 +560,7 @@ let subjects = [
     try {
       const res = await fetch('/delete_result/' + id, { method: 'DELETE' });
       const j = await res.json();
-      if (j.ok) { alert('Deleted'); loadResults(); }
+      if (j.ok) { alert('Deleted'); if (!liveResults) syncResults(); }
       else alert('Delete failed');
     } catch (err) {
       console.error(err);
@@ -0,0 +1,78 @@
+"""Shared fixtures.
+
+app.py opens its databases (and writes .secret_key, the asset build and
+the job files) relative to the working directory at import time, so the
+app is imported once per test run from a scratch directory. Tests share
+those databases; each one uses IDs of its own.
+
+The job dispatcher is a daemon thread and would outlive the session, by
+which time pytest has gone back to the original directory; it is told to
+stop taking jobs first, so no job opens the relative jobs.db there.
+"""
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("school")
+    os.chdir(workdir)
+    os.environ.setdefault("ASSET_BUILD_DIR", str(workdir / "assets"))
+    os.environ.setdefault("JOBS_POLL_INTERVAL", "0.1")
+    os.environ.setdefault("REPORT_PROCESSES", "1")
+    os.environ.pop("SCHOOL_DB", None)
+    os.environ.pop("REQUIRE_SESSIONS", None)
+    sys.path.insert(0, ROOT)
+    import app
+    yield app
+    app.jobs.queue.threads = 0
+    deadline = time.monotonic() + 10
+    while app.jobs.stats()["running"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def login(app_module):
+    """login(role, user_id) -> headers carrying a session for that user"""
+    def make(role, user_id, name="Test"):
+        session = app_module.session_store.create(role, user_id, name)
+        return {"Authorization": "Bearer " + app_module.sign_session(session["sid"])}
+    return make
+
+
+@pytest.fixture
+def wait_for_job(client, login):
+    """wait_for_job(job_id) -> the job once it has stopped running (GET /jobs/<id>)"""
+    admin = login("admin", "ADMIN1")
+
+    def wait(job_id, timeout=30):
+        deadline = time.monotonic() + timeout
+        while True:
+            job = client.get(f"/jobs/{job_id}", headers=admin).get_json()
+            if job["status"] in ("done", "failed", "cancelled") or time.monotonic() > deadline:
+                return job
+            time.sleep(0.05)
+    return wait
+
+
+@pytest.fixture
+def add_result(app_module):
+    """add_result(student_id, **fields): save one results row straight to the table"""
+    def add(student_id, **fields):
+        row = dict(student_id=student_id, student_name="Test Student", form="Form 1", level="O",
+                   subject="Maths", term="1", year=2025, marks=70, grade="B", status="Pass")
+        row.update(fields)
+        with app_module.get_db(app_module.DATABASE_RESULTS) as conn:
+            conn.execute(app_module.SAVE_RESULT_SQL, app_module.result_params(row))
+        app_module.data_changed("results")
+    return add
@@ -0,0 +1,84 @@
+import pytest
+
+FORM = "Form Analytics"
+# student: {term: {subject: marks}}; under 55 fails
+MARKS = {
+    "ANLY01": {"1": {"Maths": 90, "English": 70}, "2": {"Maths": 60, "English": 60}},
+    "ANLY02": {"1": {"Maths": 70, "English": 90}, "2": {"Maths": 80, "English": 90}},
+    "ANLY03": {"1": {"Maths": 50, "English": 60}},
+}
+
+
+@pytest.fixture
+def form_results(add_result):
+    for student_id, terms in MARKS.items():
+        for term, subjects in terms.items():
+            for subject, marks in subjects.items():
+                add_result(student_id, form=FORM, year=2031, term=term, subject=subject, marks=marks,
+                           exam_type="Final", grade="A" if marks >= 80 else "C",
+                           status="Pass" if marks >= 55 else "Fail")
+
+
+@pytest.fixture
+def analytics(client, login, form_results):
+    teacher = login("teacher", "T1")
+
+    def get(report, **args):
+        response = client.get(f"/analytics/{report}", query_string=dict(form=FORM, year=2031, **args),
+                              headers=teacher)
+        assert response.status_code == 200, response.get_data()
+        return response.get_json()
+    return get
+
+
+def test_positions_share_a_rank_on_ties(analytics):
+    students = analytics("positions", term="1")["students"]
+    assert [(s["student_id"], s["average"], s["position"], s["out_of"]) for s in students] == [
+        ("ANLY01", 80, 1, 3), ("ANLY02", 80, 1, 3), ("ANLY03", 55, 3, 3)]
+    assert students[2]["passed"] == 1
+    maths = {s["student_id"]: next(x for x in s["subjects"] if x["subject"] == "Maths") for s in students}
+    assert [maths[s]["position"] for s in sorted(maths)] == [1, 2, 3]
+    assert maths["ANLY01"]["subject_average"] == 70
+
+
+def test_subject_statistics(analytics):
+    body = analytics("subjects", term="1")
+    english, maths = body["subjects"]
+    assert (english["subject"], english["average"], english["position"]) == ("English", 73.33, 1)
+    assert (maths["lowest"], maths["highest"], maths["passed"], maths["pass_rate"]) == (50, 90, 2, 66.7)
+    assert maths["grades"] == {"A": 1, "C": 2}
+    assert body["grades"] == {"A": 2, "C": 4}
+
+
+def test_trends_compare_each_term_with_the_last(analytics):
+    body = analytics("trends")
+    students = {s["student_id"]: s["terms"] for s in body["students"]}
+    assert [(t["term"], t["average"], t["change"]) for t in students["ANLY01"]] == [("1", 80, None), ("2", 60, -20)]
+    assert students["ANLY02"][1]["position"] == 1
+    subjects = {s["subject"]: s["terms"] for s in body["subjects"]}
+    assert subjects["Maths"][1] == {"term": "2", "average": 70, "change": 0}
+
+
+def test_cached_answers_follow_writes(client, login, add_result):
+    teacher = login("teacher", "T1")
+    # A year of its own, so the other tests' numbers stay put
+    add_result("ANLY04", form=FORM, year=2032, term="1", subject="Maths", marks=40, exam_type="Final")
+    url = f"/analytics/subjects?form={FORM}&year=2032&term=1"
+    etag = client.get(url, headers=teacher).headers["ETag"]
+    assert client.get(url, headers=dict(teacher, **{"If-None-Match": etag})).status_code == 304
+
+    # Another form's change leaves this answer as it was
+    add_result("ANLY06", form="Form Elsewhere", year=2032, term="1", subject="Maths", exam_type="Final")
+    assert client.get(url, headers=teacher).headers["ETag"] == etag
+
+    add_result("ANLY05", form=FORM, year=2032, term="1", subject="Maths", marks=10, exam_type="Final")
+    changed = client.get(url, headers=teacher)
+    assert changed.headers["ETag"] != etag
+    assert changed.get_json()["subjects"][0]["lowest"] == 10
+
+
+def test_analytics_arguments_and_access(client, login):
+    teacher = login("teacher", "T1")
+    assert client.get(f"/analytics/positions?form={FORM}&year=2031", headers=teacher).status_code == 400
+    assert client.get(f"/analytics/trends?form={FORM}&year=soon", headers=teacher).status_code == 400
+    assert client.get(f"/analytics/trends?form={FORM}&year=2031", headers=login("student", "ANLY01")).status_code == 403
@@ -0,0 +1,116 @@
+"""asgi.application driven directly with ASGI scope/receive/send"""
+import asyncio
+import gzip
+import json
+import re
+
+import pytest
+
+
+@pytest.fixture
+def asgi(app_module):
+    import asgi
+    return asgi
+
+
+@pytest.fixture
+def call(asgi):
+    """call(method, path, body chunks..., headers=...) -> (status, headers, body, messages)"""
+    def run(method, path, *chunks, headers=(), query=b"", disconnect=False):
+        scope = {"type": "http", "method": method, "path": path, "query_string": query, "http_version": "1.1",
+                 "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+                 "server": ("testserver", 80), "client": ("127.0.0.1", 5000)}
+        incoming = [{"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks]
+        incoming.append({"type": "http.disconnect"} if disconnect else {"type": "http.request", "body": b""})
+        sent = []
+
+        async def receive():
+            if incoming:
+                return incoming.pop(0)
+            await asyncio.Event().wait()
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(asgi.application(scope, receive, send))
+        if not sent:
+            return None, {}, b"", sent
+        start = sent[0]
+        body = b"".join(m.get("body", b"") for m in sent[1:])
+        return start["status"], dict((k.decode(), v.decode()) for k, v in start["headers"]), body, sent
+    return run
+
+
+def test_api_answers_match_the_wsgi_app(call, client, add_result):
+    add_result("ASGI01", form="Form ASGI", subject="Maths", marks=81)
+    status, headers, body, _ = call("GET", "/get_results", query=b"form=Form+ASGI")
+    assert status == 200
+    assert headers["content-type"] == "application/json"
+    assert json.loads(body) == client.get("/get_results?form=Form ASGI").get_json()
+
+
+def test_request_bodies_arrive_in_pieces(call, client, login):
+    payload = json.dumps(dict(student_id="ASGI02", student_name="Asgi", form="Form ASGI", level="O",
+                              subject="Physics", term="1", year=2025, marks=58, grade="D", status="Pass")).encode()
+    status, _, body, _ = call("POST", "/save_result", payload[:20], payload[20:],
+                              headers=[("Content-Type", "application/json")])
+    assert (status, json.loads(body)["success"]) == (200, True)
+    [row] = client.get("/student_results/ASGI02", headers=login("teacher", "T1")).get_json()["results"]
+    assert row["marks"] == 58
+
+
+def test_streamed_responses_go_out_in_chunks(call, add_result, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "STREAM_BATCH_SIZE", 1)
+    for subject in ("Maths", "English", "History"):
+        add_result("ASGI03", form="Form ASGI Stream", subject=subject)
+    status, _, body, sent = call("GET", "/get_results", query=b"form=Form+ASGI+Stream&stream=ndjson")
+    assert status == 200
+    assert len(body.splitlines()) == 3
+    assert sum(1 for m in sent if m.get("body")) >= 3
+    assert sent[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+
+
+def test_pages_are_served_on_the_loop(call, asgi, monkeypatch):
+    # Flask never sees these: a page request must not reach the thread pool
+    monkeypatch.setattr(asgi, "send_wsgi", None)
+    status, headers, body, _ = call("GET", "/", headers=[("Accept-Encoding", "gzip")])
+    assert (status, headers["content-encoding"], headers["cache-control"]) == (200, "gzip", "no-cache")
+    assert b"<html" in gzip.decompress(body).lower()
+
+    assert call("GET", "/", headers=[("Accept-Encoding", "gzip"), ("If-None-Match", headers["etag"])])[0] == 304
+    status, head_headers, body, _ = call("HEAD", "/")
+    assert (status, body) == (200, b"")
+    assert int(head_headers["content-length"]) > 0
+
+    link = re.search(rb'/assets/[^"]+\.css', call("GET", "/admin/dashboard")[2])
+    assert call("GET", link.group().decode())[1]["cache-control"] == asgi.assets.IMMUTABLE
+
+
+def test_a_client_that_leaves_early_gets_nothing(call):
+    assert call("POST", "/save_result", b'{"student_id":', disconnect=True)[0] is None
+
+
+def test_repeated_headers_are_joined(asgi):
+    body = asgi.tempfile.SpooledTemporaryFile()
+    environ = asgi.wsgi_environ({"method": "GET", "path": "/", "query_string": b"", "http_version": "1.1",
+                                 "headers": [(b"accept", b"text/html"), (b"accept", b"*/*"),
+                                             (b"content-type", b"text/csv"), (b"content-length", b"99")]}, body)
+    assert environ["HTTP_ACCEPT"] == "text/html,*/*"
+    assert (environ["CONTENT_TYPE"], environ["CONTENT_LENGTH"]) == ("text/csv", "0")
+
+
+def test_lifespan_starts_and_stops_the_pool(asgi, monkeypatch):
+    monkeypatch.setattr(asgi, "_executor", None)
+    incoming = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message["type"])
+        if message["type"] == "lifespan.startup.complete":
+            assert asgi._executor is not None
+
+    asyncio.run(asgi.application({"type": "lifespan"}, receive, send))
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
@@ -0,0 +1,72 @@
+import gzip
+import hashlib
+import re
+
+import pytest
+
+
+@pytest.fixture
+def assets(app_module):
+    # Imported through the app, after conftest has pointed ASSET_BUILD_DIR at the scratch directory
+    return app_module.assets
+
+
+def linked_assets(client, page="/admin/dashboard"):
+    html = client.get(page, headers={"Accept-Encoding": "identity"}).get_data(as_text=True)
+    return re.findall(r'(?:href|src)="(/assets/[^"]+)"', html)
+
+
+def test_pages_link_fingerprinted_files(client, assets):
+    links = linked_assets(client)
+    assert {link.rsplit(".", 1)[1] for link in links} == {"css", "js"}
+    for link in links:
+        response = client.get(link, headers={"Accept-Encoding": "identity"})
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"] == assets.IMMUTABLE
+        digest = link.rsplit(".", 2)[1]
+        assert hashlib.sha256(response.get_data()).hexdigest()[:12] == digest
+
+
+def test_smallest_accepted_encoding_is_sent(client):
+    link = linked_assets(client)[0]
+    plain = client.get(link, headers={"Accept-Encoding": "identity"})
+    zipped = client.get(link, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in plain.headers
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(zipped.get_data()) == plain.get_data()
+    assert zipped.headers["Vary"] == "Accept-Encoding"
+    assert zipped.headers["ETag"] != plain.headers["ETag"]
+
+
+def test_pages_revalidate(client):
+    first = client.get("/")
+    assert first.headers["Cache-Control"] == "no-cache"
+    assert client.get("/", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+
+def test_old_urls_still_work_uncached(client):
+    response = client.get("/student/studentlog.css")
+    assert response.status_code == 200
+    assert response.mimetype == "text/css"
+    assert response.headers["Cache-Control"] == "no-cache"
+
+
+def test_unknown_built_files_are_404(client):
+    assert client.get("/assets/nothing.0123456789ab.js").status_code == 404
+    assert client.get("/assets/manifest.json").status_code == 404
+
+
+def test_builds_are_reproducible(assets, tmp_path):
+    first = assets.build(str(tmp_path))
+    second = assets.build(str(tmp_path))
+    for group in ("pages", "assets"):
+        assert {url: e["file"] for url, e in first[group].items()} == {url: e["file"] for url, e in second[group].items()}
+        assert all(e["sizes"]["identity"] <= e["original"] for e in first[group].values())
+
+
+def test_minifiers_leave_literals_alone(assets):
+    assert assets.minify_css('a { content: "  x ; y " ; } /* gone */') == 'a{content: "  x ; y "}'
+    js = "function f() {\n    // gone\n    return `a\n    b`;\n}\n"
+    assert assets.minify_js(js) == "function f() {\nreturn `a\n    b`;\n}"
+    html = "<div>\n    <pre>  keep\n   me</pre>\n  <!-- gone -->\n</div>"
+    assert assets.minify_html(html) == "<div>\n<pre>  keep\n   me</pre>\n</div>"
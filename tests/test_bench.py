@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+import bench
+from conftest import ROOT
+
+TINY = ["--students", "20", "--subjects", "2", "--terms", "1", "--requests", "30", "--warmup", "1", "--users", "5"]
+
+
+def run_bench(tmp_path, *args):
+    env = dict(os.environ, ASSET_BUILD_DIR=str(tmp_path / "assets"))
+    return subprocess.run([sys.executable, os.path.join(ROOT, "bench.py"), "--workdir", "data", *TINY, *args],
+                          cwd=tmp_path, env=env, capture_output=True, text=True, timeout=300)
+
+
+def test_every_scenario_runs_without_errors(tmp_path):
+    first = run_bench(tmp_path, "--save", "baseline.json")
+    assert first.returncode == 0, first.stdout + first.stderr
+    with open(tmp_path / "baseline.json") as f:
+        report = json.load(f)
+    assert set(bench.SCENARIOS) <= set(report["scenarios"])
+    assert all(row["errors"] == 0 and row["requests"] for row in report["scenarios"].values())
+
+    # Same settings: the seeded data is reused and the comparison runs
+    again = run_bench(tmp_path, "--scenarios", "admin", "--compare", "baseline.json", "--tolerance", "100")
+    assert again.returncode == 0, again.stdout + again.stderr
+    assert "Reusing seeded data" in again.stdout and "No regressions" in again.stdout
+
+
+def test_compare_flags_slower_fewer_and_failing_requests():
+    old = bench.summarize([0.01] * 100, 1.0, 0)
+    assert bench.compare({"x": old}, {"x": old}, 0.25) == []
+    slow = bench.summarize([0.02] * 50, 1.0, 1)
+    assert [p.split(":")[1].split()[0] for p in bench.compare({"x": slow}, {"x": old}, 0.25)] == ["p95", "req/s", "errors"]
+    assert bench.compare({"new": slow}, {"x": old}, 0.25) == []
+
+
+def test_percentiles():
+    values = [i / 1000 for i in range(1, 101)]
+    summary = bench.summarize(values, 2.0, 0)
+    assert (summary["p50_ms"], summary["p95_ms"], summary["p99_ms"], summary["max_ms"]) == (50, 95, 99, 100)
+    assert summary["rps"] == 50
+    assert bench.summarize([], 0, 0)["p99_ms"] == 0
@@ -0,0 +1,46 @@
+def result_row(student_id, subject, marks, **fields):
+    row = dict(student_id=student_id, student_name="Bulk Student", form="Form 2", level="O", subject=subject,
+               term="2", year=2025, marks=marks, grade="B", status="Pass")
+    row.update(fields)
+    return row
+
+
+def term_summary(client, login, student_id):
+    body = client.get(f"/student_results/{student_id}", headers=login("teacher", "T1")).get_json()
+    return body["termSummaries"]
+
+
+def test_bulk_save_reports_bad_rows_and_saves_the_rest(client, login):
+    rows = [
+        result_row("bulk1", "Maths", 70),
+        result_row("BULK1", "Physics", "82.0"),
+        result_row("BULK1", "Biology", 50, status=""),
+        result_row("BULK1", "History", "lots"),
+    ]
+    body = client.post("/save_results_bulk", json=rows).get_json()
+    assert (body["success"], body["saved"]) == (False, 2)
+    assert body["errors"] == [{"row": 3, "message": "Missing field: status"},
+                              {"row": 4, "message": "marks must be a number"}]
+
+    [summary] = term_summary(client, login, "BULK1")
+    assert (summary["total_subjects"], summary["total_marks"]) == (2, 152)
+
+
+def test_bulk_save_from_csv(client, login):
+    fields = list(result_row("", "", 0))
+    lines = [",".join(fields)] + [
+        ",".join(str(v) for v in result_row("BULK2", subject, marks).values())
+        for subject, marks in (("Maths", 40), ("English", 60))
+    ]
+    response = client.post("/save_results_bulk", data="\n".join(lines), content_type="text/csv")
+    assert response.get_json()["saved"] == 2
+    assert term_summary(client, login, "BULK2")[0]["total_subjects"] == 2
+
+
+def test_bulk_save_needs_a_list(client):
+    assert client.post("/save_results_bulk", json={"student_id": "BULK3"}).status_code == 400
+
+
+def test_bulk_save_is_capped(client, app_module):
+    rows = [result_row("BULK4", "Maths", 1)] * (app_module.MAX_BULK_ROWS + 1)
+    assert client.post("/save_results_bulk", json=rows).status_code == 413
@@ -0,0 +1,98 @@
+import gc
+import os
+import sqlite3
+import threading
+
+import pytest
+
+
+def open_fds(*paths):
+    """File descriptors open on these database files (and their -wal/-shm)"""
+    paths = tuple(os.path.abspath(path) for path in paths)
+    count = 0
+    for fd in os.listdir("/proc/self/fd"):
+        try:
+            count += os.readlink(f"/proc/self/fd/{fd}").startswith(paths)
+        except OSError:
+            pass
+    return count
+
+
+def test_thread_connections_closed_when_thread_ends(app_module):
+    # A pool of its own, so the app's background threads don't count
+    pool = app_module.ConnectionPool()
+    databases = app_module.DATABASE_STUDENTS, app_module.DATABASE_RESULTS
+
+    def request_thread():
+        pool.acquire(app_module.DATABASE_STUDENTS).execute("SELECT COUNT(*) FROM students").fetchone()
+        pool.acquire(app_module.DATABASE_RESULTS).execute("SELECT COUNT(*) FROM results").fetchone()
+
+    fds = open_fds(*databases)
+    for _ in range(50):
+        thread = threading.Thread(target=request_thread)
+        thread.start()
+        thread.join()
+    gc.collect()
+    assert pool.opens == 100
+    assert pool.open_connections() == 0
+    # SQLite keeps one closed connection's descriptor per file for reuse
+    # while other connections of the process hold locks on it; no more
+    assert open_fds(*databases) <= fds + len(databases)
+
+
+def test_connection_reused_within_a_thread(app_module):
+    with app_module.get_db(app_module.DATABASE_STUDENTS) as first:
+        pass
+    with app_module.get_db(app_module.DATABASE_STUDENTS) as second:
+        pass
+    assert first is second
+
+
+@pytest.fixture
+def scratch_db(app_module, tmp_path):
+    path = str(tmp_path / "nested.db")
+    with app_module.get_db(path) as conn:
+        conn.execute("CREATE TABLE t (v TEXT)")
+    yield path
+    app_module.db_pool.discard(path)
+
+
+def values(app_module, path):
+    with app_module.get_db(path) as conn:
+        return sorted(row[0] for row in conn.execute("SELECT v FROM t"))
+
+
+def test_outer_block_owns_the_transaction(app_module, scratch_db):
+    with pytest.raises(RuntimeError):
+        with app_module.get_db(scratch_db) as outer:
+            outer.execute("INSERT INTO t VALUES ('outer')")
+            with app_module.get_db(scratch_db) as inner:
+                inner.execute("INSERT INTO t VALUES ('inner')")
+            raise RuntimeError("outer fails after the inner block finished")
+    assert values(app_module, scratch_db) == []
+
+
+def test_failed_inner_block_undoes_only_its_writes(app_module, scratch_db):
+    with app_module.get_db(scratch_db) as outer:
+        outer.execute("INSERT INTO t VALUES ('outer')")
+        with pytest.raises(RuntimeError):
+            with app_module.get_db(scratch_db) as inner:
+                inner.execute("INSERT INTO t VALUES ('inner')")
+                raise RuntimeError("inner fails")
+        outer.execute("INSERT INTO t VALUES ('after')")
+    assert values(app_module, scratch_db) == ["after", "outer"]
+
+
+def test_inner_write_under_a_read_commits_at_once(app_module, scratch_db):
+    with app_module.get_db(scratch_db) as conn:
+        conn.executemany("INSERT INTO t VALUES (?)", [("a",), ("b",)])
+    other = sqlite3.connect(scratch_db)
+    with app_module.get_db(scratch_db) as outer:
+        rows = outer.execute("SELECT v FROM t")
+        rows.fetchone()
+        with app_module.get_db(scratch_db) as inner:
+            inner.execute("INSERT INTO t VALUES ('progress')")
+        # Another connection sees it while the outer block is still open
+        assert other.execute("SELECT COUNT(*) FROM t WHERE v='progress'").fetchone()[0] == 1
+        rows.fetchall()
+    other.close()
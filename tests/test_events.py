@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+STUDENT = dict(surname="Evented", phone="", attendance="", age=15, sex="F", **{"class": "1C"})
+
+
+@pytest.fixture
+def events(app_module):
+    return app_module.events
+
+
+@pytest.fixture
+def subscribe(events):
+    """subscribe(*topics, last_event_id=None) -> a thread Subscriber, dropped after the test"""
+    made = []
+
+    def make(*topics, last_event_id=None):
+        subscriber = events.broker.subscribe(set(topics), False, last_event_id)
+        made.append(subscriber)
+        return subscriber
+    yield make
+    for subscriber in made:
+        if subscriber is not None:
+            events.broker.unsubscribe(subscriber)
+
+
+def wait_for(subscriber, topic, timeout=5):
+    for _ in range(int(timeout / 0.5)):
+        found = [e for e in subscriber.get(0.5) if e.topic == topic]
+        if found:
+            return found
+    raise AssertionError(f"no {topic} event")
+
+
+def add_student(client, sid):
+    assert client.post("/add_student", json=dict(sid=sid, name=sid, **STUDENT)).get_json()["success"]
+
+
+def test_writes_reach_subscribers_of_their_topic(client, subscribe):
+    students, teachers = subscribe("students"), subscribe("teachers")
+    add_student(client, "EVT01")
+    [event] = wait_for(students, "students")
+    assert json.loads(event.data) == {"action": "added", "student_id": "EVT01"}
+    assert teachers.get(0.2) == []
+
+
+def test_missed_events_are_replayed(client, subscribe, events):
+    watcher = subscribe("students")
+    add_student(client, "EVT02")
+    first = wait_for(watcher, "students")[0].id
+    events.broker.unsubscribe(watcher)
+    add_student(client, "EVT03")
+    add_student(client, "EVT04")
+
+    resumed = subscribe("students", last_event_id=first)
+    replayed = [json.loads(e.data)["student_id"] for e in resumed.get(0)]
+    assert replayed == ["EVT03", "EVT04"]
+
+
+def test_pruned_events_ask_for_a_reload(app_module, client, subscribe, events):
+    add_student(client, "EVT05")
+    with app_module.get_db(app_module.EVENTS_DATABASE) as conn:
+        newest = conn.execute("SELECT MAX(id) FROM events").fetchone()[0]
+        conn.execute("DELETE FROM events WHERE id < ?", (newest,))
+    assert subscribe("students", last_event_id=newest - 2).get(0) == [events.RESET]
+
+
+def test_statistics_follow_writes(client, subscribe, events, monkeypatch):
+    monkeypatch.setattr(events, "STATISTICS_MIN_INTERVAL", 0)
+    index_page = subscribe("statistics")
+    add_student(client, "EVT06")
+    [event] = wait_for(index_page, "statistics")
+    assert json.loads(event.data)["students"] == client.get("/api/statistics").get_json()["statistics"]["students"]
+
+
+def test_a_slow_subscriber_is_reset(events):
+    subscriber = events.Subscriber(frozenset({"students"}), False)
+    subscriber.deliver([events.Event(1, "students", "{}")] * events.SUBSCRIBER_BACKLOG)
+    subscriber.deliver([events.Event(2, "students", "{}")])
+    assert subscriber.get(0) == [events.RESET]
+    assert subscriber.get(0) == []
+
+
+def test_thread_streams_are_capped(client, subscribe, events, monkeypatch):
+    monkeypatch.setattr(events, "THREAD_STREAMS", 1)
+    assert subscribe("statistics") is not None
+    assert subscribe("statistics") is None
+    response = client.get("/events", environ_overrides={"wsgi.multithread": True})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "60"
+
+
+def test_event_stream_over_http(client, events):
+    response = client.get("/events", environ_overrides={"wsgi.multithread": True}, buffered=False)
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert next(response.response).decode().startswith(f"retry: {events.RETRY_MS}\nid: ")
+    assert events.broker.streams()[0] == 1
+    response.close()
+    assert events.broker.streams()[0] == 0
+
+
+def test_event_stream_refusals(client, login):
+    # Single-threaded workers would be tied up by the stream
+    assert client.get("/events").status_code == 503
+    assert client.get("/events?topics=nope").status_code == 400
+    assert client.get("/events?topics=results").status_code == 401
+    assert client.get("/events?topics=results", headers=login("student", "S1")).status_code == 403
+
+
+def test_render(events):
+    assert events.render([events.Event(7, "students", "{}"), events.RESET]) == \
+        "id: 7\nevent: students\ndata: {}\n\nevent: reset\ndata: {}\n\n"
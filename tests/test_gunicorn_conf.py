@@ -0,0 +1,113 @@
+import http.client
+import json
+import os
+import runpy
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from conftest import ROOT
+
+CONF = os.path.join(ROOT, "gunicorn.conf.py")
+
+
+def load_conf(monkeypatch, **env):
+    # The file sets defaults in os.environ; monkeypatch puts them back after
+    for name in ("GUNICORN_THREADS", "GUNICORN_WORKER_CLASS", "EVENTS_THREAD_STREAMS", "SESSION_STORE"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return runpy.run_path(CONF)
+
+
+@pytest.mark.parametrize("threads, streams", [(None, 1), ("2", 1), ("8", 2), ("16", 4)])
+def test_event_streams_leave_most_threads_to_requests(monkeypatch, threads, streams):
+    conf = load_conf(monkeypatch, **({"GUNICORN_THREADS": threads} if threads else {}))
+    assert int(os.environ["EVENTS_THREAD_STREAMS"]) == streams
+    assert streams < conf["threads"]
+
+
+def test_explicit_stream_cap_wins(monkeypatch):
+    load_conf(monkeypatch, EVENTS_THREAD_STREAMS="0")
+    assert os.environ["EVENTS_THREAD_STREAMS"] == "0"
+
+
+@pytest.mark.parametrize("worker_class", ["uvicorn.workers.UvicornWorker", "uvicorn_worker.UvicornWorker"])
+def test_uvicorn_workers_serve_the_asgi_app(monkeypatch, worker_class):
+    assert load_conf(monkeypatch, GUNICORN_WORKER_CLASS=worker_class)["wsgi_app"] == "asgi:application"
+    assert load_conf(monkeypatch)["wsgi_app"] == "app:app"
+
+
+def test_production_profile(monkeypatch):
+    conf = load_conf(monkeypatch, WEB_CONCURRENCY="3", GUNICORN_MAX_REQUESTS="500")
+    assert (conf["workers"], conf["preload_app"]) == (3, True)
+    assert (conf["max_requests"], conf["max_requests_jitter"]) == (500, 50)
+    # Sessions have to be visible to every worker
+    assert os.environ["SESSION_STORE"] == "sqlite"
+
+
+def test_hooks_leave_an_app_that_was_not_preloaded_alone(monkeypatch):
+    monkeypatch.delitem(sys.modules, "app", raising=False)
+    conf = load_conf(monkeypatch)
+    conf["pre_fork"](None, None)
+    conf["post_fork"](None, None)
+    assert "app" not in sys.modules
+
+
+def test_fork_hooks_close_and_warm(monkeypatch, app_module):
+    conf = load_conf(monkeypatch)
+    with app_module.get_db(app_module.DATABASE_RESULTS):
+        pass
+    conf["pre_fork"](None, None)
+    assert app_module.db_pool.open_connections() == 0
+
+    app_module.invalidate_statistics()
+    # post_fork runs on the new worker's main thread
+    worker = threading.Thread(target=conf["post_fork"], args=(None, None))
+    worker.start()
+    worker.join()
+    assert app_module._stats_cache["expires"] > 0
+    assert app_module.jobs.stats()["threads"] > 0
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get_json(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request("GET", path)
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def test_gunicorn_serves_from_forked_workers(tmp_path):
+    pytest.importorskip("gunicorn")
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=ROOT, BIND=f"127.0.0.1:{port}", WEB_CONCURRENCY="2", LOG_LEVEL="WARNING",
+               ASSET_BUILD_DIR=str(tmp_path / "assets"), GUNICORN_PIDFILE=str(tmp_path / "gunicorn.pid"))
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", CONF], cwd=tmp_path, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        deadline = time.monotonic() + 30
+        pids = set()
+        while len(pids) < 2 and time.monotonic() < deadline:
+            try:
+                assert get_json(port, "/api/statistics")["success"]
+                pids.add(get_json(port, "/debug/cache")["pid"])
+            except (ConnectionError, OSError):
+                assert server.poll() is None, server.stderr.read().decode()
+                time.sleep(0.2)
+        assert len(pids) == 2
+        assert server.pid not in pids
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
@@ -0,0 +1,64 @@
+import json
+import threading
+
+import credentials
+
+
+def test_teacher_import_stores_full_strength_hashes(client, app_module):
+    csv = "tid,name,password\n" + "".join(f"IMPT{i},Ann,pw{i}\n" for i in range(10)) + "IMPT1,Dup,x\n"
+    body = client.post("/import/teachers", data=csv, content_type="text/csv").get_json()
+    assert body["success"] and body["inserted"] == 10 and body["duplicates"] == 1
+
+    def stored():
+        with app_module.get_db(app_module.DATABASE_TEACHERS) as conn:
+            return conn.execute("SELECT password FROM teachers WHERE teacher_id='IMPT7'").fetchone()[0]
+
+    hashed = stored()
+    assert hashed.startswith(f"pbkdf2_sha256${credentials.ITERATIONS}$")
+    assert not client.post("/teacher_login", json={"teacherId": "IMPT7", "password": "nope"}).get_json()["success"]
+    assert client.post("/teacher_login", json={"teacherId": "IMPT7", "password": "pw7"}).get_json()["success"]
+    # Nothing left to upgrade
+    assert stored() == hashed
+
+
+def test_batch_hashing_holds_queue_slots(monkeypatch):
+    """make_passwords keeps at most BATCH_WORKERS hashes in flight, each in a login queue slot"""
+    in_flight, peak, lock = [0], [0], threading.Lock()
+    real_hash = credentials.hash_password
+
+    def counting_hash(password, iterations=None):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        try:
+            return real_hash(password, 1000)
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    monkeypatch.setattr(credentials, "hash_password", counting_hash)
+    hashed = credentials.make_passwords([f"pw{i}" for i in range(20)])
+    assert [credentials.check_password(f"pw{i}", h)[0] for i, h in enumerate(hashed)] == [True] * 20
+    assert peak[0] <= credentials.BATCH_WORKERS
+
+    # Every slot was given back
+    taken = [credentials._slots.acquire(blocking=False) for _ in range(credentials.HASH_QUEUE_LIMIT)]
+    for _ in filter(None, taken):
+        credentials._slots.release()
+    assert all(taken)
+
+
+def test_student_import_reports_progress_and_errors(client):
+    csv = "Student ID,Name\n" + "".join(f"imps{i},Bo\n" for i in range(1500)) + ",NoId\n"
+    response = client.post("/import/students", data=csv, content_type="text/csv",
+                           headers={"Accept": "application/x-ndjson"})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[0]["processed"] >= 1000 and not lines[0].get("done")
+    assert lines[-1]["done"] and lines[-1]["inserted"] == 1500 and lines[-1]["errors"] == 1
+    # IDs are normalized on the way in
+    assert client.get("/get_students?fields=student_id&limit=500").status_code == 200
+
+
+def test_import_rejects_empty_file(client):
+    response = client.post("/import/students", data="", content_type="text/csv")
+    assert response.status_code == 400
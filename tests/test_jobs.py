@@ -0,0 +1,131 @@
+import io
+import threading
+import time
+import zipfile
+
+import pytest
+
+release = threading.Event()
+
+
+@pytest.fixture(scope="module")
+def jobs(app_module):
+    jobs = app_module.jobs
+
+    @jobs.task("test_echo")
+    def echo(job):
+        return {"echo": job.args}
+
+    @jobs.task("test_flaky", attempts=2, retry_delay=0)
+    def flaky(job):
+        if job.attempt == 1:
+            raise RuntimeError("first try fails")
+        return {"attempt": job.attempt}
+
+    @jobs.task("test_broken", attempts=2, retry_delay=0)
+    def broken(job):
+        raise RuntimeError("always fails")
+
+    @jobs.task("test_blocking", concurrency=1)
+    def blocking(job):
+        while not release.wait(0.05):
+            job.progress(0, 1)
+        return {}
+
+    yield jobs
+    release.set()
+
+
+def wait_for_status(jobs, job_id, status, timeout=10):
+    deadline = time.monotonic() + timeout
+    while jobs.get(job_id)["status"] != status and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return jobs.get(job_id)
+
+
+def test_job_runs_and_reports_its_result(client, login, jobs, wait_for_job):
+    job = wait_for_job(jobs.enqueue("test_echo", {"n": 1})["id"])
+    assert job["status"] == "done"
+    assert job["result"] == {"echo": {"n": 1}}
+    assert job["attempts"] == 1
+
+    listed = client.get("/jobs?kind=test_echo", headers=login("admin", "ADMIN1")).get_json()["jobs"]
+    assert job["id"] in [j["id"] for j in listed]
+
+
+def test_failed_try_is_retried(jobs, wait_for_job):
+    job = wait_for_job(jobs.enqueue("test_flaky", {})["id"])
+    assert job["status"] == "done"
+    assert job["attempts"] == 2
+    assert job["result"] == {"attempt": 2}
+
+
+def test_job_fails_once_out_of_attempts(jobs, wait_for_job):
+    job = wait_for_job(jobs.enqueue("test_broken", {})["id"])
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    assert job["error"] == "always fails"
+
+
+def test_identical_jobs_are_queued_once_and_kind_concurrency_holds(jobs, wait_for_job):
+    release.clear()
+    try:
+        first = wait_for_status(jobs, jobs.enqueue("test_blocking", {"n": 1})["id"], "running")
+        assert first["status"] == "running"
+        assert jobs.enqueue("test_blocking", {"n": 1})["id"] == first["id"]
+
+        second = jobs.enqueue("test_blocking", {"n": 2})
+        time.sleep(0.5)
+        assert jobs.get(second["id"])["status"] == "queued"
+    finally:
+        release.set()
+    assert wait_for_job(first["id"])["status"] == "done"
+    assert wait_for_job(second["id"])["status"] == "done"
+
+
+def test_cancel_queued_and_running_jobs(client, login, jobs, wait_for_job):
+    admin = login("admin", "ADMIN1")
+    release.clear()
+    try:
+        running = wait_for_status(jobs, jobs.enqueue("test_blocking", {"n": 3})["id"], "running")
+        queued = jobs.enqueue("test_blocking", {"n": 4})
+
+        cancelled = client.post(f"/jobs/{queued['id']}/cancel", headers=admin).get_json()
+        assert cancelled["status"] == "cancelled"
+
+        cancelling = client.post(f"/jobs/{running['id']}/cancel", headers=admin).get_json()
+        assert cancelling["status"] == "running" and cancelling["cancelling"]
+        assert wait_for_job(running["id"])["status"] == "cancelled"
+    finally:
+        release.set()
+
+
+def test_job_routes_need_an_admin(client, login, jobs):
+    job = jobs.enqueue("test_echo", {"n": 2})
+    assert client.get(f"/jobs/{job['id']}").status_code == 401
+    assert client.get(f"/jobs/{job['id']}", headers=login("teacher", "T1")).status_code == 403
+    assert client.get("/jobs/nope", headers=login("admin", "ADMIN1")).status_code == 404
+
+
+def test_report_cards_job_and_download(client, login, add_result, wait_for_job):
+    for student_id, marks in (("RC1", 80), ("RC2", 60)):
+        add_result(student_id, form="Form 9J", year=2031, term="1", marks=marks)
+    admin = login("admin", "ADMIN1")
+
+    response = client.post("/reports/report_cards", headers=admin,
+                           json={"form": "Form 9J", "year": 2031, "term": "1"})
+    assert response.status_code == 202
+    job = wait_for_job(response.get_json()["id"], timeout=60)
+    assert job["status"] == "done", job
+    assert job["result"]["cards"] == 2
+    assert job["download"] == response.headers["Location"] + "/download"
+
+    download = client.get(job["download"], headers=admin)
+    assert download.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(download.data)) as archive:
+        assert sorted(archive.namelist()) == ["RC1.html", "RC2.html", "index.html"]
+
+
+def test_report_cards_need_form_year_and_term(client, login):
+    response = client.post("/reports/report_cards", headers=login("admin", "ADMIN1"), json={"form": "Form 9J"})
+    assert response.status_code == 400
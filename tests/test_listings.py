@@ -0,0 +1,75 @@
+import os
+import re
+
+import pytest
+
+
+@pytest.fixture
+def accounts(app_module):
+    # A teacher that hasn't logged in since hashing (plaintext) and a hashed student
+    with app_module.get_db(app_module.DATABASE_TEACHERS) as conn:
+        conn.execute("INSERT OR IGNORE INTO teachers (teacher_id, name, password) VALUES ('LIST_T1', 'Ann', 'tpass')")
+    with app_module.get_db(app_module.DATABASE_STUDENTS) as conn:
+        conn.execute("INSERT OR IGNORE INTO students (student_id, name, password) VALUES ('LIST_S1', 'Bo', ?)",
+                     (app_module.hash_password("spass"),))
+    app_module.data_changed("teachers", "students")
+
+
+@pytest.mark.parametrize("url", [
+    "/get_teachers", "/get_teachers?limit=500", "/debug/teachers",
+    "/get_students", "/get_students?limit=500", "/debug/students",
+])
+def test_listings_never_include_passwords(client, accounts, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    body = response.get_json()
+    rows = body if isinstance(body, list) else body["data"]
+    assert rows
+    assert all("password" not in row for row in rows)
+    assert b"tpass" not in response.data and b"pbkdf2" not in response.data
+
+
+@pytest.mark.parametrize("url", ["/get_teachers", "/get_students", "/debug/teachers"])
+def test_password_is_not_a_field(client, accounts, url):
+    response = client.get(url + "?fields=id,password&limit=10")
+    assert response.status_code in (200, 400)
+    assert b"tpass" not in response.data and b"pbkdf2" not in response.data
+
+
+def test_fields_projection(client, accounts):
+    body = client.get("/get_teachers?fields=teacher_id&limit=500").get_json()
+    assert {"id", "teacher_id"} == set(body["data"][0])
+    assert "LIST_T1" in [row["teacher_id"] for row in body["data"]]
+
+
+def test_keyset_pages_cover_the_table(client, app_module):
+    with app_module.get_db(app_module.DATABASE_STUDENTS) as conn:
+        conn.executemany("INSERT OR IGNORE INTO students (student_id, name) VALUES (?, 'P')",
+                         [(f"PAGE{i:03d}",) for i in range(25)])
+    app_module.data_changed("students")
+    seen, cursor = [], None
+    while True:
+        body = client.get("/get_students?limit=10" + (f"&cursor={cursor}" if cursor else "")).get_json()
+        seen += [row["id"] for row in body["data"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert seen == sorted(set(seen))
+    assert len(seen) == len(client.get("/get_students").get_json())
+
+
+def dashboard_listings():
+    """(path, fields) of every listing admin_dashboard.js asks for"""
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "admin", "static", "admin_dashboard.js")
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    return re.findall(r'"(/get_\w+)\?limit=" \+ PAGE_SIZE \+\s*"&fields=([\w,]+)"', source)
+
+
+def test_dashboard_listing_queries(client, accounts):
+    listings = dashboard_listings()
+    assert {path for path, _ in listings} == {"/get_students", "/get_teachers"}
+    for path, fields in listings:
+        response = client.get(f"{path}?limit=50&fields={fields}")
+        assert response.status_code == 200, response.get_json()
+        assert response.get_json()["data"]
@@ -0,0 +1,64 @@
+import json
+import logging
+import queue
+import re
+
+import logs
+
+
+def test_setup_leaves_logging_module_defaults_alone(app_module):
+    # Other libraries' records keep their caller, thread and process fields
+    assert logging._srcfile is not None
+    assert logging.logThreads and logging.logProcesses and logging.logMultiprocessing
+    record = logging.getLogger("some.library").makeRecord("some.library", logging.INFO, __file__, 7, "m", (), None)
+    assert record.threadName and record.lineno == 7
+
+
+def make_record(msg="m", **extra):
+    return logging.getLogger("school.test").makeRecord("school.test", logging.INFO, __file__, 1, msg, (), None,
+                                                       extra=extra)
+
+
+def test_credentials_are_redacted_before_formatting():
+    record = make_record(password="hunter2", body={"name": "Rudo", "Token": "abc", "rows": [{"secret": "s"}]})
+    assert logs.RedactFilter().filter(record)
+    entry = json.loads(logs.JsonFormatter().format(record))
+    assert entry["password"] == logs.REDACTED
+    assert entry["body"] == {"name": "Rudo", "Token": logs.REDACTED, "rows": [{"secret": logs.REDACTED}]}
+    assert "hunter2" not in json.dumps(entry) and "abc" not in json.dumps(entry)
+
+
+def test_sampled_records_are_thinned_per_logger():
+    sample = logs.SampleFilter(5)
+    kept = [sample.filter(make_record(sampled=True)) for _ in range(20)]
+    assert kept.count(True) == 4
+    assert all(sample.filter(make_record()) for _ in range(5))
+
+    record = make_record(sampled=True)
+    other = logging.getLogger("school.other").makeRecord("school.other", logging.INFO, __file__, 1, "m", (), None,
+                                                         extra={"sampled": True})
+    assert logs.SampleFilter(5).filter(other) and sample.filter(record)
+    assert record.sample_rate == 5
+
+
+def test_a_full_queue_drops_instead_of_blocking(monkeypatch):
+    monkeypatch.setattr(logs, "_ensure_listener", lambda: None)
+    handler = logs.NonBlockingQueueHandler(queue.Queue(1))
+    handler.handle(make_record("first"))
+    handler.handle(make_record("second"))
+    assert handler.dropped == 1
+    assert handler.queue.get_nowait().message == "first"
+
+
+def test_request_ids_are_echoed_or_made_up(client):
+    assert client.get("/api/statistics", headers={"X-Request-ID": "abc-123"}).headers["X-Request-ID"] == "abc-123"
+    for sent in ({}, {"X-Request-ID": "no spaces allowed"}):
+        assert re.fullmatch(r"[0-9a-f]{16}", client.get("/api/statistics", headers=sent).headers["X-Request-ID"])
+
+
+def test_records_carry_the_request_id(app_module):
+    with app_module.app.test_request_context(headers={"X-Request-ID": "req-7"}):
+        app_module.app.preprocess_request()
+        record = make_record()
+        logs.RequestContextFilter().filter(record)
+    assert record.request_id == "req-7"
@@ -0,0 +1,70 @@
+import re
+
+import metrics
+
+SAMPLE = re.compile(r"^(\w+)(?:\{(.*)\})? (\S+)$")
+
+
+def get(client, url):
+    # Stats are recorded when the body has been sent, i.e. on close
+    client.get(url).close()
+
+
+def scrape(client):
+    """{(name, labels): value} from /metrics"""
+    response = client.get("/metrics")
+    assert response.mimetype == "text/plain"
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line.startswith("#"):
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        samples[name, labels or ""] = float(value)
+    return samples
+
+
+def route_series(samples, name, route):
+    return {labels: value for (n, labels), value in samples.items() if n == name and f'route="{route}"' in labels}
+
+
+def bucket_bound(labels):
+    bound = re.search(r'le="([^"]+)"', labels).group(1)
+    return float("inf") if bound == "+Inf" else float(bound)
+
+
+def test_requests_are_counted_by_route_template_and_status(client):
+    before = scrape(client)
+    get(client, "/get_result/999999991")
+    get(client, "/get_result/999999992")
+    after = scrape(client)
+
+    key = ("school_http_requests_total", 'route="/get_result/<int:id>",method="GET",status="404"')
+    assert after[key] - before.get(key, 0) == 2
+    assert not any("999999991" in labels for _, labels in after)
+
+
+def test_histograms_are_cumulative_and_count_db_work(client):
+    get(client, "/get_result/999999993")
+    samples = scrape(client)
+    for name in ("school_http_request_duration_seconds", "school_db_queries_per_request",
+                 "school_db_seconds_per_request"):
+        series = route_series(samples, name + "_bucket", "/get_result/<int:id>")
+        counts = [value for _, value in sorted(series.items(), key=lambda item: bucket_bound(item[0]))]
+        assert counts == sorted(counts) and counts[-1] > 0
+        [total] = route_series(samples, name + "_count", "/get_result/<int:id>").values()
+        assert total == counts[-1]
+
+    # Every lookup runs at least one statement, so the zero-queries bucket stays empty
+    zero = route_series(samples, "school_db_queries_per_request_bucket", "/get_result/<int:id>")
+    assert [value for labels, value in zero.items() if 'le="0"' in labels] == [0]
+
+
+def test_internal_gauges_are_exported(client):
+    samples = scrape(client)
+    names = {name for name, _ in samples}
+    assert {"school_db_pool_connections", "school_response_cache_hits_total", "school_jobs_running",
+            "school_http_requests_in_flight", "school_process_start_time_seconds"} <= names
+
+
+def test_label_values_are_escaped():
+    assert metrics._labels(("route",), ('/a"b\\c\n',)) == '{route="/a\\"b\\\\c\\n"}'
@@ -0,0 +1,150 @@
+"""run_migrations() on database files as the original app left them"""
+import sqlite3
+
+import pytest
+
+# The tables as the first release of app.py created them
+BASELINE_TABLES = {
+    "students": """
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT UNIQUE,
+            name TEXT,
+            surname TEXT,
+            class TEXT,
+            phone TEXT,
+            attendance TEXT,
+            age INTEGER,
+            sex TEXT,
+            password TEXT DEFAULT NULL,
+            email TEXT,
+            address TEXT,
+            guardian_name TEXT,
+            guardian_phone TEXT,
+            date_of_birth TEXT,
+            enrollment_date TEXT DEFAULT (date('now'))
+        )
+    """,
+    "teachers": """
+        CREATE TABLE IF NOT EXISTS teachers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            teacher_id TEXT UNIQUE,
+            name TEXT,
+            surname TEXT,
+            class TEXT,
+            phone TEXT,
+            password TEXT,
+            role TEXT
+        )
+    """,
+    "results": """
+        CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT,
+            student_name TEXT,
+            form TEXT,
+            level TEXT,
+            subject TEXT,
+            term TEXT,
+            year INTEGER,
+            exam_type TEXT,
+            exam_date TEXT,
+            marks INTEGER,
+            grade TEXT,
+            status TEXT,
+            comment TEXT,
+            teacher_id TEXT,
+            created_at TEXT DEFAULT (datetime('now')),
+            UNIQUE(student_id, subject, term, year, exam_type)
+        )
+    """,
+}
+
+
+def make_baseline(paths):
+    for component, path in paths.items():
+        conn = sqlite3.connect(path)
+        conn.execute(BASELINE_TABLES[component])
+        if component == "students":
+            conn.executemany("INSERT INTO students (student_id, name, surname, class) VALUES (?, ?, ?, ?)",
+                             [(" s001", "Tariro", "Moyo", "1A"), ("S002", "Kuda", "Ncube", "1B")])
+        elif component == "teachers":
+            conn.execute("INSERT INTO teachers (teacher_id, name, password) VALUES ('T100', 'Mr. Phiri', 'pw')")
+        else:
+            conn.executemany("""
+                INSERT INTO results (student_id, form, subject, term, year, marks, status)
+                VALUES (?, 'Form 1', ?, '1', 2024, ?, ?)
+            """, [("s001 ", "Maths", 80, "Pass"), ("s001 ", "English", 40, "Fail"), ("S002", "Maths", 65, "Pass")])
+        conn.commit()
+        conn.close()
+
+
+@pytest.fixture(params=["separate", "single"])
+def baseline_paths(request, tmp_path):
+    if request.param == "single":
+        paths = dict.fromkeys(BASELINE_TABLES, str(tmp_path / "school.db"))
+    else:
+        paths = {component: str(tmp_path / f"{component}.db") for component in BASELINE_TABLES}
+    make_baseline(paths)
+    return paths
+
+
+def test_baseline_files_reach_the_latest_version(app_module, baseline_paths):
+    applied = app_module.run_migrations(baseline_paths)
+    assert len(applied) == sum(len(steps) for steps in app_module.MIGRATIONS.values())
+    for component, path in baseline_paths.items():
+        conn = sqlite3.connect(path)
+        version = conn.execute("SELECT version FROM schema_version WHERE component=?", (component,)).fetchone()[0]
+        assert version == len(app_module.MIGRATIONS[component])
+        conn.close()
+
+    assert app_module.run_migrations(baseline_paths) == []
+
+
+def test_migrated_data(app_module, baseline_paths):
+    app_module.run_migrations(baseline_paths)
+    students = sqlite3.connect(baseline_paths["students"])
+    results = sqlite3.connect(baseline_paths["results"])
+    teachers = sqlite3.connect(baseline_paths["teachers"])
+
+    assert [r[0] for r in students.execute("SELECT student_id FROM students ORDER BY id")] == ["S001", "S002"]
+    assert {r[0] for r in results.execute("SELECT student_id FROM results")} == {"S001", "S002"}
+
+    stats = dict(students.execute("SELECT name, value FROM stats"))
+    stats.update(teachers.execute("SELECT name, value FROM stats"))
+    assert stats["students"] == 2 and stats["teachers"] == 1
+    assert dict(results.execute("SELECT subject, n FROM subject_counts")) == {"Maths": 2, "English": 1}
+
+    summary = results.execute("""
+        SELECT total_subjects, total_marks, passed, best_subject, weak_subject
+        FROM student_summary WHERE student_id='S001' AND year=2024 AND term='1'
+    """).fetchone()
+    assert summary == (2, 120, 1, "Maths", "English")
+
+    unsequenced = results.execute("SELECT COUNT(*) FROM results WHERE change_seq IS NULL OR change_seq <> id")
+    assert unsequenced.fetchone()[0] == 0
+    assert results.execute("SELECT value FROM sequences WHERE name='results'").fetchone()[0] == 3
+
+
+def test_migrated_triggers_keep_counts_and_change_seq(app_module, baseline_paths):
+    app_module.run_migrations(baseline_paths)
+    with app_module.get_db(baseline_paths["results"]) as conn:
+        conn.execute("""
+            INSERT INTO results (student_id, form, subject, term, year, marks)
+            VALUES ('S002', 'Form 1', 'English', '1', 2024, 55)
+        """)
+        conn.execute("DELETE FROM results WHERE student_id='S001' AND subject='Maths'")
+
+        assert dict(conn.execute("SELECT subject, n FROM subject_counts")) == {"Maths": 1, "English": 2}
+        assert conn.execute("SELECT change_seq FROM results WHERE id=4").fetchone()[0] == 4
+        assert [tuple(r) for r in conn.execute("SELECT id, change_seq FROM results_deleted")] == [(1, 5)]
+        assert conn.execute("SELECT value FROM sequences WHERE name='results'").fetchone()[0] == 5
+
+
+def test_migrated_students_are_searchable(app_module, baseline_paths):
+    app_module.run_migrations(baseline_paths)
+    with app_module.get_db(baseline_paths["students"]) as conn:
+        if not app_module.fts5_available(conn):
+            pytest.skip("SQLite built without FTS5")
+        rows = conn.execute("SELECT rowid FROM students_fts WHERE students_fts MATCH 'tar*'").fetchall()
+    assert [r[0] for r in rows] == [1]
@@ -0,0 +1,39 @@
+def test_student_cannot_read_another_students_cached_results(client, login, add_result):
+    add_result("CACHE1", marks=91)
+    teacher = login("teacher", "T1")
+    assert client.get("/student_results/CACHE1", headers=teacher).status_code == 200
+
+    # The teacher's answer is now cached under this URL
+    other_student = login("student", "CACHE2")
+    response = client.get("/student_results/CACHE1", headers=other_student)
+    assert response.status_code == 403
+    assert "results" not in response.get_json()
+
+
+def test_student_reads_own_results(client, login, add_result):
+    add_result("CACHE3", marks=64)
+    response = client.get("/student_results/cache3", headers=login("student", "CACHE3"))
+    assert response.status_code == 200
+    assert [r["marks"] for r in response.get_json()["results"]] == [64]
+
+
+def test_results_need_a_session(client, add_result):
+    add_result("CACHE4")
+    assert client.get("/student_results/CACHE4").status_code == 401
+
+
+def test_cached_answer_is_dropped_on_write(client, login, add_result):
+    teacher = login("teacher", "T1")
+    add_result("CACHE5", marks=50)
+    first = client.get("/student_results/CACHE5", headers=teacher)
+    add_result("CACHE5", subject="English", marks=80)
+    second = client.get("/student_results/CACHE5", headers=teacher)
+    assert len(second.get_json()["results"]) == len(first.get_json()["results"]) + 1
+
+
+def test_etag_revalidation(client, login, add_result):
+    teacher = login("teacher", "T1")
+    add_result("CACHE6")
+    etag = client.get("/student_results/CACHE6", headers=teacher).headers["ETag"]
+    response = client.get("/student_results/CACHE6", headers=dict(teacher, **{"If-None-Match": etag}))
+    assert response.status_code == 304
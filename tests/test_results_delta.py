@@ -0,0 +1,73 @@
+def latest_seq(client):
+    return client.get("/get_results?limit=1").get_json()["seq"]
+
+
+def delta(client, since, form="Form Delta"):
+    return client.get(f"/get_results?since={since}&form={form}").get_json()
+
+
+def test_delta_carries_new_changed_and_deleted_rows(client, add_result):
+    start = latest_seq(client)
+    add_result("DELTA1", form="Form Delta", marks=50)
+    add_result("DELTA2", form="Form Delta", marks=60)
+    add_result("DELTA3", form="Form Other")
+
+    first = delta(client, start)
+    assert first["reset"] is False
+    assert [row["student_id"] for row in first["data"]] == ["DELTA1", "DELTA2"]
+    assert first["seq"] > start
+
+    add_result("DELTA1", form="Form Delta", marks=75)
+    second = delta(client, first["seq"])
+    assert [(row["student_id"], row["marks"]) for row in second["data"]] == [("DELTA1", 75)]
+    # Saving over a result replaces its row
+    assert second["deleted"] == [first["data"][0]["id"]]
+
+    deleted_id = second["data"][0]["id"]
+    assert client.delete(f"/delete_result/{deleted_id}").get_json()["ok"]
+    third = delta(client, second["seq"])
+    assert third["data"] == []
+    assert third["deleted"] == [deleted_id]
+
+    assert delta(client, third["seq"]) == {"data": [], "deleted": [], "seq": third["seq"], "reset": False}
+
+
+def test_delta_from_the_future_resets(client):
+    assert delta(client, latest_seq(client) + 100)["reset"] is True
+
+
+def test_since_must_be_a_number(client):
+    assert client.get("/get_results?since=yesterday").status_code == 400
+
+
+def test_single_result(client, add_result):
+    add_result("DELTA4", form="Form Delta", marks=33)
+    row = delta(client, 0)["data"][-1]
+    assert client.get(f"/get_result/{row['id']}").get_json()["data"]["marks"] == 33
+    assert client.get("/get_result/999999999").status_code == 404
+
+
+def write_elsewhere(app_module, sql, params=()):
+    """A write made by another worker: this worker's cache isn't told"""
+    with app_module.get_db(app_module.DATABASE_RESULTS) as conn:
+        conn.execute(sql, params)
+
+
+def test_cached_delta_sees_other_workers_writes(client, app_module, add_result):
+    add_result("DELTA5", form="Form Elsewhere", marks=10)
+    seq = latest_seq(client)
+    assert delta(client, seq, form="Form Elsewhere")["data"] == []
+
+    write_elsewhere(app_module, "UPDATE results SET marks=11 WHERE student_id='DELTA5'")
+    assert [row["marks"] for row in delta(client, seq, form="Form Elsewhere")["data"]] == [11]
+
+
+def test_cached_result_sees_other_workers_writes(client, app_module, add_result):
+    add_result("DELTA6", form="Form Elsewhere", marks=20)
+    row = delta(client, 0, form="Form Elsewhere")["data"][-1]
+    assert client.get(f"/get_result/{row['id']}").get_json()["data"]["marks"] == 20
+
+    write_elsewhere(app_module, "UPDATE results SET marks=21 WHERE id=?", (row["id"],))
+    assert client.get(f"/get_result/{row['id']}").get_json()["data"]["marks"] == 21
+    write_elsewhere(app_module, "DELETE FROM results WHERE id=?", (row["id"],))
+    assert client.get(f"/get_result/{row['id']}").status_code == 404
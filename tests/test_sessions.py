@@ -0,0 +1,38 @@
+def admin_login(client, password="admin123"):
+    return client.post("/admin_login", json={"adminId": "A001", "password": password}).get_json()
+
+
+def test_login_token_opens_a_session(client):
+    token = admin_login(client)["token"]
+    session = client.get("/session", headers={"Authorization": "Bearer " + token}).get_json()
+    assert (session["role"], session["id"]) == ("admin", "A001")
+
+
+def test_login_sets_the_session_cookie(app_module):
+    browser = app_module.app.test_client()
+    admin_login(browser)
+    assert browser.get("/session").get_json()["role"] == "admin"
+    assert app_module.app.test_client().get("/session").status_code == 401
+
+
+def test_wrong_password_gets_no_token(client):
+    body = admin_login(client, password="nope")
+    assert body["success"] is False
+    assert "token" not in body
+
+
+def test_tampered_token_is_refused(client, login):
+    token = login("admin", "A001")["Authorization"]
+    sid, _, mac = token.partition(".")
+    forged = sid + "." + ("A" if mac[0] != "A" else "B") + mac[1:]
+    assert client.get("/session", headers={"Authorization": forged}).status_code == 401
+
+    other_sid = login("admin", "A002")["Authorization"].partition(".")[0]
+    assert client.get("/session", headers={"Authorization": other_sid + "." + mac}).status_code == 401
+
+
+def test_logout_ends_the_session(client):
+    headers = {"Authorization": "Bearer " + admin_login(client)["token"]}
+    assert client.get("/session", headers=headers).status_code == 200
+    assert client.post("/logout", headers=headers).get_json()["success"]
+    assert client.get("/session", headers=headers).status_code == 401
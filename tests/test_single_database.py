@@ -0,0 +1,75 @@
+"""flask merge-databases and the results -> students foreign key it brings"""
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def merge(app_module, tmp_path):
+    """merge(*options) -> (cli result, target path) for a fresh target file"""
+    runner = app_module.app.test_cli_runner()
+    targets = []
+
+    def run(*options):
+        target = str(tmp_path / f"school{len(targets)}.db")
+        targets.append(target)
+        return runner.invoke(args=["merge-databases", target, *options]), target
+    yield run
+    for target in targets:
+        app_module.db_pool.discard(target)
+
+
+def test_orphan_results_stop_the_merge(add_result, merge, tmp_path):
+    add_result("NOSUCH01")
+    result, target = merge()
+    assert result.exit_code != 0
+    assert "--drop-orphans" in result.output
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_merged_file_has_every_student_and_teacher(app_module, client, add_result, merge):
+    client.post("/add_student", json=dict(sid="MERGE01", name="Rudo", surname="Merged", phone="",
+                                          attendance="", age=16, sex="F", **{"class": "4A"}))
+    add_result("MERGE01", subject="Maths", marks=64)
+    add_result("NOSUCH02")
+    result, target = merge("--drop-orphans")
+    assert result.exit_code == 0, result.output
+
+    merged = sqlite3.connect(target)
+    for table, path in (("students", app_module.DATABASE_STUDENTS), ("teachers", app_module.DATABASE_TEACHERS)):
+        with app_module.get_db(path) as conn:
+            source = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        assert merged.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == source
+    assert merged.execute("SELECT marks FROM results WHERE student_id='MERGE01'").fetchone() == (64,)
+    assert merged.execute("SELECT COUNT(*) FROM results WHERE student_id='NOSUCH02'").fetchone() == (0,)
+    assert merged.execute("""
+        SELECT total_marks FROM student_summary WHERE student_id='MERGE01' AND year=2025 AND term='1'
+    """).fetchone() == (64,)
+    merged.close()
+
+
+def test_foreign_key_in_the_merged_file(app_module, merge):
+    result, target = merge("--drop-orphans")
+    assert result.exit_code == 0, result.output
+    with app_module.get_db(target) as conn:
+        conn.execute("INSERT INTO students (student_id, name) VALUES ('FK01', 'Keyed')")
+        conn.execute("INSERT INTO results (student_id, subject, term, year, marks) VALUES ('FK01', 'Art', '1', 2025, 50)")
+
+    with pytest.raises(sqlite3.IntegrityError):
+        with app_module.get_db(target) as conn:
+            conn.execute("INSERT INTO results (student_id, subject, term, year) VALUES ('FK02', 'Art', '1', 2025)")
+
+    # A corrected student ID carries the results along; deleting the student takes them
+    with app_module.get_db(target) as conn:
+        conn.execute("UPDATE students SET student_id='FK03' WHERE student_id='FK01'")
+        assert [r[0] for r in conn.execute("SELECT student_id FROM results WHERE subject='Art'")] == ["FK03"]
+        conn.execute("DELETE FROM students WHERE student_id='FK03'")
+        assert conn.execute("SELECT COUNT(*) FROM results WHERE subject='Art'").fetchone()[0] == 0
+
+
+def test_merge_refuses_an_existing_file(app_module, tmp_path):
+    target = tmp_path / "school.db"
+    target.write_bytes(b"")
+    result = app_module.app.test_cli_runner().invoke(args=["merge-databases", str(target)])
+    assert result.exit_code != 0
+    assert "already exists" in result.output
@@ -0,0 +1,57 @@
+import time
+
+STUDENT = dict(surname="Counter", phone="", attendance="", age=14, sex="M", **{"class": "2B"})
+
+
+def statistics(client):
+    return client.get("/api/statistics").get_json()["statistics"]
+
+
+def stored_counts(app_module):
+    with app_module.get_db(app_module.DATABASE_STUDENTS) as conn:
+        return (conn.execute("SELECT value FROM stats WHERE name='students'").fetchone()[0],
+                conn.execute("SELECT COUNT(*) FROM students").fetchone()[0])
+
+
+def test_counts_follow_adds_and_deletes(client, app_module):
+    before = statistics(client)["students"]
+    for sid in ("STAT01", "STAT02"):
+        assert client.post("/add_student", json=dict(sid=sid, name=sid, **STUDENT)).get_json()["success"]
+    assert statistics(client)["students"] == before + 2
+
+    with app_module.get_db(app_module.DATABASE_STUDENTS) as conn:
+        row_id = conn.execute("SELECT id FROM students WHERE student_id='STAT01'").fetchone()[0]
+    client.delete(f"/delete_student/{row_id}")
+    assert statistics(client)["students"] == before + 1
+
+    counter, rows = stored_counts(app_module)
+    assert counter == rows
+
+
+def test_subjects_are_counted_once(client, add_result):
+    add_result("STAT03", subject="Maths")
+    # (an empty results table shows a default of 15)
+    before = statistics(client)["subjects"]
+    add_result("STAT03", subject="Statistics Ag")
+    add_result("STAT04", subject="Statistics Ag")
+    assert statistics(client)["subjects"] == before + 1
+
+
+def test_other_workers_writes_show_after_the_ttl(client, app_module, monkeypatch):
+    before = statistics(client)["teachers"]
+    # Not through data_changed(), as if another worker had written it
+    with app_module.get_db(app_module.DATABASE_TEACHERS) as conn:
+        conn.execute("INSERT INTO teachers (teacher_id, name) VALUES ('STAT05', 'Elsewhere')")
+    assert statistics(client)["teachers"] == before
+
+    later = time.monotonic() + app_module.STATS_CACHE_TTL + 1
+    monkeypatch.setattr(app_module.time, "monotonic", lambda: later)
+    assert statistics(client)["teachers"] == before + 1
+
+
+def test_unchanged_statistics_get_a_304(client):
+    first = client.get("/api/statistics")
+    assert first.headers["Cache-Control"] == "no-cache"
+    again = client.get("/api/statistics", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.get_data() == b""
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+SUBJECTS = ["Maths", "English", "Physics", "History", "Geography"]
+
+
+@pytest.fixture
+def stream_rows(add_result, monkeypatch, app_module):
+    """Five results in their own form, streamed two rows per batch"""
+    for marks, subject in enumerate(SUBJECTS, start=40):
+        add_result("STRM01", form="Form Stream", subject=subject, marks=marks)
+    monkeypatch.setattr(app_module, "STREAM_BATCH_SIZE", 2)
+    return SUBJECTS
+
+
+def test_ndjson_export_has_one_row_per_line(client, stream_rows):
+    response = client.get("/get_results?form=Form Stream&stream=ndjson")
+    assert response.is_streamed
+    assert response.mimetype == "application/x-ndjson"
+    lines = response.get_data(as_text=True).splitlines()
+    assert sorted(json.loads(line)["subject"] for line in lines) == sorted(stream_rows)
+
+
+def test_ndjson_from_the_accept_header(client, stream_rows):
+    response = client.get("/get_results?form=Form Stream", headers={"Accept": "application/x-ndjson"})
+    assert response.mimetype == "application/x-ndjson"
+    assert len(response.get_data(as_text=True).splitlines()) == len(stream_rows)
+
+
+@pytest.mark.parametrize("flag", ["1", "true", "json"])
+def test_json_stream_matches_the_plain_answer(client, stream_rows, flag):
+    plain = client.get("/get_results?form=Form Stream").get_json()
+    response = client.get(f"/get_results?form=Form Stream&stream={flag}")
+    assert response.is_streamed
+    assert json.loads(response.get_data(as_text=True)) == plain
+
+
+def test_streams_apply_fields(client, stream_rows):
+    body = client.get("/get_results?form=Form Stream&stream=1&fields=subject,marks").get_data(as_text=True)
+    rows = json.loads(body)
+    # The page keys always come along so a cursor can be built from the last row
+    assert {key for row in rows for key in row} == {"id", "created_at", "subject", "marks"}
+    assert {row["subject"]: row["marks"] for row in rows} == dict(zip(stream_rows, range(40, 45)))
+
+
+def test_empty_streams(client):
+    assert client.get("/get_results?form=Form Nobody&stream=1").get_data(as_text=True) == "[]"
+    assert client.get("/get_results?form=Form Nobody&stream=ndjson").get_data(as_text=True) == ""
@@ -0,0 +1,38 @@
+def add_student(client, sid):
+    body = client.post("/add_student", json=dict(sid=sid, name="Tapiwa", surname="Case", phone="", attendance="",
+                                                 age=15, sex="M", **{"class": "3A"})).get_json()
+    assert body["success"], body
+
+
+def verify(client, student_id):
+    return client.post("/verify_student", json={"studentId": student_id})
+
+
+def test_ids_are_stored_upper_case(client, app_module):
+    add_student(client, "  sid01 ")
+    with app_module.get_db(app_module.DATABASE_STUDENTS) as conn:
+        assert app_module.find_student(conn, "SID01")["student_id"] == "SID01"
+
+
+def test_lookup_ignores_case_and_spaces(client):
+    add_student(client, "SID02")
+    for typed in ("sid02", " Sid02", "SID02  "):
+        response = verify(client, typed)
+        assert response.status_code == 200, typed
+        assert response.get_json()["student"]["id"] == "SID02"
+    assert verify(client, "SID0").status_code == 404
+
+
+def test_rows_that_predate_normalizing_are_still_found(app_module):
+    # A lower-case ID that couldn't be upper-cased (it would clash) stays as it was
+    with app_module.get_db(app_module.DATABASE_STUDENTS) as conn:
+        conn.execute("INSERT INTO students (student_id, name) VALUES ('sid03', 'Legacy')")
+        assert app_module.find_student(conn, " SID03")["name"] == "Legacy"
+
+
+def test_lookups_use_an_index(app_module):
+    with app_module.get_db(app_module.DATABASE_STUDENTS) as conn:
+        for sql in ("SELECT * FROM students WHERE student_id=?",
+                    "SELECT * FROM students WHERE student_id=? COLLATE NOCASE"):
+            plan = " ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, ("X",)))
+            assert "USING INDEX" in plan, (sql, plan)
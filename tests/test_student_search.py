@@ -0,0 +1,39 @@
+def add_student(client, sid, name, surname, klass="3C"):
+    body = client.post("/add_student", json=dict(sid=sid, name=name, surname=surname, **{"class": klass},
+                                                 phone="", attendance="", age=15, sex="F")).get_json()
+    assert body["success"], body
+
+
+def search(client, q, **args):
+    response = client.get("/search_students", query_string=dict(q=q, **args))
+    assert response.status_code == 200
+    return response.get_json()["students"]
+
+
+def test_prefix_words_narrow_the_matches(client):
+    add_student(client, "srch01", "Zanele", "Mkhize")
+    add_student(client, "SRCH02", "Zanele", "Dlamini")
+
+    assert {s["student_id"] for s in search(client, "zanel")} == {"SRCH01", "SRCH02"}
+    assert [s["student_id"] for s in search(client, "zan mkh")] == ["SRCH01"]
+    assert "password" not in search(client, "zanel")[0]
+
+
+def test_id_match_ranks_first(client):
+    add_student(client, "SRCH03", "Lindiwe", "Kopano")
+    add_student(client, "KOPAN5", "Lindiwe", "Sibiya")
+    assert [s["student_id"] for s in search(client, "kopan")] == ["KOPAN5", "SRCH03"]
+
+
+def test_index_follows_deletes(client):
+    add_student(client, "SRCH04", "Thembeka", "Xolisile")
+    [student] = search(client, "xolisi")
+    assert client.delete(f"/delete_student/{student['id']}").status_code == 200
+    assert search(client, "xolisi") == []
+
+
+def test_odd_input(client):
+    assert search(client, "") == []
+    assert isinstance(search(client, '"zan* OR -(mkh'), list)
+    assert len(search(client, "zanel", limit=1)) == 1
+    assert client.get("/search_students?q=zanel&limit=lots").status_code == 400
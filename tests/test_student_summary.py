@@ -0,0 +1,53 @@
+def save(client, student_id, subject, marks, term="1", status="Pass"):
+    body = client.post("/save_result", json=dict(
+        student_id=student_id, student_name="Summary Student", form="Form 3", level="O", subject=subject,
+        term=term, year=2025, marks=marks, grade="C", status=status)).get_json()
+    assert body["success"], body
+
+
+def student_results(client, login, student_id):
+    return client.get(f"/student_results/{student_id}", headers=login("teacher", "T1")).get_json()
+
+
+def test_saves_and_deletes_keep_the_summary_current(client, login):
+    save(client, "SUMM01", "Maths", 80)
+    save(client, "SUMM01", "English", 30, status="Fail")
+    save(client, "SUMM01", "Maths", 90, term="2")
+    body = student_results(client, login, "SUMM01")
+    assert body["statistics"] == {
+        "totalSubjects": 3, "average": 66.67, "bestSubject": "Maths", "bestScore": 90,
+        "weakestSubject": "English", "weakestScore": 30, "passed": 2, "failed": 1,
+    }
+    assert [(s["term"], s["total_subjects"]) for s in body["termSummaries"]] == [("2", 1), ("1", 2)]
+
+    # Re-saving a mark replaces it rather than adding a subject
+    save(client, "SUMM01", "English", 55)
+    english = next(r for r in student_results(client, login, "SUMM01")["results"] if r["subject"] == "English")
+    assert student_results(client, login, "SUMM01")["statistics"]["weakestScore"] == 55
+
+    client.delete(f"/delete_result/{english['id']}")
+    [term1] = [s for s in student_results(client, login, "SUMM01")["termSummaries"] if s["term"] == "1"]
+    assert (term1["total_subjects"], term1["total_marks"], term1["weak_subject"]) == (1, 80, "Maths")
+
+
+def test_deleting_the_last_result_drops_the_term(client, login):
+    save(client, "SUMM02", "Biology", 45)
+    [row] = student_results(client, login, "SUMM02")["results"]
+    client.delete(f"/delete_result/{row['id']}")
+    body = student_results(client, login, "SUMM02")
+    assert body["termSummaries"] == []
+    assert body["statistics"]["totalSubjects"] == 0
+
+
+def test_rebuild_matches_the_incremental_rows(client, app_module):
+    save(client, "SUMM03", "Chemistry", 61)
+    save(client, "SUMM03", "Physics", 72)
+    # (add_result elsewhere writes results without touching the summaries)
+    query = "SELECT * FROM student_summary WHERE student_id LIKE 'SUMM%' ORDER BY student_id, year, term"
+    with app_module.get_db(app_module.DATABASE_RESULTS) as conn:
+        incremental = [tuple(row) for row in conn.execute(query)]
+
+    result = app_module.app.test_cli_runner().invoke(args=["rebuild-summaries"])
+    assert result.exit_code == 0, result.output
+    with app_module.get_db(app_module.DATABASE_RESULTS) as conn:
+        assert [tuple(row) for row in conn.execute(query)] == incremental